@@ -0,0 +1,104 @@
+"""Measure how long ShowCatalog.find_candidate takes on a big tag.
+
+A synthetic tag of commercials is loaded into a catalog from database rows and picked
+from the way make_reel_fill does, with some of the entries carrying month hints. The
+time per pick and the memory the loaded catalog and its first pick take are reported.
+
+To see the difference a change makes, run it against two checkouts, or compare the
+columnar catalog big stations use (see columnar_catalog_entries) with the entry list:
+
+    python3 benchmarks/candidate_pick.py
+    python3 benchmarks/candidate_pick.py --root ../fs42-before
+    python3 benchmarks/candidate_pick.py --columnar
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+PROBE = """
+import json, random, time, tracemalloc
+from datetime import datetime, timedelta
+from fs42.catalog import ShowCatalog
+from fs42.catalog_entry import CatalogEntry, MatchingContentNotFound
+from fs42.schedule_hint import MonthHint
+
+random.seed(42)
+# hints as they are stored in the catalog
+december = json.dumps([json.dumps(MonthHint("December").toJSON())])
+rows = []
+for i in range({entries}):
+    hints = december if random.random() < {hinted} else None
+    path = f"/media/commercial/spot_{{i:06}}.mp4"
+    rows.append((i, "bench", path, f"spot_{{i:06}}", random.choice([15, 30, 30, 60, 120]), "commercial", 0, hints, None, None, path))
+catalog = ShowCatalog({{"network_name": "bench", "network_type": "standard"}}, load=False)
+when = datetime(2023, 6, 1, 18)
+
+# the paths a columnar catalog reads back, kept out of the measured memory as they stay in the database
+paths = {{r[0]: r[2] for r in rows}}
+
+
+class Rows:
+    def paths(self, ids):
+        return {{i: (paths[i], paths[i]) for i in ids}}
+
+
+if {columnar}:
+    # imported up front so the module itself isn't counted as catalog memory
+    import numpy
+    from fs42.columnar_catalog import ColumnarCatalog
+
+tracemalloc.start()
+if {columnar}:
+    columns = ColumnarCatalog("bench", sorted(((r[0], r[4], r[5], r[6], r[7]) for r in rows), key=lambda r: r[1]), Rows())
+    catalog.clip_index = dict(columns.tags)
+    catalog.tag_dur_cache = dict(columns.tags)
+else:
+    catalog.clip_index["commercial"] = [CatalogEntry.from_db_row(row) for row in rows]
+del rows
+catalog.find_candidate("commercial", 31, when)
+index_bytes = tracemalloc.get_traced_memory()[0]
+tracemalloc.stop()
+
+start = time.perf_counter()
+for pick in range({picks}):
+    try:
+        catalog.find_candidate("commercial", random.choice([31, 61, 200]), when + timedelta(minutes=pick))
+    except MatchingContentNotFound:
+        pass
+elapsed = time.perf_counter() - start
+print(json.dumps({{"per_pick": elapsed / {picks}, "index_bytes": index_bytes}}))
+"""
+
+
+def main():
+    parser = argparse.ArgumentParser(description="FieldStation42 candidate pick benchmark")
+    parser.add_argument("--root", default=os.path.join(os.path.dirname(__file__), ".."), help="Checkout to measure")
+    parser.add_argument("--entries", type=int, default=100000, help="Entries in the tag")
+    parser.add_argument("--picks", type=int, default=2000, help="Candidates to pick")
+    parser.add_argument("--hinted", type=float, default=0.1, help="Share of entries that only play in December")
+    parser.add_argument("--columnar", action="store_true", help="Load the tag as a columnar catalog")
+    args = parser.parse_args()
+
+    root = os.path.abspath(args.root)
+    result = subprocess.run(
+        [sys.executable, "-c", PROBE.format(entries=args.entries, picks=args.picks, hinted=args.hinted, columnar=args.columnar)],
+        cwd=root,
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode != 0:
+        print(result.stderr)
+        sys.exit(result.returncode)
+
+    measured = json.loads(result.stdout.strip().splitlines()[-1])
+    print(f"Candidate picks for {root}")
+    print(f"Entries in tag:    {args.entries} ({args.hinted:.0%} hinted){' as columns' if args.columnar else ''}")
+    print(f"Time per pick:     {measured['per_pick'] * 1000000:.1f} us")
+    print(f"Catalog memory:    {measured['index_bytes'] / 1024 / 1024:.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
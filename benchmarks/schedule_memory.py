@@ -0,0 +1,93 @@
+"""Measure the memory a month of schedule takes once loaded.
+
+The player and the web API both load every station's schedule through LiquidManager,
+so that is what --loaded measures, using the schedules in the configured database.
+Without --loaded a synthetic month is built in memory the same way liquid_io hydrates
+blocks from the database, so runs are comparable on any machine.
+
+Each measurement runs in a fresh interpreter. To compare two versions, run it on both:
+
+    python3 benchmarks/schedule_memory.py
+    python3 benchmarks/schedule_memory.py --root ../fs42-before
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+
+PROBE = """
+import json, os, resource, sys
+
+def rss_kb():
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1])
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+from fs42.block_plan import BlockPlanEntry
+from fs42.catalog_entry import CatalogEntry
+from fs42.liquid_manager import LiquidManager
+
+before = rss_kb()
+if {loaded!r}:
+    manager = LiquidManager()
+    count = sum(len(blocks or []) for blocks in manager.schedules.values())
+    keep = manager
+else:
+    # a month of half hour blocks per station, each cut into segments with reels between them
+    keep = []
+    count = 0
+    shows = [f"/media/content/show_{{s}}/season_{{s % 7}}/episode_{{e:03}}.mp4" for s in range(40) for e in range(50)]
+    reels = [f"/media/content/commercial/spot_{{r:04}}.mp4" for r in range(800)]
+    for station in range({stations}):
+        for block in range(30 * 48):
+            show = shows[(station * 131 + block) % len(shows)]
+            row = (block, "station", show, "title", 1320.0, "show", 0, None, None, None, show)
+            content = CatalogEntry.from_db_row(row)
+            plan = []
+            for segment in range(4):
+                plan.append({{"path": show, "skip": segment * 330.0, "duration": 330.0, "is_stream": False}})
+                for reel in range(3):
+                    plan.append({{"path": reels[(block * 7 + segment * 3 + reel) % len(reels)], "skip": 0, "duration": 30.0, "is_stream": False}})
+            # round trip through JSON so every string is a fresh copy, like rows from the database
+            plan = [BlockPlanEntry(p["path"], p["skip"], p["duration"], p["is_stream"]) for p in json.loads(json.dumps(plan))]
+            keep.append((content, plan))
+            count += 1
+after = rss_kb()
+print(json.dumps({{"blocks": count, "before_kb": before, "after_kb": after}}))
+"""
+
+
+def main():
+    parser = argparse.ArgumentParser(description="FieldStation42 schedule memory benchmark")
+    parser.add_argument("--root", default=os.path.join(os.path.dirname(__file__), ".."), help="Checkout to measure")
+    parser.add_argument("--stations", type=int, default=10, help="Stations in the synthetic schedule")
+    parser.add_argument("--loaded", action="store_true", help="Load the real schedules like the player and API do")
+    args = parser.parse_args()
+
+    root = os.path.abspath(args.root)
+    result = subprocess.run(
+        [sys.executable, "-c", PROBE.format(loaded=args.loaded, stations=args.stations)],
+        cwd=root,
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode != 0:
+        print(result.stderr)
+        sys.exit(result.returncode)
+
+    import json
+
+    measured = json.loads(result.stdout.strip().splitlines()[-1])
+    grown = measured["after_kb"] - measured["before_kb"]
+    print(f"Schedule memory for {root}")
+    print(f"Blocks loaded:     {measured['blocks']}")
+    print(f"RSS before load:   {measured['before_kb'] / 1024:.1f} MB")
+    print(f"RSS after load:    {measured['after_kb'] / 1024:.1f} MB")
+    print(f"Schedule takes:    {grown / 1024:.1f} MB ({grown * 1024 / max(1, measured['blocks']):.0f} bytes per block)")
+
+
+if __name__ == "__main__":
+    main()
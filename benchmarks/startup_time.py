@@ -0,0 +1,69 @@
+"""Measure how long FieldStation42 entry points take to import.
+
+Each module is imported in a fresh interpreter several times and the median is reported,
+along with any heavy optional packages the import pulled in.
+
+To see the difference a change makes, run it against two checkouts:
+
+    python3 benchmarks/startup_time.py
+    python3 benchmarks/startup_time.py --root ../fs42-before
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+MODULES = ["station_42", "fs42.catalog", "fs42.media_processor", "fs42.liquid_manager"]
+HEAVY = ["moviepy", "numpy", "PIL", "imageio", "fastapi", "uvicorn", "textual"]
+
+PROBE = """
+import sys, time, json
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+heavy = [name for name in {heavy!r} if name in sys.modules]
+print(json.dumps({{"elapsed": elapsed, "heavy": heavy}}))
+"""
+
+
+def time_import(root, module, runs):
+    times = []
+    heavy = []
+    for _ in range(runs):
+        result = subprocess.run(
+            [sys.executable, "-c", PROBE.format(module=module, heavy=HEAVY)],
+            cwd=root,
+            capture_output=True,
+            text=True,
+        )
+        if result.returncode != 0:
+            return (None, result.stderr.strip().splitlines()[-1:])
+        measured = json.loads(result.stdout.strip().splitlines()[-1])
+        times.append(measured["elapsed"])
+        heavy = measured["heavy"]
+    return (statistics.median(times), heavy)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="FieldStation42 import time benchmark")
+    parser.add_argument("--root", default=os.path.join(os.path.dirname(__file__), ".."), help="Checkout to measure")
+    parser.add_argument("--runs", type=int, default=5, help="Fresh interpreters per module")
+    parser.add_argument("modules", nargs="*", default=MODULES, help="Modules to import")
+    args = parser.parse_args()
+
+    root = os.path.abspath(args.root)
+    print(f"Import times for {root} - median of {args.runs} runs")
+    print(f"{'MODULE':<28} | {'SECONDS':>8} | HEAVY PACKAGES LOADED")
+    for module in args.modules:
+        (elapsed, heavy) = time_import(root, module, args.runs)
+        if elapsed is None:
+            print(f"{module:<28} | {'failed':>8} | {' '.join(heavy)}")
+        else:
+            print(f"{module:<28} | {elapsed:>8.3f} | {', '.join(heavy) if heavy else '-'}")
+
+
+if __name__ == "__main__":
+    main()
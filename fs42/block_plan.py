@@ -1,6 +1,13 @@
+import sys
+
+
 class BlockPlanEntry:
+    # a month of schedule holds a lot of these, so no per-instance dict
+    __slots__ = ("path", "skip", "duration", "is_stream")
+
     def __init__(self, the_path, skip=0, duration=-1, is_stream=False):
-        self.path = the_path
+        # every entry cut from the same file shares one copy of its path
+        self.path = sys.intern(the_path)
         self.skip = skip
         self.duration = duration
         self.is_stream = is_stream
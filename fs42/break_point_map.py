@@ -0,0 +1,48 @@
+import logging
+
+from fs42.columnar_catalog import ColumnarTag
+from fs42.fluid_builder import FluidBuilder
+
+
+class BreakPointMap:
+    """The detected break points for every file in a catalog, read in one query.
+
+    Making plans for a month of blocks would otherwise look each episode up on its own.
+    The points clipped down to a block's number of breaks are kept too, keyed by file,
+    break count and duration, so reruns of an episode reuse them.
+    """
+
+    def __init__(self, points: dict):
+        # realpath to its break points
+        self._points = points
+        self._clipped = {}
+
+    @staticmethod
+    def for_catalog(catalog):
+        """The break points of every file in the catalog"""
+        realpaths = set()
+        for entries in catalog.clip_index.values():
+            if isinstance(entries, list):
+                realpaths.update(entry.realpath for entry in entries if entry.realpath)
+            elif isinstance(entries, ColumnarTag):
+                realpaths.update(entries.realpaths())
+        points = FluidBuilder().get_breaks_for(realpaths)
+        logging.getLogger("BREAKS").debug(f"Loaded break points for {len(points)} of {len(realpaths)} files")
+        return BreakPointMap(points)
+
+    def get(self, realpath) -> list:
+        """The break points for the file, or an empty list"""
+        return [dict(point) for point in self._points.get(realpath) or []]
+
+    def clipped(self, realpath, steps, content_duration) -> list:
+        """The file's break points cut down to each max_breaks in steps in turn, as LiquidBlock.clip_break_points does"""
+        from fs42.liquid_blocks import LiquidBlock
+
+        key = (realpath, tuple(int(max_breaks) for max_breaks in steps), content_duration)
+        if key not in self._clipped:
+            points = self.get(realpath)
+            for max_breaks in steps:
+                points = LiquidBlock.clip_break_points(points, max_breaks, content_duration)
+            self._clipped[key] = points
+        # copies, as plans write segment durations into the points they're given
+        return [dict(point) for point in self._clipped[key]]
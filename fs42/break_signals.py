@@ -0,0 +1,126 @@
+import logging
+
+
+class BreakSignals:
+    """Collects black frame, silence and scene change signals from a single ffmpeg run and
+    combines them into scored break point candidates.
+
+    Candidates keep the black_start, black_end and black_duration keys the rest of the
+    scheduler uses, and add a score and the list of signals that agreed on the point.
+    """
+
+    # scene changes scoring above this are reported by the select filter
+    scene_threshold = 0.4
+    # silencedetect settings - quieter than this, for at least this long
+    silence_noise = "-50dB"
+    silence_min_duration = 0.3
+    # signals within this many seconds of each other count as the same moment
+    tolerance = 0.5
+
+    def __init__(self):
+        self._l = logging.getLogger("BREAKS")
+        # blackdetect dicts
+        self.black = []
+        # (start, end) of each silence
+        self.silences = []
+        # (time, score) of each scene change
+        self.scenes = []
+        self._silence_start = None
+        self._scene_time = None
+
+    @staticmethod
+    def parse_black_line(line) -> dict:
+        """Returns black_start, black_end and black_duration from a blackdetect log line, or None"""
+        if "blackdetect" not in line:
+            return None
+        _l = logging.getLogger("BREAKS")
+        try:
+            parts = line.split("]")[1].strip().split(" ")
+            info = {}
+            for part in parts:
+                if ":" in part:
+                    key, value = part.split(":")
+                    info[key] = float(value)
+            if "black_start" not in info or "black_end" not in info or "black_duration" not in info:
+                # then not a good line
+                return None
+            return info
+
+        except IndexError:
+            _l.debug(f"Skipping malformed line: {line}")
+        except ValueError:
+            _l.info(f"Skipping invalid data in line: {line}")
+        except Exception as e:
+            _l.info(f"An unexpected error occurred while parsing line: {line}. Error: {e}")
+        return None
+
+    @staticmethod
+    def _value_after(line, key) -> float:
+        # values look like "silence_end: 15.2 | silence_duration: 2.9" or "lavfi.scene_score=0.61"
+        rest = line.split(key, 1)[1].strip()
+        return float(rest.split()[0].rstrip("|")) if rest else None
+
+    def feed(self, line):
+        """Take one line of ffmpeg log output"""
+        try:
+            if "blackdetect" in line:
+                info = BreakSignals.parse_black_line(line)
+                if info:
+                    self.black.append(info)
+            elif "silence_start:" in line:
+                self._silence_start = BreakSignals._value_after(line, "silence_start:")
+            elif "silence_end:" in line:
+                end = BreakSignals._value_after(line, "silence_end:")
+                if self._silence_start is not None and end is not None:
+                    self.silences.append((self._silence_start, end))
+                self._silence_start = None
+            elif "pts_time:" in line:
+                self._scene_time = BreakSignals._value_after(line, "pts_time:")
+            elif "lavfi.scene_score=" in line:
+                if self._scene_time is not None:
+                    self.scenes.append((self._scene_time, BreakSignals._value_after(line, "lavfi.scene_score=")))
+                self._scene_time = None
+        except (IndexError, ValueError):
+            self._l.debug(f"Skipping malformed line: {line}")
+
+    def _silent_near(self, start, end) -> bool:
+        return any(s < end + self.tolerance and e > start - self.tolerance for s, e in self.silences)
+
+    def _cut_near(self, start, end) -> bool:
+        return any(start - self.tolerance <= t <= end + self.tolerance for t, _ in self.scenes)
+
+    def candidates(self) -> list[dict]:
+        """Scored break points in time order.
+
+        Black frames are the main signal, scored higher when they're longer, silent or
+        have a cut in them. A cut during silence is a candidate even without black.
+        """
+        points = []
+        for black in self.black:
+            score = 1.0 + min(black["black_duration"], 2.0) / 2
+            signals = ["black"]
+            if self._silent_near(black["black_start"], black["black_end"]):
+                score += 1.0
+                signals.append("silence")
+            if self._cut_near(black["black_start"], black["black_end"]):
+                score += 0.5
+                signals.append("scene")
+            points.append(dict(black, score=round(score, 3), signals=signals))
+
+        for time, scene_score in self.scenes:
+            if any(p["black_start"] - self.tolerance <= time <= p["black_end"] + self.tolerance for p in points):
+                # already covered by black frames
+                continue
+            if self._silent_near(time, time):
+                # cut right at the change
+                points.append(
+                    {
+                        "black_start": time,
+                        "black_end": time,
+                        "black_duration": 0.0,
+                        "score": round(1.0 + scene_score, 3),
+                        "signals": ["silence", "scene"],
+                    }
+                )
+
+        return sorted(points, key=lambda k: k["black_start"])
@@ -0,0 +1,161 @@
+import bisect
+import random
+
+from fs42.hint_mask import HintMask
+
+
+class _HintGroup:
+    # the entries sharing one set of hints, as sorted positions bucketed by play count
+    __slots__ = ("hints", "buckets", "counts")
+
+    def __init__(self, hints):
+        self.hints = hints
+        self.buckets = {}
+        self.counts = []
+
+
+class CandidateIndex:
+    """One tag's catalog entries sorted by duration and bucketed by hints and play count.
+
+    Finding the least played entry shorter than some length is a bisect on the durations,
+    one hint test per distinct set of hints, and a look through the lowest count buckets.
+    The buckets are kept up to date as entries are taken, so a schedule build never
+    rescans the whole tag.
+    """
+
+    def __init__(self, entries):
+        # the list this was built from, to tell when the catalog has replaced it
+        self.entries = entries
+        self.size = len(entries)
+        self._sorted = sorted(entries, key=lambda e: e.duration)
+        self._durations = [entry.duration for entry in self._sorted]
+        # id of the hints (None for no hints) to its group - entries with the same hints share the object
+        self._groups = {}
+        self._group_of = []
+        # id of each entry to its sorted position
+        self._positions = {}
+        for pos, entry in enumerate(self._sorted):
+            self._positions[id(entry)] = pos
+            key = id(entry.hints) if entry.hints else None
+            group = self._groups.get(key)
+            if group is None:
+                group = self._groups[key] = _HintGroup(entry.hints)
+            group.buckets.setdefault(entry.count, []).append(pos)
+            self._group_of.append(group)
+        for group in self._groups.values():
+            group.counts = sorted(group.buckets)
+
+    def current(self, entries) -> bool:
+        return self.entries is entries and self.size == len(entries)
+
+    def take(self, seconds, when, min_duration=1):
+        """The least played entry at least min_duration and shorter than seconds that the hints
+        allow at when, picked at random among equals, with its count bumped - or None"""
+        lo = bisect.bisect_left(self._durations, min_duration)
+        hi = bisect.bisect_left(self._durations, seconds)
+        if lo >= hi:
+            return None
+
+        # the lowest count in range for each group the hints allow, then the lowest of those
+        lowest = None
+        found = []
+        for group in self._groups.values():
+            if group.hints and not HintMask.test(group.hints, when):
+                continue
+            for count in group.counts:
+                if lowest is not None and count > lowest:
+                    break
+                bucket = group.buckets[count]
+                start = bisect.bisect_left(bucket, lo)
+                end = bisect.bisect_left(bucket, hi)
+                if start < end:
+                    if lowest is None or count < lowest:
+                        lowest = count
+                        found = []
+                    found.append((bucket, start, end))
+                    break
+        if lowest is None:
+            return None
+
+        # uniform over every entry tied for the lowest count
+        pick = random.randrange(sum(end - start for _, start, end in found))
+        for bucket, start, end in found:
+            if pick < end - start:
+                return self._played(bucket[start + pick], lowest)
+            pick -= end - start
+
+    def fitting(self, seconds, when, limit, min_duration=1) -> list:
+        """Up to limit entries at least min_duration and shorter than seconds that the hints allow
+        at when, from the lowest few play counts, least played first and in random order among
+        equals. Counts are left alone - mark the ones used with played()"""
+        lo = bisect.bisect_left(self._durations, min_duration)
+        hi = bisect.bisect_left(self._durations, seconds)
+        if lo >= hi:
+            return []
+
+        groups = [group for group in self._groups.values() if not group.hints or HintMask.test(group.hints, when)]
+        found = []
+        # the least played entries may all be much the same length, so each count only gets a
+        # share of the limit and a few more played ones are always there to fit around them
+        per_count = max(1, limit // 4)
+        for count in sorted({count for group in groups for count in group.counts}):
+            ranges = []
+            for group in groups:
+                bucket = group.buckets.get(count)
+                if bucket:
+                    start = bisect.bisect_left(bucket, lo)
+                    end = bisect.bisect_left(bucket, hi)
+                    if start < end:
+                        ranges.append((bucket, start, end))
+            total = sum(end - start for _, start, end in ranges)
+            for pick in random.sample(range(total), min(total, per_count, limit - len(found))):
+                for bucket, start, end in ranges:
+                    if pick < end - start:
+                        found.append(self._sorted[bucket[start + pick]])
+                        break
+                    pick -= end - start
+            if len(found) >= limit:
+                break
+        return found
+
+    def played(self, entry) -> bool:
+        """Bump the count of an entry from this index - False if it isn't in it"""
+        pos = self._positions.get(id(entry))
+        if pos is None:
+            return False
+        self._played(pos, entry.count)
+        return True
+
+    def unplayed(self, entry) -> bool:
+        """Take back a play counted for an entry from this index that didn't air - False if it isn't in it"""
+        pos = self._positions.get(id(entry))
+        if pos is None:
+            return False
+        if entry.count > 0:
+            self._move(pos, entry.count, entry.count - 1)
+        return True
+
+    def hint_sets(self) -> list:
+        """Each distinct set of hints in the tag"""
+        return [group.hints for group in self._groups.values() if group.hints]
+
+    def _played(self, pos, count):
+        # move the entry to the next bucket up in its group
+        return self._move(pos, count, count + 1)
+
+    def _move(self, pos, count, to):
+        # move the entry from one count's bucket in its group to another's
+        group = self._group_of[pos]
+        bucket = group.buckets[count]
+        del bucket[bisect.bisect_left(bucket, pos)]
+        if not bucket:
+            del group.buckets[count]
+            group.counts.remove(count)
+
+        entry = self._sorted[pos]
+        entry.count = to
+        if entry.count not in group.buckets:
+            group.buckets[entry.count] = []
+            bisect.insort(group.counts, entry.count)
+        bisect.insort(group.buckets[entry.count], pos)
+        return entry
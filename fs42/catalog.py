@@ -1,24 +1,28 @@
 import logging
-import sys
+import os
 import random
 from fs42.catalog_entry import CatalogEntry, MatchingContentNotFound, NoFillerContentFound
 from fs42.catalog_api import CatalogAPI
+from fs42.station_manager import StationManager
 from fs42.timings import MIN_5, DAYS
 from fs42.liquid_blocks import ReelBlock
 from fs42.media_processor import MediaProcessor
+from fs42.media_walker import MediaWalker
+from fs42.probe_engine import ProbeEngine
+from fs42.hint_mask import HintMask
+from fs42.candidate_index import CandidateIndex
+from fs42.columnar_catalog import CatalogRows, ColumnarCatalog, ColumnarTag
+from fs42.reel_filler import ReelFiller
+from fs42.pod_library import PodLibrary
 from fs42.sequence_api import SequenceAPI
 
 
-try:
-    # try to import from version > 2.0
-    from moviepy import VideoFileClip
-except ImportError:
-    # fall back to import from version 1.0
-    from moviepy.editor import VideoFileClip  # type: ignore
-
-
 FF_USE_FLUID_FILE_CACHE = True
 FF_USE_CATAGLOG_DB = True
+# fill what the reel blocks leave of a gap with the closest fitting set of reels - see ReelFiller
+FF_EXACT_REEL_FILL = True
+# reuse ready-made reel blocks for common break lengths - see PodLibrary
+FF_USE_POD_LIBRARY = True
 
 
 class bcolors:
@@ -37,14 +41,32 @@ class ShowCatalog:
     prebump = "prebump"
     postbump = "postbump"
 
-    def __init__(self, config, rebuild_catalog=False, load=True, debug=False, force=False):
+    def __init__(
+        self,
+        config,
+        rebuild_catalog=False,
+        load=True,
+        debug=False,
+        force=False,
+        incremental=False,
+        shared_scan=None,
+        writer=None,
+    ):
         self.config = config
+        # takes the catalog write of a build instead of doing it here - see ParallelCatalogBuild
+        self.writer = writer
+        # incremental builds only write the rows that changed - keeping ids and play counts
+        self.incremental = incremental
+        # folders already scanned for several stations at once - see SharedScan
+        self.shared_scan = shared_scan
         self._l = logging.getLogger(f"{self.config['network_name']} - CAT")
 
         # the main index for videos
         self.clip_index = {}
-        # the tag/duration cache index
+        # tag to its entries indexed by duration and play count - see CandidateIndex
         self.tag_dur_cache = {}
+        # ready-made reel blocks, loaded when first needed
+        self.pod_library = PodLibrary(self)
 
         # basically, a flattened list of clip_index keys
         self.tags = []
@@ -55,7 +77,7 @@ class ShowCatalog:
             if force:
                 self._l.info("Rebuilding catalog with force flag - will delete existing catalog")
                 CatalogAPI.delete_catalog(self.config)
-            self.build_catalog()
+            self.build_catalog(force)
         elif load:
             self.load_catalog()
 
@@ -64,6 +86,9 @@ class ShowCatalog:
         flat_list = []
 
         for tag in self.clip_index:
+            if isinstance(self.clip_index[tag], CatalogEntry):
+                # single entries like the off air image come from the config, not the catalog
+                continue
             try:
                 for entry in self.clip_index[tag]:
                     if isinstance(entry, CatalogEntry):
@@ -74,12 +99,29 @@ class ShowCatalog:
             except Exception as e:
                 print(f"Error processing tag '{tag}': {e}")
 
-        CatalogAPI.set_entries(self.config, flat_list)
+        write = (self.config, flat_list, self.incremental)
+        if self.writer is not None:
+            self.writer(write)
+        else:
+            ShowCatalog.write(*write)
+            HintMask.preload(flat_list)
+
+    @staticmethod
+    def write(config, entries, incremental=False):
+        """Store a built catalog - only the rows that changed when incremental"""
+        if incremental:
+            CatalogAPI.sync_entries(config, entries)
+        else:
+            CatalogAPI.set_entries(config, entries)
 
     def load_catalog(self):
         if self.config["network_type"] == "streaming":
             return
 
+        columnar_over = StationManager().server_conf.get("columnar_catalog_entries")
+        if columnar_over and CatalogAPI.count_entries(self.config) >= columnar_over:
+            return self._load_columnar()
+
         catalog_entries = CatalogAPI.get_entries(self.config)
         
         self.clip_index = {}
@@ -89,28 +131,52 @@ class ShowCatalog:
             if entry.tag not in self.clip_index:
                 self.clip_index[entry.tag] = []
             self.clip_index[entry.tag].append(entry)
-
-    def build_catalog(self):
+        HintMask.preload(catalog_entries)
+
+    def _load_columnar(self):
+        # big catalogs are kept as columns, with entries only made for the rows that get picked
+        columns = ColumnarCatalog(
+            self.config["network_name"], CatalogAPI.get_columns(self.config), CatalogRows(self.config)
+        )
+        self._l.info(f"Loaded {len(columns)} catalog entries as columns")
+        self.clip_index = dict(columns.tags)
+        # each tag picks its own candidates, so it stands in for its CandidateIndex too
+        self.tag_dur_cache = dict(columns.tags)
+        HintMask.preload_sets(columns.hint_sets)
+
+    def build_catalog(self, force=False):
         self._l.info(f"Starting catalog build for {self.config['network_name']}")
 
-        match self.config["network_type"]:
-            case "standard":
-                if FF_USE_FLUID_FILE_CACHE:
-                    from fs42.fluid_builder import FluidBuilder
-
-                    self.__fluid_builder = FluidBuilder()
-                    self._l.info("Initializing fluid file cache...")
-                    self.__fluid_builder.scan_file_cache(self.config["content_dir"])
-                    self._l.info("Fluid file cache updated - continuing build")
-
-                return self._build_standard()
-            case "loop":
-                return self._build_single()
-            case "guide":
-                raise NotImplementedError("Guide catalog not supported yet.")
-            case "streaming":
-                # just return for now
-                return
+        # folders are walked once per build, then lookups come from the walker
+        MediaWalker().forget()
+        try:
+            match self.config["network_type"]:
+                case "standard":
+                    if FF_USE_FLUID_FILE_CACHE:
+                        from fs42.fluid_builder import FluidBuilder
+
+                        self.__fluid_builder = FluidBuilder()
+                        # a shared scan has already brought the file cache up to date
+                        if self.shared_scan is None:
+                            self._l.info("Initializing fluid file cache...")
+                            # force walks everything and retries files that failed to probe before
+                            self.__fluid_builder.scan_file_cache(
+                                self.config["content_dir"], use_fingerprints=not force, retry_failures=force
+                            )
+                            self._l.info("Fluid file cache updated - continuing build")
+
+                    return self._build_standard()
+                case "loop":
+                    return self._build_single()
+                case "guide":
+                    raise NotImplementedError("Guide catalog not supported yet.")
+                case "streaming":
+                    # just return for now
+                    return
+        finally:
+            MediaWalker().forget()
+            # don't leave the probe workers running between builds
+            ProbeEngine().shutdown()
 
     def _build_single(self, tag="content"):
         self.clip_index = {}
@@ -125,18 +191,13 @@ class ShowCatalog:
     def _build_tags(self):
         self.tags = list(self.clip_index.keys())
 
-    def _build_standard(self):
-        self.clip_index = {}
-        self.tags = []
-
-        self._l.info("Standard network")
-        start_bumps = {}
-        end_bumps = {}
-
-        # get the list of all tags
+    def _slot_dirs(self):
+        # get the list of all tags, folder overrides and start/end bumps from the slots
         tags = {}
         bump_overrides = {}
         commercial_overrides = {}
+        start_bumps = {}
+        end_bumps = {}
         for day in DAYS:
             slots = self.config[day]
             for k in slots:
@@ -155,6 +216,38 @@ class ShowCatalog:
                         start_bumps[slots[k]["start_bump"]] = True
                     if "end_bump" in slots[k]:
                         end_bumps[slots[k]["end_bump"]] = True
+        return (tags, bump_overrides, commercial_overrides, start_bumps, end_bumps)
+
+    def scan_dirs(self):
+        """The (tag, is_bumps) folders under content_dir that a standard build scans, in scan order."""
+        (tags, bump_overrides, commercial_overrides, _, _) = self._slot_dirs()
+        dirs = [(tag, False) for tag in tags]
+
+        # add commercial and bumps to the tags
+        if "commercial_dir" in self.config:
+            dirs.append((self.config["commercial_dir"], False))
+        # setup the general bump dir
+        if "bump_dir" in self.config and self.config["bump_dir"]:
+            dirs.append((self.config["bump_dir"], True))
+
+        dirs += [(override_dir, True) for override_dir in bump_overrides]
+        dirs += [(override_dir, False) for override_dir in commercial_overrides]
+
+        # a folder is only scanned the first time it shows up
+        unique = []
+        seen = set()
+        for tag, is_bumps in dirs:
+            if tag not in seen:
+                seen.add(tag)
+                unique.append((tag, is_bumps))
+        return unique
+
+    def _build_standard(self):
+        self.clip_index = {}
+        self.tags = []
+
+        self._l.info("Standard network")
+        (tags, _, _, start_bumps, end_bumps) = self._slot_dirs()
 
         SequenceAPI.scan_sequences(self.config)
 
@@ -182,36 +275,23 @@ class ShowCatalog:
 
         # now inspect the tags and scan corresponding folders for media
         self.tags = list(tags.keys())
-        # populate each tag
+        # populate each tag, then the commercial and bump folders
         total_count = 0
-        for tag in self.tags:
-            total_count += self._scan_directory(tag)
-
-        # add commercial and bumps to the tags
-        if "commercial_dir" in self.config:
-            total_count += self._scan_directory(self.config["commercial_dir"])
-        # setup the general bump dir
-        if "bump_dir" in self.config and self.config["bump_dir"]:
-            total_count += self._scan_directory(self.config["bump_dir"], is_bumps=True)
-
-        for override_dir in bump_overrides:
-            total_count += self._scan_directory(override_dir, is_bumps=True)
-
-        for override_dir in commercial_overrides:
-            total_count += self._scan_directory(override_dir)
+        for tag, is_bumps in self.scan_dirs():
+            total_count += self._scan_directory(tag, is_bumps=is_bumps)
 
         # add sign-off and off-air videos to the clip index
         if "sign_off_video" in self.config:
             self._l.debug("Adding sign-off video")
-            video_clip = VideoFileClip(self.config["sign_off_video"])
-            self.clip_index["sign_off"] = [CatalogEntry(self.config["sign_off_video"], video_clip.duration, "sign_off")]
+            duration = self._special_duration(self.config["sign_off_video"])
+            self.clip_index["sign_off"] = [CatalogEntry(self.config["sign_off_video"], duration, "sign_off")]
             self._l.debug(f"Added sign-off video {self.config['sign_off_video']}")
             total_count += 1
 
         if "off_air_video" in self.config:
             self._l.debug("Adding off air video")
-            video_clip = VideoFileClip(self.config["off_air_video"])
-            self.clip_index["off_air"] = [CatalogEntry(self.config["off_air_video"], video_clip.duration, "off_air")]
+            duration = self._special_duration(self.config["off_air_video"])
+            self.clip_index["off_air"] = [CatalogEntry(self.config["off_air_video"], duration, "off_air")]
             self._l.debug(f"Added off air video {self.config['off_air_video']}")
             total_count += 1
 
@@ -225,34 +305,46 @@ class ShowCatalog:
         self._build_tags()
         self._write_catalog()
 
+    def _special_duration(self, path):
+        # sign-off and off-air videos rarely change, so take them from the file cache
+        if self.__fluid_builder is not None:
+            real_path = os.path.realpath(path)
+            cached = self.__fluid_builder.update_files([real_path]).get(real_path)
+            if cached and cached.duration:
+                return cached.duration
+        return MediaProcessor.probe_duration(path)
+
+    @staticmethod
+    def scan_tag_dir(tag_dir, tag, is_bumps=False, fluid=None) -> dict:
+        """Walk and probe one tag folder, returns the clip index lists it fills keyed by clip index tag"""
+        found = MediaProcessor._process_media(MediaProcessor._find_media(tag_dir), tag, fluid=fluid)
+        subdir_clips = MediaProcessor._process_subs(tag_dir, tag, bumpdir=is_bumps, fluid=fluid)
+
+        if is_bumps:
+            pre_key = f"{tag}-{ShowCatalog.prebump}"
+            post_key = f"{tag}-{ShowCatalog.postbump}"
+            (pre, fill, post) = MediaProcessor._by_position(subdir_clips, ShowCatalog.prebump, ShowCatalog.postbump)
+            return {tag: found + fill, pre_key: pre, post_key: post}
+        return {tag: found + subdir_clips}
+
     def _scan_directory(self, tag, is_bumps=False):
         count_added = 0
         if tag not in self.clip_index:
             self.clip_index[tag] = []
             self._l.info(f"Checking for media with tag={tag} in content folder")
             tag_dir = f"{self.config['content_dir']}/{tag}"
-            file_list = MediaProcessor._find_media(tag_dir)
 
-            self.clip_index[tag] = MediaProcessor._process_media(file_list, tag, fluid=self.__fluid_builder)
-            self._l.info(f"--Found {len(self.clip_index[tag])} videos in {tag} folder")
-            self._l.debug(f"---- {tag} media listing: {self.clip_index[tag]}")
+            scanned = None
+            if self.shared_scan is not None:
+                scanned = self.shared_scan.results_for(tag_dir, tag, is_bumps)
+            if scanned is None:
+                scanned = ShowCatalog.scan_tag_dir(tag_dir, tag, is_bumps, fluid=self.__fluid_builder)
 
-            subdir_clips = MediaProcessor._process_subs(tag_dir, tag, bumpdir=is_bumps, fluid=self.__fluid_builder)
-
-            self._l.info(f"--Found {len(subdir_clips)} videos in {tag} subfolders")
-            self._l.debug(f"---- {tag} sub folder media listing: {subdir_clips}")
-
-            if is_bumps:
-                pre_key = f"{tag}-{ShowCatalog.prebump}"
-                post_key = f"{tag}-{ShowCatalog.postbump}"
-                (pre, fill, post) = MediaProcessor._by_position(subdir_clips, ShowCatalog.prebump, ShowCatalog.postbump)
-                self.clip_index[tag] = self.clip_index[tag] + fill
-                self.clip_index[pre_key] = pre
-                self.clip_index[post_key] = post
-                count_added += len(pre) + len(fill) + len(post)
-            else:
-                self.clip_index[tag] += subdir_clips
-                count_added += len(self.clip_index[tag])
+            for index_tag, clips in scanned.items():
+                self.clip_index[index_tag] = clips
+                count_added += len(clips)
+            self._l.info(f"--Found {count_added} videos in {tag} folder and subfolders")
+            self._l.debug(f"---- {tag} media listing: {self.clip_index[tag]}")
         return count_added
 
     def get_text_listing(self):
@@ -304,48 +396,29 @@ class ShowCatalog:
         results = CatalogAPI.get_by_path(self.config, fpath)
         return results
 
-    def _lowest_count(self, candidates):
-        min_count = sys.maxsize
-        lowest_matches = []
-        for candidate in candidates:
-            if candidate.count < min_count:
-                min_count = candidate.count
-                lowest_matches = [candidate]
-            elif candidate.count == min_count:
-                lowest_matches.append(candidate)
-
-        return random.choice(lowest_matches)
-
     def get_all_by_tag(self, tag):
         if tag in self.clip_index and len(self.clip_index[tag]):
             return self.clip_index[tag]
         else:
             return None
 
+    def _candidate_index(self, tag) -> CandidateIndex:
+        index = self.tag_dur_cache.get(tag)
+        if index is None or not index.current(self.clip_index[tag]):
+            index = self.tag_dur_cache[tag] = CandidateIndex(self.clip_index[tag])
+        return index
+
     def find_candidate(self, tag, seconds, when):
 
         if tag in self.clip_index and len(self.clip_index[tag]):
-            candidates = self.clip_index[tag]
-            matches = []
-            for candidate in candidates:
-                # restrict content to fit and be valid (zero duration is likely not valid)
-                if (
-                    candidate.duration < seconds
-                    and candidate.duration >= 1
-                    and MediaProcessor._test_candidate_hints(candidate.hints, when)
-                ):
-                    matches.append(candidate)
-            #random.shuffle(matches)
-            if not len(matches):
+            # restrict content to fit and be valid (zero duration is likely not valid),
+            # then take the least played - this bumps its count
+            result = self._candidate_index(tag).take(seconds, when)
+            if result is None:
                 err = f"Could not find candidate video for tag={tag} under {seconds} in len - maybe add some shorter content?"
                 raise (MatchingContentNotFound(err))
-            result = self._lowest_count(matches)
-            # note, this has been migrated
-            result.count += 1
-            # CatalogAPI.set_play_count(self.config, result.path, result.count)
             return result
 
-
     def find_filler(self, seconds, when):
         bump_tag = self.config["bump_dir"]
         com_tag = self.config["commercial_dir"]
@@ -388,6 +461,22 @@ class ShowCatalog:
         start_candidate = None
         end_candidate = None
 
+        pod_key = None
+        if FF_EXACT_REEL_FILL and FF_USE_POD_LIBRARY:
+            if not self.config["commercial_free"]:
+                fill_tag = commercial_dir if commercial_dir else self.config["commercial_dir"]
+            else:
+                fill_tag = bump_dir if bump_dir else self.config["bump_dir"]
+            bump_tag = bump_dir if bump_dir else self.config["bump_dir"]
+            pod_key = self.pod_library.key(target_duration, when, bumpers, fill_tag, bump_tag)
+            if pod_key is not None:
+                # built to the length of its bucket, so the block can be kept as a pod for the whole bucket
+                target_duration = self.pod_library.length(target_duration)
+                remaining = target_duration
+                pod = self.pod_library.take(pod_key, when, target_duration)
+                if pod is not None:
+                    return ReelBlock(*pod)
+
         if bumpers:
             start_candidate = self.find_bump(target_duration, when, ShowCatalog.prebump, bump_tag=bump_dir)
             end_candidate = self.find_bump(target_duration, when, ShowCatalog.postbump, bump_tag=bump_dir)
@@ -395,6 +484,20 @@ class ShowCatalog:
             remaining -= start_candidate.duration
             remaining -= end_candidate.duration
 
+        if FF_EXACT_REEL_FILL:
+            if not self.config["commercial_free"]:
+                reels = self._exact_fill(self._commercial_tag(commercial_dir), remaining, when)
+            else:
+                reels = self._exact_fill(self._bump_tag(bump_dir), remaining, when)
+            if not reels and remaining > (target_duration * 0.1):
+                # the bumpers won't air either
+                self._unplay_block(ReelBlock(start_candidate, [], end_candidate))
+                raise MatchingContentNotFound(f"Could not find reels to fill {remaining} seconds")
+            # bumpers longer than the break leave a block that won't be kept, so it isn't a pod
+            if pod_key is not None and remaining >= 0:
+                self.pod_library.add(pod_key, start_candidate, reels, end_candidate)
+            return ReelBlock(start_candidate, reels, end_candidate)
+
         # aim for lower and should average close over time since the returned can be larger
         while remaining > (target_duration * 0.1):
             if not self.config["commercial_free"]:
@@ -417,6 +520,13 @@ class ShowCatalog:
         keep_going = True
         while remaining and keep_going:
             block = None
+            if FF_EXACT_REEL_FILL:
+                # blocks come out exactly as long as asked, so spread what is left over the rest of them
+                if strict_count:
+                    blocks_left = strict_count - len(blocks)
+                else:
+                    blocks_left = max(1, round(remaining / self.config["break_duration"]))
+                target_break_duration = remaining / blocks_left
             try:
                 block = self.make_reel_block(
                     when, use_bumpers, target_break_duration, commercial_dir=commercial_dir, bump_dir=bump_dir
@@ -426,7 +536,12 @@ class ShowCatalog:
                     f"Could not find matching content for {remaining} seconds - will attempt to fill with BRB"
                 )
 
-            if block and (remaining - block.duration) > 0:
+            if FF_EXACT_REEL_FILL:
+                # exact blocks are built to fit what is left, so one that uses all of it is kept
+                fits = block and remaining - block.duration >= 0
+            else:
+                fits = block and remaining - block.duration > 0
+            if fits:
                 remaining -= block.duration
                 blocks.append(block)
 
@@ -434,6 +549,9 @@ class ShowCatalog:
                     keep_going = False
 
             else:
+                if block:
+                    # it won't air, so its reels shouldn't count as played
+                    self._unplay_block(block)
                 keep_going = False
 
         keep_going = True
@@ -441,6 +559,22 @@ class ShowCatalog:
         # discard that block and fill using the tightest technique possible
         additional_reels = []
 
+        if FF_EXACT_REEL_FILL and remaining > 0:
+            if not self.config["commercial_free"]:
+                additional_reels = self._exact_fill(self._commercial_tag(commercial_dir), remaining, when)
+                remaining -= sum(reel.duration for reel in additional_reels)
+            bump_tag = bump_dir if bump_dir else self.config["bump_dir"]
+            has_bumps = self.config["commercial_free"] or len(self.clip_index.get(bump_tag, []))
+            if remaining > self.min_gap and has_bumps:
+                # bumps are shorter, so they can close what the commercials couldn't
+                bumps = self._exact_fill(self._bump_tag(bump_dir), remaining, when)
+                additional_reels += bumps
+                remaining -= sum(reel.duration for reel in bumps)
+            if remaining > self.min_gap and "be_right_back_media" in self.config:
+                brb = CatalogEntry(self.config["be_right_back_media"], duration=remaining, tag="brb")
+                additional_reels.append(brb)
+            keep_going = False
+
         while remaining and keep_going:
             candidate = None
             try:
@@ -469,6 +603,45 @@ class ShowCatalog:
 
         return blocks
 
+    def _commercial_tag(self, commercial_dir=None):
+        com_tag = commercial_dir if commercial_dir else self.config["commercial_dir"]
+        if not len(self.clip_index[com_tag]):
+            raise NoFillerContentFound(f"Can't find filler content in {com_tag} - please add commercials.")
+        return com_tag
+
+    def _bump_tag(self, bump_dir=None):
+        bump_tag = bump_dir if bump_dir else self.config["bump_dir"]
+        if not len(self.clip_index[bump_tag]):
+            raise NoFillerContentFound("Can't find filler - add bumps...")
+        return bump_tag
+
+    def _played(self, entry):
+        # count a reel used again outside of find_candidate, keeping its tag's index in step
+        for index in self.tag_dur_cache.values():
+            if index.played(entry):
+                return
+        entry.count += 1
+
+    def _unplayed(self, entry):
+        # take back a play counted for a reel that ended up not airing
+        for index in self.tag_dur_cache.values():
+            if index.unplayed(entry):
+                return
+        entry.count = max(0, entry.count - 1)
+
+    def _unplay_block(self, block):
+        for reel in [block.start_bump, *block.comms, block.end_bump]:
+            if reel is not None:
+                self._unplayed(reel)
+
+    def _exact_fill(self, tag, seconds, when):
+        # the least played reels that add up closest to seconds, with their counts bumped
+        index = self._candidate_index(tag)
+        reels = ReelFiller.solve(index.fitting(seconds, when, ReelFiller.max_candidates), seconds)
+        for reel in reels:
+            index.played(reel)
+        return reels
+
     def gather_clip_content(self, tag, duration, when):
         current_duration = 0
         keep_going = True
@@ -497,7 +670,7 @@ class ShowCatalog:
     def summary_data(self):
         count = 0
         for tag in self.tags:
-            if type(self.clip_index[tag]) is list:
+            if isinstance(self.clip_index[tag], (list, ColumnarTag)):
                 count += len(self.clip_index[tag])
             else:
                 count += 1
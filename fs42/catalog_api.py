@@ -21,6 +21,18 @@ class CatalogAPI:
         CatalogAPI.delete_catalog(station_config)
         CatalogIO().put_catalog_entries(station_config["network_name"], entries)
 
+    @staticmethod
+    def sync_entries(station_config, entries: list[CatalogEntry]):
+        return CatalogIO().sync_catalog_entries(station_config["network_name"], entries)
+
+    @staticmethod
+    def upsert_entries(station_config, entries: list[CatalogEntry]):
+        CatalogIO().upsert_catalog_entries(station_config["network_name"], entries)
+
+    @staticmethod
+    def remove_paths(station_config, paths: list[str]):
+        CatalogIO().delete_entries_by_paths(station_config["network_name"], paths)
+
     @staticmethod
     def search_entries(station_config, query: str):
         return CatalogIO().search_catalog_entries(station_config["network_name"], query)
@@ -29,6 +41,34 @@ class CatalogAPI:
     def get_entries(station_config):
         return CatalogIO().get_catalog_entries(station_config["network_name"])
 
+    @staticmethod
+    def count_entries(station_config):
+        return CatalogIO().count_catalog_entries(station_config["network_name"])
+
+    @staticmethod
+    def get_columns(station_config):
+        return CatalogIO().get_catalog_columns(station_config["network_name"])
+
+    @staticmethod
+    def get_entry_paths(station_config, entry_ids):
+        return CatalogIO().get_entry_paths(station_config["network_name"], entry_ids)
+
+    @staticmethod
+    def get_tag_realpaths(station_config, tag):
+        return CatalogIO().get_tag_realpaths(station_config["network_name"], tag)
+
+    @staticmethod
+    def get_ids_by_path(station_config, tag, paths):
+        return CatalogIO().get_ids_by_path(station_config["network_name"], tag, paths)
+
+    @staticmethod
+    def get_hint_masks(keys):
+        return CatalogIO().get_hint_masks(keys)
+
+    @staticmethod
+    def put_hint_masks(masks):
+        CatalogIO().put_hint_masks(masks)
+
     @staticmethod
     def get_by_tag(station_config, tag):
         return CatalogIO().get_by_tag(station_config["network_name"], tag)
@@ -51,6 +91,10 @@ class CatalogAPI:
     @staticmethod
     def get_entry_by_id(entry_id):
         return CatalogIO().entry_by_id(entry_id)
+
+    @staticmethod
+    def get_entries_by_ids(entry_ids):
+        return CatalogIO().entries_by_ids(entry_ids)
     
     @staticmethod
     def find_best_candidates(station_config, tag: str, max_duration: float):
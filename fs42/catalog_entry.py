@@ -1,5 +1,7 @@
 import os
+import sys
 import json
+import datetime
 
 from fs42 import schedule_hint
 
@@ -13,9 +15,29 @@ class NoFillerContentFound(Exception):
 
 
 class CatalogEntry:
+    # slots keep big catalogs small - there is no per-instance dict
+    __slots__ = (
+        "path",
+        "realpath",
+        "title",
+        "duration",
+        "tag",
+        "count",
+        "hints",
+        "station",
+        "dbid",
+        "created_at",
+        "updated_at",
+    )
+
+    # stored hints JSON to decoded hints - a catalog only has a handful of distinct hint sets,
+    # so each is decoded once and the same tuple is handed to every entry that uses it
+    _decoded_hints = {}
+
     # CatalogEntry(row[2], row[3], float(row[4]), json.loads(row[6]) if row[6] else [])
     def __init__(self, path, duration, tag, hints=[], count=0):
-        self.path = path
+        # the same paths turn up in catalogs and schedules over and over, so share one copy of each
+        self.path = sys.intern(path)
         self.realpath = None
         # get the show name from the path
         self.title = os.path.splitext(os.path.basename(path))[0]
@@ -36,16 +58,22 @@ class CatalogEntry:
         # Convert the entry to a JSON serializable dictionary
         return {
             "dbid": self.dbid,
+            "station": self.station,
             "path": self.path,
             "title": self.title,
             "duration": self.duration,
             "tag": self.tag,
             "count": self.count,
             "hints": [hint.toJSON() for hint in self.hints],  # Convert each hint to JSON
-            "created_at": self.created_at.isoformat() if self.created_at else None,
-            "updated_at": self.updated_at.isoformat() if self.updated_at else None,
+            # entries read from the database carry sqlite's timestamp text as it is
+            "created_at": CatalogEntry._timestamp_json(self.created_at),
+            "updated_at": CatalogEntry._timestamp_json(self.updated_at),
         }
 
+    @staticmethod
+    def _timestamp_json(value):
+        return value.isoformat() if isinstance(value, datetime.datetime) else value
+
     @staticmethod
     def from_json_dict(json_data):
         # Create an entry from a JSON serializable dictionary
@@ -74,45 +102,55 @@ class CatalogEntry:
 
 
         entry = CatalogEntry(path, duration, tag, None)
-        entry.realpath = realpath
+        entry.realpath = sys.intern(realpath) if realpath else realpath
         entry.count = count
         entry.dbid = dbid
         entry.station = station
         entry.created_at = created
         entry.updated_at = updated
 
+        entry.hints = CatalogEntry._decode_hints(hints_str)
+        return entry
+
+    @staticmethod
+    def _decode_hints(hints_str) -> tuple:
+        """Hint objects for the stored hints JSON, as a tuple shared by every entry with the same hints"""
+        if not hints_str:
+            return ()
+        if hints_str in CatalogEntry._decoded_hints:
+            return CatalogEntry._decoded_hints[hints_str]
+
         hints = []
-        # Load hints from JSON
-        if hints_str:
-            try:
-                # Parse the JSON string back to list
-                loaded_hints = json.loads(hints_str)
-
-                if not isinstance(loaded_hints, list):
-                    loaded_hints = []
-
-                for hint_str in loaded_hints:
-                    hint = json.loads(hint_str)
-                    # Convert each hint JSON back to its object
-                    if isinstance(hint, dict) and "type" in hint:
-                        if hint["type"] == "day_part":
-                            hints.append(schedule_hint.DayPartHint(hint["part"]))
-                        elif hint["type"] == "bump":
-                            hints.append(schedule_hint.BumpHint(hint["where"]))
-                        elif hint["type"] == "range":
-                            hints.append(schedule_hint.RangeHint(hint["range_string"]))
-                        elif hint["type"] == "quarter":
-                            hints.append(schedule_hint.QuarterHint(hint["range_string"]))
-                        elif hint["type"] == "month":
-                            hints.append(schedule_hint.MonthHint(hint["month"]))
-                        else:
-                            print(f"Warning: Unknown hint type {hint['type']}. Skipping.")
+        try:
+            # Parse the JSON string back to list
+            loaded_hints = json.loads(hints_str)
+
+            if not isinstance(loaded_hints, list):
+                loaded_hints = []
+
+            for hint_str in loaded_hints:
+                hint = json.loads(hint_str)
+                # Convert each hint JSON back to its object
+                if isinstance(hint, dict) and "type" in hint:
+                    if hint["type"] == "day_part":
+                        hints.append(schedule_hint.DayPartHint(hint["part"]))
+                    elif hint["type"] == "bump":
+                        hints.append(schedule_hint.BumpHint(hint["where"]))
+                    elif hint["type"] == "range":
+                        hints.append(schedule_hint.RangeHint(hint["range_string"]))
+                    elif hint["type"] == "quarter":
+                        hints.append(schedule_hint.QuarterHint(hint["quarter"]))
+                    elif hint["type"] == "month":
+                        hints.append(schedule_hint.MonthHint(hint["month"]))
                     else:
-                        print(f"Warning: Invalid hint format {hint}. Skipping.")
-            except (json.JSONDecodeError, TypeError) as e:
-                print(f"Warning: Failed to decode hints from string '{hints_str}'. Using empty hints list.")
-                print(f"Error: {e}")
-                hints = []
-
-        entry.hints = hints
-        return entry
+                        print(f"Warning: Unknown hint type {hint['type']}. Skipping.")
+                else:
+                    print(f"Warning: Invalid hint format {hint}. Skipping.")
+        except (json.JSONDecodeError, TypeError) as e:
+            print(f"Warning: Failed to decode hints from string '{hints_str}'. Using empty hints list.")
+            print(f"Error: {e}")
+            hints = []
+
+        hints = tuple(hints)
+        CatalogEntry._decoded_hints[hints_str] = hints
+        return hints
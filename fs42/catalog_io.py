@@ -1,9 +1,9 @@
-import sqlite3
 import json
 import os
 import logging
 
 from fs42.station_manager import StationManager
+from fs42.db import DB
 from fs42.catalog_entry import CatalogEntry
 
 
@@ -11,68 +11,76 @@ class CatalogIO:
     def __init__(self):
         self.db_path = StationManager().server_conf["db_path"]
         self._l = logging.getLogger("CATIO")
-        self._init_catalog_table()
 
-    def _init_catalog_table(self):
+    @staticmethod
+    def create_tables(connection):
         """
         Creates a database table to hold CatalogEntry records.
         Each record is associated with a station (text string).
         """
-        with sqlite3.connect(self.db_path) as connection:
-            cursor = connection.cursor()
-
-            # Create the table with new schema
-            cursor.execute("""CREATE TABLE IF NOT EXISTS catalog_entries (
-                                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                                station TEXT NOT NULL,
-                                path TEXT NOT NULL,
-                                title TEXT NOT NULL,
-                                duration REAL NOT NULL,
-                                tag TEXT NOT NULL,
-                                count INTEGER DEFAULT 0,
-                                hints TEXT,
-                                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                                realpath TEXT,
-                                UNIQUE(station, tag, path)
-                                )
-                            """)
-
-            # Check if realpath column exists, add it if it doesn't
-            cursor.execute("PRAGMA table_info(catalog_entries)")
-            columns = [column[1] for column in cursor.fetchall()]
-
-            if "realpath" not in columns:
-                self._l.info("Adding realpath column to catalog_entries table")
-                cursor.execute("ALTER TABLE catalog_entries ADD COLUMN realpath TEXT")
-
-                # Populate realpath for existing entries
-                cursor.execute("SELECT id, path FROM catalog_entries WHERE realpath IS NULL")
-                rows = cursor.fetchall()
-                for row_id, path in rows:
-                    try:
-                        realpath = os.path.realpath(path)
-                        cursor.execute("UPDATE catalog_entries SET realpath = ? WHERE id = ?", (realpath, row_id))
-                    except Exception as e:
-                        self._l.warning(f"Could not compute realpath for {path}: {e}")
-
-                connection.commit()
-                self._l.info(f"Updated realpath for {len(rows)} existing entries")
-
-            # Create indexes
-            cursor.execute("""CREATE INDEX IF NOT EXISTS idx_catalog_station 
-                            ON catalog_entries(station)""")
-            cursor.execute("""CREATE INDEX IF NOT EXISTS idx_catalog_tag 
-                            ON catalog_entries(tag)""")
-            cursor.execute("""CREATE INDEX IF NOT EXISTS idx_catalog_path
-                    ON catalog_entries(path)""")
-            cursor.execute("""CREATE INDEX IF NOT EXISTS idx_catalog_tag_duration_count
-                    ON catalog_entries(station, tag, duration, count)""")
-
-            cursor.close()
+        _l = logging.getLogger("CATIO")
+        cursor = connection.cursor()
+
+        # Create the table with new schema
+        cursor.execute("""CREATE TABLE IF NOT EXISTS catalog_entries (
+                            id INTEGER PRIMARY KEY AUTOINCREMENT,
+                            station TEXT NOT NULL,
+                            path TEXT NOT NULL,
+                            title TEXT NOT NULL,
+                            duration REAL NOT NULL,
+                            tag TEXT NOT NULL,
+                            count INTEGER DEFAULT 0,
+                            hints TEXT,
+                            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                            realpath TEXT,
+                            UNIQUE(station, tag, path)
+                            )
+                        """)
+
+        # Check if realpath column exists, add it if it doesn't
+        cursor.execute("PRAGMA table_info(catalog_entries)")
+        columns = [column[1] for column in cursor.fetchall()]
+
+        if "realpath" not in columns:
+            _l.info("Adding realpath column to catalog_entries table")
+            cursor.execute("ALTER TABLE catalog_entries ADD COLUMN realpath TEXT")
+
+            # Populate realpath for existing entries
+            cursor.execute("SELECT id, path FROM catalog_entries WHERE realpath IS NULL")
+            rows = cursor.fetchall()
+            for row_id, path in rows:
+                try:
+                    realpath = os.path.realpath(path)
+                    cursor.execute("UPDATE catalog_entries SET realpath = ? WHERE id = ?", (realpath, row_id))
+                except Exception as e:
+                    _l.warning(f"Could not compute realpath for {path}: {e}")
+
+            _l.info(f"Updated realpath for {len(rows)} existing entries")
+
+        # Create indexes
+        cursor.execute("""CREATE INDEX IF NOT EXISTS idx_catalog_station 
+                        ON catalog_entries(station)""")
+        cursor.execute("""CREATE INDEX IF NOT EXISTS idx_catalog_tag 
+                        ON catalog_entries(tag)""")
+        cursor.execute("""CREATE INDEX IF NOT EXISTS idx_catalog_path
+                ON catalog_entries(path)""")
+        cursor.execute("""CREATE INDEX IF NOT EXISTS idx_catalog_tag_duration_count
+                ON catalog_entries(station, tag, duration, count)""")
+
+        # compiled hint masks, keyed by the stored hints json - see HintMask
+        cursor.execute("""CREATE TABLE IF NOT EXISTS hint_masks (
+                            hints TEXT NOT NULL,
+                            day_parts TEXT NOT NULL,
+                            mask BLOB NOT NULL,
+                            PRIMARY KEY (hints, day_parts)
+                            )
+                        """)
+
+        cursor.close()
 
     def entry_by_id(self, entry_id: int):
-        with sqlite3.connect(self.db_path) as connection:
+        with DB.connect(self.db_path) as connection:
             cursor = connection.cursor()
             cursor.execute(
                 """SELECT * FROM catalog_entries 
@@ -87,45 +95,208 @@ class CatalogIO:
 
             return None
 
-    def put_catalog_entries(self, station_name: str, catalog_entries: list[CatalogEntry]):
-        with sqlite3.connect(self.db_path) as connection:
+    def entries_by_ids(self, entry_ids, chunk_size: int = 900) -> dict:
+        """Entries for all these ids in one go, as id to CatalogEntry - ids not in the catalog are left out"""
+        entry_ids = list(set(entry_ids))
+        entries = {}
+        with DB.connect(self.db_path) as connection:
             cursor = connection.cursor()
+            # stay under sqlite's limit on bound parameters
+            for i in range(0, len(entry_ids), chunk_size):
+                chunk = entry_ids[i : i + chunk_size]
+                cursor.execute(
+                    f"SELECT * FROM catalog_entries WHERE id IN ({','.join('?' * len(chunk))})",
+                    chunk,
+                )
+                for row in cursor.fetchall():
+                    entries[row[0]] = CatalogEntry.from_db_row(row)
+            cursor.close()
+        return entries
+
+    # rows per executemany call when writing catalogs - bounds the memory used by the parameter lists
+    write_chunk = 5000
 
+    @staticmethod
+    def _hints_to_json(hints):
+        # Convert hints list to JSON string for storage
+        encoded = []
+        for hint in hints:
+            encoded.append(json.dumps(hint.toJSON()))
+        return json.dumps(encoded) if encoded else None
+
+    @staticmethod
+    def _hint_encoder():
+        """Returns a _hints_to_json that only encodes each distinct hints list once.
+
+        Every file in a folder shares the hints list made from the folder name,
+        so most of a catalog only needs a handful of encodings.
+        """
+        encoded = {}
+
+        def encode(hints):
+            key = id(hints)
+            if key not in encoded:
+                # keep a reference to the list so its id can't be reused while it is a key
+                encoded[key] = (hints, CatalogIO._hints_to_json(hints))
+            return encoded[key][1]
+
+        return encode
+
+    @staticmethod
+    def _entry_row(station_name, entry: CatalogEntry, encode) -> tuple:
+        return (
+            station_name,
+            entry.path,
+            entry.realpath,
+            entry.title,
+            entry.duration,
+            entry.tag,
+            entry.count,
+            encode(entry.hints),
+        )
+
+    @staticmethod
+    def _chunked(rows, chunk_size):
+        chunk = []
+        for row in rows:
+            chunk.append(row)
+            if len(chunk) >= chunk_size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+    def put_catalog_entries(self, station_name: str, catalog_entries: list[CatalogEntry], chunk_size: int = None):
+        """Write entries as one transaction, replacing any with the same station, tag and path"""
+        chunk_size = chunk_size or CatalogIO.write_chunk
+        encode = CatalogIO._hint_encoder()
+
+        def rows():
             for entry in catalog_entries:
                 if isinstance(entry, CatalogEntry):
-                    # Convert hints list to JSON string for storage
-                    hints = []
-                    for hint in entry.hints:
-                        hint_json = json.dumps(hint.toJSON()) if entry.hints else None
-                        hints.append(hint_json)
-                    hints_json = json.dumps(hints) if hints else None
+                    yield CatalogIO._entry_row(station_name, entry, encode)
+                else:
+                    print(f"Warning: Entry {entry} is not a CatalogEntry instance. Skipping.")
 
-                    # Use INSERT OR REPLACE to overwrite existing entries
+        with DB.connect(self.db_path) as connection:
+            cursor = connection.cursor()
+            cursor.execute("BEGIN TRANSACTION;")
+            for chunk in CatalogIO._chunked(rows(), chunk_size):
+                # Use INSERT OR REPLACE to overwrite existing entries
+                cursor.executemany(
+                    """INSERT OR REPLACE INTO catalog_entries 
+                                (station, path, realpath, title, duration, tag, count, hints, updated_at)
+                                VALUES (?, ?, ?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)""",
+                    chunk,
+                )
+            connection.commit()
+            cursor.close()
 
+    def sync_catalog_entries(self, station_name: str, catalog_entries: list[CatalogEntry]):
+        """
+        Makes the stored catalog for a station match catalog_entries, touching only the rows that differ.
+        Rows are matched on (tag, path), so unchanged and updated rows keep their id and play count.
+        Returns a tuple of (added, removed, changed) counts.
+        """
+        wanted = {}
+        for entry in catalog_entries:
+            if isinstance(entry, CatalogEntry):
+                wanted[(entry.tag, entry.path)] = entry
+            else:
+                print(f"Warning: Entry {entry} is not a CatalogEntry instance. Skipping.")
+
+        with DB.connect(self.db_path) as connection:
+            cursor = connection.cursor()
+            cursor.execute(
+                """SELECT id, tag, path, realpath, title, duration, hints
+                    FROM catalog_entries WHERE station = ?""",
+                (station_name,),
+            )
+
+            encode = CatalogIO._hint_encoder()
+            to_remove = []
+            to_change = []
+            existing = set()
+            for row_id, tag, path, realpath, title, duration, hints_json in cursor.fetchall():
+                key = (tag, path)
+                entry = wanted.get(key)
+                if entry is None:
+                    to_remove.append((row_id,))
+                    continue
+                existing.add(key)
+                entry.dbid = row_id
+                new_hints = encode(entry.hints)
+                if (entry.realpath, entry.title, entry.duration, new_hints) != (realpath, title, duration, hints_json):
+                    to_change.append((entry.realpath, entry.title, entry.duration, new_hints, row_id))
+
+            to_add = []
+            for key, entry in wanted.items():
+                if key not in existing:
+                    to_add.append(CatalogIO._entry_row(station_name, entry, encode))
+
+            # apply everything as a single transaction
+            cursor.executemany("DELETE FROM catalog_entries WHERE id = ?", to_remove)
+            cursor.executemany(
+                """UPDATE catalog_entries
+                    SET realpath = ?, title = ?, duration = ?, hints = ?, updated_at = CURRENT_TIMESTAMP
+                    WHERE id = ?""",
+                to_change,
+            )
+            cursor.executemany(
+                """INSERT INTO catalog_entries
+                            (station, path, realpath, title, duration, tag, count, hints, updated_at)
+                            VALUES (?, ?, ?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)""",
+                to_add,
+            )
+            connection.commit()
+            cursor.close()
+
+        self._l.info(
+            f"Catalog sync for {station_name}: {len(to_add)} added, {len(to_remove)} removed, {len(to_change)} changed"
+        )
+        return (len(to_add), len(to_remove), len(to_change))
+
+    def upsert_catalog_entries(self, station_name: str, catalog_entries: list[CatalogEntry]):
+        """Insert new entries and update existing ones in place - keeping their id and play count."""
+        encode = CatalogIO._hint_encoder()
+        values = [CatalogIO._entry_row(station_name, entry, encode) for entry in catalog_entries]
+        with DB.connect(self.db_path) as connection:
+            cursor = connection.cursor()
+            cursor.executemany(
+                """INSERT INTO catalog_entries
+                            (station, path, realpath, title, duration, tag, count, hints, updated_at)
+                            VALUES (?, ?, ?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
+                    ON CONFLICT(station, tag, path) DO UPDATE SET
+                            realpath = excluded.realpath,
+                            title = excluded.title,
+                            duration = excluded.duration,
+                            hints = excluded.hints,
+                            updated_at = CURRENT_TIMESTAMP""",
+                values,
+            )
+            connection.commit()
+            cursor.close()
+
+    def delete_entries_by_paths(self, station_name: str, paths: list[str]):
+        """Delete entries with these paths - a path ending in / removes everything under that folder."""
+        with DB.connect(self.db_path) as connection:
+            cursor = connection.cursor()
+            for path in paths:
+                if path.endswith("/"):
                     cursor.execute(
-                        """INSERT OR REPLACE INTO catalog_entries 
-                                    (station, path, realpath, title, duration, tag, count, hints, updated_at)
-                                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)""",
-                        (
-                            station_name,
-                            entry.path,
-                            entry.realpath,
-                            entry.title,
-                            entry.duration,
-                            entry.tag,
-                            entry.count,
-                            hints_json,
-                        ),
+                        """DELETE FROM catalog_entries
+                            WHERE station = ? AND substr(path, 1, length(?)) = ?""",
+                        (station_name, path, path),
                     )
-
                 else:
-                    print(f"Warning: Entry {entry} is not a CatalogEntry instance. Skipping.")
-
+                    cursor.execute(
+                        """DELETE FROM catalog_entries WHERE station = ? AND path = ?""", (station_name, path)
+                    )
             connection.commit()
             cursor.close()
 
     def get_catalog_entries(self, station_name: str):
-        with sqlite3.connect(self.db_path) as connection:
+        with DB.connect(self.db_path) as connection:
             cursor = connection.cursor()
 
             cursor.execute(
@@ -147,8 +318,104 @@ class CatalogIO:
 
             return catalog_entries
 
+    def count_catalog_entries(self, station_name: str) -> int:
+        with DB.connect(self.db_path) as connection:
+            cursor = connection.cursor()
+            cursor.execute("SELECT COUNT(*) FROM catalog_entries WHERE station = ?", (station_name,))
+            count = cursor.fetchone()[0]
+            cursor.close()
+            return count
+
+    def get_catalog_columns(self, station_name: str) -> list[tuple]:
+        """(id, duration, tag, count, hints) for every entry, ordered by tag then duration"""
+        with DB.connect(self.db_path) as connection:
+            cursor = connection.cursor()
+            cursor.execute(
+                """SELECT id, duration, tag, count, hints
+                    FROM catalog_entries
+                    WHERE station = ?
+                    ORDER BY tag, duration""",
+                (station_name,),
+            )
+            rows = cursor.fetchall()
+            cursor.close()
+            return rows
+
+    def get_entry_paths(self, station_name: str, entry_ids, chunk_size: int = 900) -> dict:
+        """id to (path, realpath) for these entry ids - ids not in the catalog are left out"""
+        entry_ids = list(set(entry_ids))
+        paths = {}
+        with DB.connect(self.db_path) as connection:
+            cursor = connection.cursor()
+            for i in range(0, len(entry_ids), chunk_size):
+                chunk = entry_ids[i : i + chunk_size]
+                cursor.execute(
+                    f"""SELECT id, path, realpath FROM catalog_entries
+                        WHERE station = ? AND id IN ({','.join('?' * len(chunk))})""",
+                    [station_name, *chunk],
+                )
+                for entry_id, path, realpath in cursor.fetchall():
+                    paths[entry_id] = (path, realpath)
+            cursor.close()
+        return paths
+
+    def get_tag_realpaths(self, station_name: str, tag: str) -> set:
+        with DB.connect(self.db_path) as connection:
+            cursor = connection.cursor()
+            cursor.execute(
+                "SELECT DISTINCT realpath FROM catalog_entries WHERE station = ? AND tag = ? AND realpath IS NOT NULL",
+                (station_name, tag),
+            )
+            realpaths = {row[0] for row in cursor.fetchall() if row[0]}
+            cursor.close()
+        return realpaths
+
+    def get_ids_by_path(self, station_name: str, tag: str, paths, chunk_size: int = 900) -> dict:
+        """path to entry id for the paths in this tag - paths not in it are left out"""
+        paths = list(set(paths))
+        ids = {}
+        with DB.connect(self.db_path) as connection:
+            cursor = connection.cursor()
+            for i in range(0, len(paths), chunk_size):
+                chunk = paths[i : i + chunk_size]
+                cursor.execute(
+                    f"""SELECT path, id FROM catalog_entries
+                        WHERE station = ? AND tag = ? AND path IN ({','.join('?' * len(chunk))})""",
+                    [station_name, tag, *chunk],
+                )
+                ids.update(cursor.fetchall())
+            cursor.close()
+        return ids
+
+    def get_hint_masks(self, keys: set[tuple[str, str]], chunk_size: int = 450) -> dict:
+        """Stored masks for these (hints, day_parts) keys - missing ones are left out"""
+        keys = list(keys)
+        masks = {}
+        with DB.connect(self.db_path) as connection:
+            cursor = connection.cursor()
+            # two bound parameters a key, so chunks stay under sqlite's limit
+            for i in range(0, len(keys), chunk_size):
+                chunk = keys[i : i + chunk_size]
+                cursor.execute(
+                    f"""SELECT hints, day_parts, mask FROM hint_masks
+                        WHERE (hints, day_parts) IN (VALUES {','.join(['(?, ?)'] * len(chunk))})""",
+                    [value for key in chunk for value in key],
+                )
+                for hints, day_parts, mask in cursor.fetchall():
+                    masks[(hints, day_parts)] = bytes(mask)
+            cursor.close()
+        return masks
+
+    def put_hint_masks(self, masks: dict):
+        with DB.connect(self.db_path) as connection:
+            connection.executemany(
+                "INSERT OR REPLACE INTO hint_masks (hints, day_parts, mask) VALUES (?, ?, ?)",
+                [(hints, day_parts, mask) for (hints, day_parts), mask in masks.items()],
+            )
+            connection.commit()
+
     def search_catalog_entries(self, station_name: str, query: str):
-        with sqlite3.connect(self.db_path) as connection:
+        with DB.connect(self.db_path) as connection:
             cursor = connection.cursor()
             cursor.execute(
                 """SELECT * FROM catalog_entries 
@@ -166,14 +433,14 @@ class CatalogIO:
             return catalog_entries
 
     def delete_all_entries_for_station(self, station_name: str):
-        with sqlite3.connect(self.db_path) as connection:
+        with DB.connect(self.db_path) as connection:
             cursor = connection.cursor()
             cursor.execute("""DELETE FROM catalog_entries WHERE station = ?""", (station_name,))
             connection.commit()
             cursor.close()
 
     def get_entry_by_path(self, station_name: str, path: str):
-        with sqlite3.connect(self.db_path) as connection:
+        with DB.connect(self.db_path) as connection:
             cursor = connection.cursor()
             cursor.execute(
                 """SELECT * FROM catalog_entries 
@@ -190,7 +457,7 @@ class CatalogIO:
             return None
 
     def get_by_tag(self, station_name: str, tag: str):
-        with sqlite3.connect(self.db_path) as connection:
+        with DB.connect(self.db_path) as connection:
             cursor = connection.cursor()
             cursor.execute(
                 """SELECT * FROM catalog_entries 
@@ -207,7 +474,7 @@ class CatalogIO:
             return catalog_entries
 
     def update_entry_count(self, station_name: str, path: str, new_count: int):
-        with sqlite3.connect(self.db_path) as connection:
+        with DB.connect(self.db_path) as connection:
             cursor = connection.cursor()
             cursor.execute(
                 """UPDATE catalog_entries 
@@ -220,7 +487,7 @@ class CatalogIO:
 
     # make a function to batch increment counts for multiple entries
     def batch_increment_counts(self, station_name: str, entries: list[CatalogEntry]):
-        with sqlite3.connect(self.db_path) as connection:
+        with DB.connect(self.db_path) as connection:
             cursor = connection.cursor()
             for entry in entries:
                 if isinstance(entry, CatalogEntry):
@@ -236,7 +503,7 @@ class CatalogIO:
             cursor.close()
 
     def find_best_candidates(self, station_name: str, tag: str, max_duration: float):
-        with sqlite3.connect(self.db_path) as connection:
+        with DB.connect(self.db_path) as connection:
             cursor = connection.cursor()
             cursor.execute(
                 """SELECT * FROM catalog_entries 
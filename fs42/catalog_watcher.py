@@ -0,0 +1,203 @@
+import logging
+import os
+
+from inotify_simple import INotify, flags
+
+from fs42.catalog import ShowCatalog
+from fs42.catalog_api import CatalogAPI
+from fs42.catalog_entry import CatalogEntry
+from fs42.fluid_builder import FluidBuilder
+from fs42.media_processor import MediaProcessor
+
+
+class WatchBinding:
+    def __init__(self, station_config, tag, tag_dir, is_bumps=False, recursive=True):
+        self.station_config = station_config
+        self.tag = tag
+        # the folder as the catalog build spells it, so paths match the catalog entries
+        self.tag_dir = tag_dir
+        self.is_bumps = is_bumps
+        self.recursive = recursive
+
+    def __str__(self):
+        return f"WatchBinding: {self.station_config['network_name']} tag={self.tag} dir={self.tag_dir}"
+
+
+class CatalogWatcher:
+    """Keeps station catalogs current by watching their content folders with inotify."""
+
+    # events that mean a file is ready, or gone
+    file_mask = flags.CLOSE_WRITE | flags.MOVED_TO | flags.MOVED_FROM | flags.DELETE
+    # events that mean a folder came or went
+    dir_mask = flags.CREATE | flags.MOVED_TO | flags.MOVED_FROM | flags.DELETE | flags.DELETE_SELF
+
+    def __init__(self, stations, debounce=2.0):
+        self._l = logging.getLogger("WATCHER")
+        self.debounce = debounce
+        self._inotify = INotify()
+        # watch descriptor to real folder path
+        self._watches = {}
+        # real tag folder to the bindings that use it
+        self._bindings = {}
+        self._fluid = FluidBuilder()
+
+        for station in stations:
+            self._bind_station(station)
+
+        for real_root, bindings in self._bindings.items():
+            # stations can share a folder - watch all of it if any of them use sub folders
+            self._watch_tree(real_root, any(binding.recursive for binding in bindings))
+        self._l.info(f"Watching {len(self._watches)} folders for {len(self._bindings)} tag folders")
+
+    def _bind_station(self, station):
+        content_dir = station["content_dir"]
+        match station["network_type"]:
+            case "standard":
+                catalog = ShowCatalog(station, load=False)
+                for tag, is_bumps in catalog.scan_dirs():
+                    self._bind(WatchBinding(station, tag, f"{content_dir}/{tag}", is_bumps))
+            case "loop":
+                # loop channels only use the files directly in the content folder
+                self._bind(WatchBinding(station, "content", content_dir, recursive=False))
+            case _:
+                self._l.debug(f"Not watching {station['network_name']} - no catalog for {station['network_type']}")
+
+    def _bind(self, binding):
+        if not os.path.isdir(binding.tag_dir):
+            self._l.warning(f"Not watching {binding.tag_dir} - folder does not exist")
+            return
+        real_root = os.path.realpath(binding.tag_dir)
+        self._bindings.setdefault(real_root, []).append(binding)
+
+    def _watch_tree(self, path, recursive=True):
+        """Add watches for path and, if recursive, every folder under it. Returns media files found."""
+        found = []
+        for dir_path, dirs, files in os.walk(path, followlinks=True):
+            # match the walker - hidden folders are not part of the catalog
+            dirs[:] = [d for d in dirs if not d.startswith(".")]
+            try:
+                wd = self._inotify.add_watch(dir_path, CatalogWatcher.file_mask | CatalogWatcher.dir_mask)
+                self._watches[wd] = os.path.realpath(dir_path)
+            except OSError as e:
+                self._l.warning(f"Can't watch {dir_path}: {e}")
+            found += [os.path.join(dir_path, f) for f in files if MediaProcessor._is_media(f)]
+            if not recursive:
+                break
+        return found
+
+    def _unwatch_tree(self, path):
+        # a folder moved away keeps its watches, so drop them by hand
+        for wd, watched in list(self._watches.items()):
+            if watched == path or watched.startswith(path + "/"):
+                try:
+                    self._inotify.rm_watch(wd)
+                except OSError:
+                    pass
+                self._watches.pop(wd, None)
+
+    def _bindings_for(self, path):
+        """Returns (binding, path relative to the tag folder) for every binding that covers path."""
+        matches = []
+        for real_root, bindings in self._bindings.items():
+            if path.startswith(real_root + "/"):
+                rel = path[len(real_root) + 1 :]
+                for binding in bindings:
+                    if binding.recursive or "/" not in rel:
+                        matches.append((binding, rel))
+        return matches
+
+    def _read_batch(self):
+        """Block until something happens, then collect events until things are quiet."""
+        events = self._inotify.read()
+        while True:
+            more = self._inotify.read(timeout=int(self.debounce * 1000))
+            if not more:
+                return events
+            events += more
+
+    def _collect(self, events):
+        touched = set()
+        removed_dirs = set()
+        for event in events:
+            if event.mask & flags.IGNORED:
+                self._watches.pop(event.wd, None)
+                continue
+            if event.wd not in self._watches or not event.name or event.name.startswith("."):
+                continue
+
+            path = os.path.join(self._watches[event.wd], event.name)
+            if event.mask & flags.ISDIR:
+                if event.mask & (flags.CREATE | flags.MOVED_TO):
+                    self._l.info(f"Folder added: {path}")
+                    touched.update(self._watch_tree(path))
+                elif event.mask & (flags.DELETE | flags.MOVED_FROM):
+                    self._l.info(f"Folder removed: {path}")
+                    removed_dirs.add(path)
+                    self._unwatch_tree(path)
+            elif MediaProcessor._is_media(event.name):
+                # new files are picked up once they are closed, unless they are links
+                if not event.mask & flags.CREATE or os.path.islink(path):
+                    touched.add(path)
+        return (touched, removed_dirs)
+
+    def _entry_for(self, binding, rel, duration, realpath):
+        path = f"{binding.tag_dir}/{rel}"
+        parts = rel.split("/")
+        hints = []
+        if len(parts) > 1:
+            # files in sub folders pick up hints from the first folder name
+            hints = MediaProcessor._process_hints(parts[0], binding.tag, binding.is_bumps)
+        entry = CatalogEntry(path, duration, binding.tag, hints)
+        entry.realpath = realpath
+        if binding.is_bumps and len(parts) > 1:
+            MediaProcessor._by_position([entry], ShowCatalog.prebump, ShowCatalog.postbump)
+        return entry
+
+    def apply(self, touched, removed_dirs=()):
+        """Probe touched files through the fluid cache and update the catalog rows that match."""
+        # touched paths are in watched (real) folders, the files themselves may be links
+        real_paths = {path: os.path.realpath(path) for path in touched}
+        present = [real_path for real_path in real_paths.values() if os.path.isfile(real_path)]
+        cached = self._fluid.update_files(present)
+
+        upserts = {}
+        removals = {}
+        for path, real_path in real_paths.items():
+            for binding, rel in self._bindings_for(path):
+                station_name = binding.station_config["network_name"]
+                repo_entry = cached.get(real_path)
+                if repo_entry and repo_entry.duration:
+                    entry = self._entry_for(binding, rel, repo_entry.duration, real_path)
+                    upserts.setdefault(station_name, (binding.station_config, []))[1].append(entry)
+                else:
+                    removals.setdefault(station_name, (binding.station_config, []))[1].append(
+                        f"{binding.tag_dir}/{rel}"
+                    )
+
+        for real_dir in removed_dirs:
+            for binding, rel in self._bindings_for(real_dir):
+                station_name = binding.station_config["network_name"]
+                removals.setdefault(station_name, (binding.station_config, []))[1].append(
+                    f"{binding.tag_dir}/{rel}/"
+                )
+
+        for station_name, (conf, entries) in upserts.items():
+            self._l.info(f"Updating {len(entries)} catalog entries for {station_name}")
+            CatalogAPI.upsert_entries(conf, entries)
+
+        for station_name, (conf, paths) in removals.items():
+            self._l.info(f"Removing catalog entries under {len(paths)} paths for {station_name}")
+            CatalogAPI.remove_paths(conf, paths)
+
+    def run(self):
+        self._l.info("Catalog watcher is running - press ctrl-c to stop")
+        while True:
+            events = self._read_batch()
+            (touched, removed_dirs) = self._collect(events)
+            if touched or removed_dirs:
+                self._l.info(f"Processing {len(touched)} changed files and {len(removed_dirs)} removed folders")
+                try:
+                    self.apply(touched, removed_dirs)
+                except Exception as e:
+                    self._l.error("Error applying changes to the catalog")
+                    self._l.exception(e)
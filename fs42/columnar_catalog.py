@@ -0,0 +1,292 @@
+import random
+
+from fs42.catalog_api import CatalogAPI
+from fs42.catalog_entry import CatalogEntry
+from fs42.hint_mask import HintMask
+
+
+class CatalogRows:
+    """Reads the parts of a station's catalog a ColumnarCatalog leaves out of memory"""
+
+    def __init__(self, station_config):
+        self.config = station_config
+
+    def paths(self, ids) -> dict:
+        """id to (path, realpath) for these entry ids"""
+        return CatalogAPI.get_entry_paths(self.config, ids)
+
+    def realpaths(self, tag) -> set:
+        return CatalogAPI.get_tag_realpaths(self.config, tag)
+
+    def ids_for(self, tag, paths) -> dict:
+        """path to entry id for the paths that are in the tag"""
+        return CatalogAPI.get_ids_by_path(self.config, tag, paths)
+
+
+class ColumnarCatalog:
+    """A station's catalog held as NumPy columns instead of one CatalogEntry per row.
+
+    Ids, durations, play counts, tag ids and hint set ids are arrays sorted by tag then
+    duration, so each tag is a slice and picking a candidate is a few vectorized filters
+    and a min over the counts. Paths stay in the database - CatalogEntry objects are only
+    made for the rows that get picked, reading their paths then, and the same object is
+    handed out every time after that. Used for stations whose catalog is over
+    columnar_catalog_entries - see ShowCatalog.load_catalog.
+
+    Entries made here don't carry created_at or updated_at - schedule builds don't use them.
+    """
+
+    def __init__(self, station, rows, source):
+        """rows are (id, duration, tag, count, hints) ordered by tag then duration, and source
+        reads paths back like CatalogRows"""
+        import numpy as np
+
+        self.station = station
+        self.source = source
+        tag_names = []
+        tag_ids = []
+        hint_ids = []
+        # distinct hint sets - 0 is no hints, so it is always allowed
+        self.hint_sets = [()]
+        hint_index = {None: 0, "": 0}
+        for _, _, tag, _, hints_str in rows:
+            if not tag_names or tag_names[-1] != tag:
+                tag_names.append(tag)
+            tag_ids.append(len(tag_names) - 1)
+            hint_id = hint_index.get(hints_str)
+            if hint_id is None:
+                hints = CatalogEntry._decode_hints(hints_str)
+                hint_id = hint_index[hints_str] = len(self.hint_sets) if hints else 0
+                if hints:
+                    self.hint_sets.append(hints)
+            hint_ids.append(hint_id)
+
+        self.ids = np.fromiter((row[0] for row in rows), dtype=np.int64, count=len(rows))
+        self.durations = np.fromiter((row[1] for row in rows), dtype=np.float64, count=len(rows))
+        self.counts = np.fromiter((row[3] or 0 for row in rows), dtype=np.int32, count=len(rows))
+        self.tag_ids = np.array(tag_ids, dtype=np.int16)
+        self.hint_ids = np.array(hint_ids, dtype=np.int32)
+        self.tag_names = tag_names
+        # rows in id order, to find the row for an id
+        self._by_id = np.argsort(self.ids, kind="stable")
+
+        # row to its entry, and id of the entry back to its row, for the rows made so far
+        self._entries = {}
+        self._rows = {}
+        # hour of the year to the hint sets allowed in it
+        self._allowed = {}
+        # (hour, which rows the hints allow) for the last hour asked about - picks come in runs
+        self._allowed_rows = (None, None)
+
+        self.tags = {}
+        bounds = np.searchsorted(self.tag_ids, np.arange(len(tag_names) + 1), side="left")
+        for tag_id, tag in enumerate(tag_names):
+            self.tags[tag] = ColumnarTag(self, tag, int(bounds[tag_id]), int(bounds[tag_id + 1]))
+
+    def __len__(self):
+        return len(self.ids)
+
+    def entry(self, row) -> CatalogEntry:
+        """The entry for a row, made the first time it is asked for - None if it has left the catalog"""
+        entry = self._entries.get(row)
+        if entry is None:
+            entry = self.entries([row])[0]
+        return entry
+
+    def entries(self, rows) -> list:
+        """The entries for these rows, reading the paths of the new ones in one go"""
+        missing = [row for row in rows if row not in self._entries]
+        if missing:
+            paths = self.source.paths([int(self.ids[row]) for row in missing])
+            for row in missing:
+                found = paths.get(int(self.ids[row]))
+                if found is not None:
+                    self._make(row, *found)
+        return [self._entries.get(row) for row in rows]
+
+    def _make(self, row, path, realpath):
+        hint_id = int(self.hint_ids[row])
+        tag = self.tag_names[int(self.tag_ids[row])]
+        entry = CatalogEntry(path, float(self.durations[row]), tag, self.hint_sets[hint_id])
+        entry.count = int(self.counts[row])
+        entry.dbid = int(self.ids[row])
+        entry.station = self.station
+        entry.realpath = realpath
+        self._entries[row] = entry
+        self._rows[id(entry)] = row
+
+    def row_of(self, entry):
+        """The row an entry was made from, or None if it didn't come from here"""
+        return self._rows.get(id(entry))
+
+    def row_for_id(self, entry_id):
+        """The row holding an entry id, or None"""
+        import numpy as np
+
+        index = int(np.searchsorted(self.ids, entry_id, sorter=self._by_id))
+        if index < len(self.ids) and self.ids[self._by_id[index]] == entry_id:
+            return int(self._by_id[index])
+        return None
+
+    def allowed(self, when):
+        """Which hint sets allow a time slot starting at when, indexed by hint set id"""
+        import numpy as np
+
+        hour = HintMask.hour_of_year(when)
+        allowed = self._allowed.get(hour)
+        if allowed is None:
+            allowed = np.array([HintMask.test(hints, when) for hints in self.hint_sets], dtype=bool)
+            self._allowed[hour] = allowed
+        return allowed
+
+    def allowed_rows(self, when):
+        """Which rows the hints allow at when, or None if they all are"""
+        hour = HintMask.hour_of_year(when)
+        if self._allowed_rows[0] != hour:
+            allowed = self.allowed(when)
+            self._allowed_rows = (hour, None if allowed.all() else allowed[self.hint_ids])
+        return self._allowed_rows[1]
+
+    def add_count(self, row, change):
+        count = max(0, int(self.counts[row]) + change)
+        self.counts[row] = count
+        entry = self._entries.get(row)
+        if entry is not None:
+            entry.count = count
+
+
+class ColumnarTag:
+    """One tag of a ColumnarCatalog.
+
+    It reads like the list of entries it stands in for in ShowCatalog.clip_index (though
+    going through all of it makes every entry) and picks candidates like CandidateIndex.
+    """
+
+    # stands in for the count of rows the hints rule out
+    _ruled_out = 2**31 - 1
+
+    def __init__(self, catalog, tag, start, end):
+        self.catalog = catalog
+        self.tag = tag
+        self.start = start
+        self.end = end
+
+    def __len__(self):
+        return self.end - self.start
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError(index)
+        return self.catalog.entry(self.start + index)
+
+    def __iter__(self):
+        # a chunk at a time, so the paths are read in a few queries
+        for start in range(self.start, self.end, 900):
+            yield from self.catalog.entries(range(start, min(start + 900, self.end)))
+
+    def current(self, entries) -> bool:
+        return entries is self
+
+    def realpaths(self) -> set:
+        """The real path of every file in the tag, without making entries"""
+        return self.catalog.source.realpaths(self.tag)
+
+    def entry_for(self, path) -> CatalogEntry:
+        """The entry for a path in this tag, or None"""
+        entry_id = self.catalog.source.ids_for(self.tag, [path]).get(path)
+        row = self.catalog.row_for_id(entry_id) if entry_id is not None else None
+        if row is None or not self.start <= row < self.end:
+            return None
+        return self.catalog.entry(row)
+
+    def _bounds(self, seconds, min_duration):
+        # the rows at least min_duration and shorter than seconds
+        import numpy as np
+
+        durations = self.catalog.durations[self.start : self.end]
+        lo = self.start + int(np.searchsorted(durations, min_duration, side="left"))
+        hi = self.start + int(np.searchsorted(durations, seconds, side="left"))
+        return (lo, hi)
+
+    def _fitting_rows(self, seconds, when, min_duration):
+        # rows at least min_duration and shorter than seconds that the hints allow at when
+        import numpy as np
+
+        (lo, hi) = self._bounds(seconds, min_duration)
+        if lo >= hi:
+            return None
+        allowed = self.catalog.allowed_rows(when)
+        if allowed is None:
+            return np.arange(lo, hi)
+        return lo + np.flatnonzero(allowed[lo:hi])
+
+    def take(self, seconds, when, min_duration=1):
+        """The least played entry at least min_duration and shorter than seconds that the hints
+        allow at when, picked at random among equals, with its count bumped - or None"""
+        import numpy as np
+
+        catalog = self.catalog
+        (lo, hi) = self._bounds(seconds, min_duration)
+        if lo >= hi:
+            return None
+        counts = catalog.counts[lo:hi]
+        allowed = catalog.allowed_rows(when)
+        if allowed is not None:
+            # rows the hints rule out can never be the least played
+            counts = np.where(allowed[lo:hi], counts, ColumnarTag._ruled_out)
+        lowest = counts.min()
+        if lowest == ColumnarTag._ruled_out:
+            return None
+        tied = np.flatnonzero(counts == lowest)
+        row = lo + int(tied[random.randrange(len(tied))])
+        catalog.add_count(row, 1)
+        return catalog.entry(row)
+
+    def fitting(self, seconds, when, limit, min_duration=1) -> list:
+        """Up to limit entries at least min_duration and shorter than seconds that the hints allow
+        at when, from the lowest few play counts, least played first and in random order among
+        equals. Counts are left alone - mark the ones used with played()"""
+        import numpy as np
+
+        rows = self._fitting_rows(seconds, when, min_duration)
+        if rows is None or not len(rows):
+            return []
+        counts = self.catalog.counts[rows]
+        shuffle = np.random.default_rng(random.getrandbits(32)).random(len(rows))
+        order = np.lexsort((shuffle, counts))
+        # the same share of the limit for each count as CandidateIndex.fitting
+        ordered = counts[order]
+        rank = np.arange(len(order)) - np.searchsorted(ordered, ordered, side="left")
+        picked = rows[order[rank < max(1, limit // 4)][:limit]]
+        return [entry for entry in self.catalog.entries([int(row) for row in picked]) if entry is not None]
+
+    def _row(self, entry):
+        row = self.catalog.row_of(entry)
+        if row is None or not self.start <= row < self.end:
+            return None
+        return row
+
+    def played(self, entry) -> bool:
+        """Bump the count of an entry from this tag - False if it isn't in it"""
+        row = self._row(entry)
+        if row is None:
+            return False
+        self.catalog.add_count(row, 1)
+        return True
+
+    def unplayed(self, entry) -> bool:
+        """Take back a play counted for an entry from this tag that didn't air - False if it isn't in it"""
+        row = self._row(entry)
+        if row is None:
+            return False
+        self.catalog.add_count(row, -1)
+        return True
+
+    def hint_sets(self) -> list:
+        """Each distinct set of hints in the tag"""
+        import numpy as np
+
+        used = np.unique(self.catalog.hint_ids[self.start : self.end])
+        return [self.catalog.hint_sets[int(hint_id)] for hint_id in used if hint_id]
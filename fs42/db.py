@@ -0,0 +1,102 @@
+import logging
+import os
+import sqlite3
+import threading
+
+from fs42.station_manager import StationManager
+
+
+def _create_tables(connection):
+    # every table as of the first versioned schema - safe on databases made before versions were kept
+    from fs42.catalog_io import CatalogIO
+    from fs42.fluid_statements import FluidStatements
+    from fs42.liquid_io import LiquidIO
+    from fs42.pod_io import PodIO
+    from fs42.sequence_io import SequenceIO
+
+    CatalogIO.create_tables(connection)
+    LiquidIO.create_tables(connection)
+    SequenceIO.create_tables(connection)
+    PodIO.create_tables(connection)
+    FluidStatements.init_db(connection)
+
+
+class DB:
+    """Shared sqlite connections for the IO classes.
+
+    Each thread of each process keeps one open connection per database file, set up with
+    the pragmas below and a statement cache, so repeated queries skip connecting and
+    re-preparing. The schema is brought up to date the first time a process connects:
+    PRAGMA user_version holds the last migration applied, and only later ones run.
+    Schema changes go in as a new migration at the end of the list - never by editing
+    one that has shipped.
+
+    Use a connection as before, with "with DB.connect(path) as connection:" - the block
+    commits (or rolls back) but leaves the connection open for the next caller.
+    """
+
+    pragmas = {
+        # readers don't block the writer, and a commit doesn't wait on the disk twice
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "mmap_size": 256 * 1024 * 1024,
+        # in KiB when negative
+        "cache_size": -64 * 1024,
+        "temp_store": "MEMORY",
+    }
+    # prepared statements kept per connection
+    cached_statements = 256
+    # seconds to wait on another process' write before giving up
+    timeout = 30
+
+    # (user_version, description, function taking the connection) in the order they apply
+    migrations = [
+        (1, "create tables", _create_tables),
+    ]
+
+    _local = threading.local()
+    _migrated = set()
+    _migrate_lock = threading.Lock()
+
+    @staticmethod
+    def connect(db_path=None) -> sqlite3.Connection:
+        """The open connection to db_path (the configured database by default) for this thread"""
+        if db_path is None:
+            db_path = StationManager().server_conf["db_path"]
+
+        local = DB._local
+        # a forked process can't use its parent's connections
+        if getattr(local, "pid", None) != os.getpid():
+            local.pid = os.getpid()
+            local.connections = {}
+
+        connection = local.connections.get(db_path)
+        if connection is None:
+            connection = sqlite3.connect(db_path, timeout=DB.timeout, cached_statements=DB.cached_statements)
+            for name, value in DB.pragmas.items():
+                connection.execute(f"PRAGMA {name} = {value}")
+            DB.migrate(connection, db_path)
+            local.connections[db_path] = connection
+        return connection
+
+    @staticmethod
+    def migrate(connection, db_path):
+        """Apply the migrations this database hasn't had yet - once per process"""
+        with DB._migrate_lock:
+            if db_path in DB._migrated:
+                return
+            _l = logging.getLogger("DB")
+            # take the write lock first, so two processes starting together don't both migrate
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                version = connection.execute("PRAGMA user_version").fetchone()[0]
+                for number, description, migration in DB.migrations:
+                    if number > version:
+                        _l.info(f"Updating database {db_path} to version {number} - {description}")
+                        migration(connection)
+                        connection.execute(f"PRAGMA user_version = {number}")
+                connection.commit()
+            except Exception:
+                connection.rollback()
+                raise
+            DB._migrated.add(db_path)
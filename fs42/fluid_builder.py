@@ -1,47 +1,135 @@
 import logging
-import sqlite3
 import sys
 import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
 
 sys.path.append(os.getcwd())
 
 from fs42.fluid_statements import FluidStatements
+from fs42.fluid_objects import FileRepoEntry
 from fs42.media_processor import MediaProcessor
+from fs42.probe_engine import ProbeResult
 from fs42.station_manager import StationManager
+from fs42.db import DB
+
+
+def _break_worker(job) -> tuple:
+    # runs inside a pool process - returns (path, break points, error)
+    (path, duration, fast, has_audio) = job
+    try:
+        points = MediaProcessor.black_detect(path, duration, fast=fast, has_audio=has_audio)
+    except Exception as e:
+        return (path, None, f"{type(e).__name__}: {e}")
+    if points is None:
+        return (path, None, "ffmpeg could not detect black frames")
+    return (path, points, None)
+
 
 class FluidBuilder:
+    # real folders scanned by this process and the real paths found in them, so the trim
+    # can tell what is missing without checking the disk again
+    _scanned = {}
+
     def __init__(self, db_path=None):
         if db_path is None:
             self.db_path = StationManager().server_conf["db_path"]
 
         self._l = logging.getLogger("FLUID")
-        with sqlite3.connect(self.db_path) as connection:
-            FluidStatements.init_db(connection)
+        self.break_workers = StationManager().server_conf.get("break_workers") or os.cpu_count() or 1
 
-    def scan_file_cache(self, content_dir):
-        with sqlite3.connect(self.db_path) as connection:
+    def scan_file_cache(self, content_dir, use_fingerprints=True, retry_failures=False):
+        with DB.connect(self.db_path) as connection:
             # read all the files in the content dir
             self._l.info(f"Fluid file cache scan - reading {content_dir}")
-            file_list = MediaProcessor.rich_find_media(content_dir)
+            fingerprints = None
+            if use_fingerprints:
+                # unchanged folders are listed from their fingerprints instead of the disk
+                fingerprints = FluidStatements.get_dir_fingerprints(connection, os.path.realpath(content_dir))
+            file_list = MediaProcessor.rich_find_media(content_dir, fingerprints)
+            FluidBuilder._scanned.setdefault(os.path.realpath(content_dir), set()).update(
+                entry.path for entry in file_list
+            )
             self._l.info(f"Comparing cache against {len(file_list)} files")
-            # add any that aren't there yet
-            FluidStatements.iterate_file_entries(connection, file_list)
+            # add any that aren't there yet, and update any that changed
+            (added, updated, failed) = FluidStatements.iterate_file_entries(connection, file_list, retry_failures)
+            self._l.info(f"File cache: {added} added, {updated} updated, {failed} could not be probed")
+            if fingerprints is not None:
+                FluidStatements.put_dir_fingerprints(connection, fingerprints)
             self._l.info("Checking file meta for stale entries.")
 
+    def update_files(self, full_paths) -> dict:
+        """Bring the cache up to date for just these files and return their entries keyed by path."""
+        entries = []
+        for full_path in full_paths:
+            try:
+                stat = os.stat(full_path)
+            except OSError as e:
+                self._l.warning(f"Can't read {full_path}: {e}")
+                continue
+            entry = FileRepoEntry()
+            entry.path = full_path
+            entry.size = stat.st_size
+            entry.last_mod = stat.st_mtime
+            entries.append(entry)
+
+        results = {}
+        with DB.connect(self.db_path) as connection:
+            FluidStatements.iterate_file_entries(connection, entries)
+            for entry in entries:
+                cached = FluidStatements.check_file_cache(connection, entry.path)
+                if cached:
+                    results[entry.path] = cached
+        return results
+
     def check_file_cache(self, full_path):
-        with sqlite3.connect(self.db_path) as connection:
+        with DB.connect(self.db_path) as connection:
             results = FluidStatements.check_file_cache(connection, full_path)
 
         return results
 
-    def trim_file_cache(self, from_time):
-        with sqlite3.connect(self.db_path) as connection:
-            self._l.info("Trimming fluid file cache")
-            FluidStatements.trim_file_entries(connection, from_time)
+    def known_failure(self, full_path) -> str:
+        """The error from the last probe of this file if it failed and the file hasn't changed since, else None"""
+        with DB.connect(self.db_path) as connection:
+            failure = FluidStatements.get_probe_failure(connection, full_path)
+
+        if failure:
+            (size, last_mod, error) = failure
+            try:
+                stat = os.stat(full_path)
+            except OSError:
+                return None
+            if (stat.st_size, stat.st_mtime) == (size, last_mod):
+                return error
+        return None
+
+    def get_file_meta(self, full_path) -> dict:
+        with DB.connect(self.db_path) as connection:
+            results = FluidStatements.get_file_meta(connection, full_path)
+
+        return results
+
+    @staticmethod
+    def add_scanned(scanned):
+        """Count folders scanned by another process (a catalog build worker) towards the next trim"""
+        for content_dir, paths in scanned.items():
+            FluidBuilder._scanned.setdefault(content_dir, set()).update(paths)
 
-    def scan_breaks(self, dir_path):
-        with sqlite3.connect(self.db_path) as connection:
-            
+    def trim_file_cache(self, from_time) -> bool:
+        """Drop cached files that the scans since from_time didn't find - folders that weren't scanned are left alone.
+        Returns False if nothing was scanned, so there was nothing to trim"""
+        if not FluidBuilder._scanned:
+            self._l.info("No folders were scanned - nothing to trim from the fluid file cache")
+            return False
+        with DB.connect(self.db_path) as connection:
+            self._l.info(f"Trimming fluid file cache under {len(FluidBuilder._scanned)} scanned folders")
+            FluidStatements.trim_file_entries(connection, from_time, FluidBuilder._scanned)
+        FluidBuilder._scanned = {}
+        return True
+
+    def scan_breaks(self, dir_path, fast=False):
+        """Queue break detection for every cached file under dir_path, then work through the queue.
+        Fast detection decodes a small, decimated picture - see MediaProcessor.black_detect"""
+        with DB.connect(self.db_path) as connection:
             self._l.info(f"Scanning directory {dir_path} for breaks")
             if not os.path.isdir(dir_path):
                 raise FileNotFoundError(f"Directory does not exist {dir_path}")
@@ -49,32 +137,75 @@ class FluidBuilder:
             file_list = MediaProcessor._rfind_media(dir_path)
 
             # Check the cache because we require the duration to prococess.
-            file_paths = [os.path.realpath(file) for file in file_list]
-            cached_files = {}
-            for path in file_paths:
-                cached = FluidStatements.check_file_cache(connection, path)
-                if cached:
-                    cached_files[path] = cached
-
+            jobs = {}
             for file in file_list:
                 rfp = os.path.realpath(file)
-                if rfp in cached_files:
-                    cached = cached_files[rfp]
-                    if FluidStatements.get_break_points(connection, rfp):
-                        self._l.info(f"Breaks already exists for {rfp}")
-                    else:
-                        breaks = MediaProcessor.black_detect(rfp, cached.duration)
-                        FluidStatements.add_break_points(connection, rfp, breaks)
-                else:
+                if rfp in jobs:
+                    continue
+                cached = FluidStatements.check_file_cache(connection, rfp)
+                if not cached:
                     self._l.warning(f"{rfp} is not in catalog cache - not adding break points.")
-            connection.commit()
+                elif FluidStatements.has_break_points(connection, rfp):
+                    self._l.info(f"Breaks already exists for {rfp}")
+                else:
+                    jobs[rfp] = cached.duration
+
+            queued = FluidStatements.queue_break_jobs(connection, list(jobs.items()))
+            self._l.info(f"Queued {queued} files for break detection")
+            if queued < len(jobs):
+                self._l.info(f"{len(jobs) - queued} files failed break detection before - not queued again")
+
+        self.process_break_jobs(fast)
+
+    def process_break_jobs(self, fast=False):
+        """Run every pending break detection job, including any left over from an earlier run that stopped.
+        Each file's break points are committed as soon as it finishes."""
+        with DB.connect(self.db_path) as connection:
+            # the probe metadata says whether there is audio to check for silences, saving a probe per file
+            jobs = [
+                (path, duration, fast, ProbeResult.meta_has_audio(FluidStatements.get_file_meta(connection, path)))
+                for path, duration in FluidStatements.get_break_jobs(connection, "pending")
+            ]
+            if not jobs:
+                self._l.info("No pending break detection jobs")
+                return
+
+            workers = min(self.break_workers, len(jobs))
+            self._l.info(f"Running {len(jobs)} break detection jobs with {workers} workers")
+            if workers <= 1:
+                for count, job in enumerate(jobs, start=1):
+                    self._finish_break_job(connection, _break_worker(job), count, len(jobs))
+                return
+
+            executor = ProcessPoolExecutor(max_workers=workers)
+            try:
+                futures = [executor.submit(_break_worker, job) for job in jobs]
+                for count, future in enumerate(as_completed(futures), start=1):
+                    self._finish_break_job(connection, future.result(), count, len(jobs))
+            finally:
+                # on ctrl-c, don't wait for the queue - unfinished jobs stay pending for next time
+                executor.shutdown(wait=True, cancel_futures=True)
+
+    def _finish_break_job(self, connection, result, count, total):
+        (path, points, error) = result
+        FluidStatements.finish_break_job(connection, path, points, error)
+        if error is None:
+            self._l.info(f"[{count}/{total}] Found {len(points)} break segments in {path}")
+        else:
+            self._l.error(f"[{count}/{total}] Break detection failed for {path}: {error}")
 
     def get_breaks(self, full_path):
         #fname = os.path.realpath(fname)
-        with sqlite3.connect(self.db_path) as connection:
+        with DB.connect(self.db_path) as connection:
             results = FluidStatements.get_break_points(connection, full_path)
         return results
 
+    def get_breaks_for(self, full_paths) -> dict:
+        """Break points for all these files in one go, as path to points - files without any are left out"""
+        with DB.connect(self.db_path) as connection:
+            results = FluidStatements.get_break_points_for(connection, list(full_paths))
+        return results
+
 
 if __name__ == "__main__":
     logging.basicConfig(format="%(levelname)s:%(name)s:%(message)s", level=logging.INFO)
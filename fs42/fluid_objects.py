@@ -1,4 +1,5 @@
 import datetime
+import json
 
 
 class FileRepoEntry:
@@ -47,3 +48,30 @@ class FileRepoEntry:
 
     def to_stat_check(self):
         return (self.path, self.size, self.last_mod)
+
+
+class DirFingerprint:
+    def __init__(self, path=None, mtime=None, entry_count=0):
+        self.path: str = path
+        self.mtime: float = mtime
+        self.entry_count: int = entry_count
+        # (name, size, last_mod, symlink target or None) for media files in this folder
+        self.files: list = []
+        # (name, symlink target or None) for sub folders
+        self.dirs: list = []
+        self.changed = False
+        self.seen = False
+
+    def __str__(self):
+        return f"Dir:{self.path}, Mod:{self.mtime}, Entries:{self.entry_count}"
+
+    def from_db_row(self, row):
+        (self.path, self.mtime, self.entry_count, listing) = row
+        listing = json.loads(listing) if listing else {}
+        self.files = [tuple(f) for f in listing.get("files", [])]
+        self.dirs = [tuple(d) for d in listing.get("dirs", [])]
+        return self
+
+    def to_db_row(self):
+        listing = json.dumps({"files": self.files, "dirs": self.dirs})
+        return (self.path, self.mtime, self.entry_count, listing)
@@ -1,15 +1,18 @@
 import logging
 import sqlite3
 import datetime
-import os
 import json
-from fs42.media_processor import MediaProcessor
-from fs42.fluid_objects import FileRepoEntry
+from fs42.probe_engine import ProbeEngine
+from fs42.fluid_objects import FileRepoEntry, DirFingerprint
 
 
 class FluidStatements:
     """Basic static SQL functions for interacting with the Fluid catalog DB"""
 
+    _update_file_meta = """UPDATE file_meta SET duration=?, size=?, last_mod=?, last_updated=?, last_checked=?, meta=?
+        WHERE path=?;
+        """
+
     @staticmethod
     def check_file_cache(connection: sqlite3.Connection, full_path) -> FileRepoEntry:
         """Find full_path and return fullpath if its in the file cache"""
@@ -25,95 +28,175 @@ class FluidStatements:
         return result
 
     @staticmethod
-    def iterate_file_entries(connection: sqlite3.Connection, entries: list[FileRepoEntry]) -> None:
-        """Takes a list of file entries, determines if they are cached and adds them if not."""
+    def iterate_file_entries(
+        connection: sqlite3.Connection, entries: list[FileRepoEntry], retry_failures=False
+    ) -> tuple[int, int, int]:
+        """Takes a list of file entries, determines if they are cached and adds them if not.
 
+        Stats for every entry are loaded with a single join and compared in memory. Only new
+        and changed files are probed, and files that failed before with the same size and
+        modification time are skipped unless retry_failures is set. All writes happen in a
+        single transaction. Returns (added, updated, failed) counts.
+        """
+        _l = logging.getLogger("FLUID")
         cursor = connection.cursor()
-        for entry in entries:
-            # see if there is an entry already
-            cursor.execute("SELECT * FROM file_meta WHERE path = ?;", (entry.path,))
-            row = cursor.fetchone()
-            if row:
-                repo_entry = FileRepoEntry()
-                repo_entry.from_db_row(row)
-
-                # compare it to the stats in the repo
-                if entry != repo_entry:
-                    # then the stats match
-                    
-                    FluidStatements.update_file_entry(connection, entry)
+        cursor.execute("CREATE TEMP TABLE IF NOT EXISTS scan_paths (path TEXT PRIMARY KEY)")
+        cursor.execute("DELETE FROM scan_paths")
+        cursor.executemany("INSERT OR IGNORE INTO scan_paths VALUES (?)", [(entry.path,) for entry in entries])
 
-            else:
-                
-                FluidStatements.add_file_entry(connection, entry)
+        cursor.execute("SELECT f.path, f.size, f.last_mod FROM file_meta f JOIN scan_paths s ON f.path = s.path")
+        known = {path: (size, last_mod) for path, size, last_mod in cursor.fetchall()}
+        cursor.execute(
+            "SELECT f.path, f.size, f.last_mod FROM probe_failures f JOIN scan_paths s ON f.path = s.path"
+        )
+        failures = {path: (size, last_mod) for path, size, last_mod in cursor.fetchall()}
+        cursor.execute("DELETE FROM scan_paths")
         cursor.close()
+        connection.commit()
 
-    @staticmethod
-    def trim_file_entries(connection: sqlite3.Connection, older_than: datetime):
-        """Checks all files in the cache to ensure still on disk and removes them if not."""
-
-        cursor = connection.cursor()
-        cursor.execute("SELECT * FROM file_meta WHERE last_updated < ?;", (older_than,))
-        to_remove = []
-        rows = cursor.fetchall()
-        logging.getLogger("FLUID").info(f"Checking {len(rows)} files on the filesystem")
-        for row in rows:
-            repo_entry = FileRepoEntry()
-            repo_entry.from_db_row(row)
-            if not os.path.exists(repo_entry.path):
-                logging.getLogger("FLUID").info(f"File not found on filesystem - will remove: {repo_entry}")
-                to_remove.append(repo_entry.path)
-
-        connection.execute("BEGIN TRANSACTION;")
+        to_add = []
+        to_update = []
+        skipped = 0
+        queued = set()
+        for entry in entries:
+            stats = (entry.size, entry.last_mod)
+            # links can bring the same file up more than once
+            if entry.path in queued or known.get(entry.path) == stats:
+                continue
+            queued.add(entry.path)
+            if not retry_failures and failures.get(entry.path) == stats:
+                skipped += 1
+                continue
+            if entry.path in known:
+                to_update.append(entry)
+            else:
+                to_add.append(entry)
 
-        for p in to_remove:
-            cursor.execute("DELETE from file_meta WHERE path=?", (p,))
+        if skipped:
+            _l.info(f"Skipping {skipped} files that failed to probe before and haven't changed")
 
-        cursor.close()
-        connection.commit()
+        # probe the new and changed files as one batch
+        (probed, failed) = FluidStatements._probe_all(to_add + to_update)
+        return FluidStatements._write_probed(connection, probed, failed, known)
 
     @staticmethod
-    def update_file_entry(connection: sqlite3.Connection, entry: FileRepoEntry):
-        """An old entry has changed, get the new stats and update it."""
+    def _write_probed(connection: sqlite3.Connection, probed: list, failed: list, known) -> tuple[int, int, int]:
+        """Write probed entries back in one transaction - updating the ones whose paths are in known and
+        adding the rest - and remember the (entry, error) failures. Returns (added, updated, failed) counts."""
+        _l = logging.getLogger("FLUID")
         cursor = connection.cursor()
         now = datetime.datetime.now()
+        add_values = []
+        update_values = []
+        for entry in probed:
+            if entry.path in known:
+                _l.info(f"Updating existing file entry: {entry.path}")
+                update_values.append((entry.duration, entry.size, entry.last_mod, now, now, entry.meta, entry.path))
+            else:
+                entry.first_added = now
+                entry.last_checked = now
+                entry.last_updates = now
+                _l.info(f"Caching new file entry: {entry}")
+                add_values.append(entry.to_db_row())
+        failure_values = [(entry.path, entry.size, entry.last_mod, error, now) for entry, error in failed]
 
-        processed = MediaProcessor.process_one(entry.path, "processing", [])
-        if not processed:
-            return False
-        entry.duration = processed.duration
-
-        logging.getLogger("FLUID").info(f"Updating existing file entry: {entry.path}")
-
-        update = """UPDATE file_meta SET duration=?, size=?, last_mod=?, last_updated=?, last_checked=? 
-        WHERE path=?;
-        """
-        values = (entry.duration, entry.size, entry.last_mod, now, now, entry.path)
-        cursor.execute(update, values)
+        # and write it all back together
+        cursor.execute("BEGIN TRANSACTION;")
+        cursor.executemany("INSERT INTO file_meta VALUES (?, ?, ?, ?, ?, ?, ?, ?);", add_values)
+        cursor.executemany(FluidStatements._update_file_meta, update_values)
+        cursor.executemany("REPLACE INTO probe_failures VALUES (?, ?, ?, ?, ?)", failure_values)
+        cursor.executemany("DELETE FROM probe_failures WHERE path = ?", [(entry.path,) for entry in probed])
         cursor.close()
         connection.commit()
+        return (len(add_values), len(update_values), len(failure_values))
 
     @staticmethod
-    def add_file_entry(connection: sqlite3.Connection, entry: FileRepoEntry):
-        """This file isn't in the cache - add it."""
+    def get_probe_failure(connection: sqlite3.Connection, full_path) -> tuple:
+        """Get (size, last_mod, error) from the last failed probe of this file, or None"""
         cursor = connection.cursor()
-        now = datetime.datetime.now()
+        cursor.execute("SELECT size, last_mod, error FROM probe_failures WHERE path = ?;", (full_path,))
+        row = cursor.fetchone()
+        cursor.close()
+        return row
 
-        entry.first_added = now
-        entry.last_checked = now
-        entry.last_updates = now
+    @staticmethod
+    def get_file_meta(connection: sqlite3.Connection, full_path) -> dict:
+        """Get the stored probe metadata for this file - empty if it was never probed or predates metadata"""
+        cursor = connection.cursor()
+        cursor.execute("SELECT meta FROM file_meta WHERE path = ?;", (full_path,))
+        row = cursor.fetchone()
+        result = {}
+        if row and row[0]:
+            result = json.loads(row[0])
+        cursor.close()
+        return result
 
-        processed = MediaProcessor.process_one(entry.path, "processing", [])
-        if not processed:
-            return False
+    @staticmethod
+    def trim_file_entries(connection: sqlite3.Connection, older_than: datetime, scanned: dict) -> int:
+        """Removes cached files under the scanned folders that the scan didn't find.
 
-        entry.duration = processed.duration
+        scanned maps each real folder that was walked to the set of paths found under it.
+        Nothing outside those folders is touched, and nothing is checked on disk - the walk
+        already did that. Returns the number of file entries removed.
+        """
+        cursor = connection.cursor()
+        cursor.execute("CREATE TEMP TABLE IF NOT EXISTS keep_paths (path TEXT PRIMARY KEY)")
+        cursor.execute("DELETE FROM keep_paths")
+        for found in scanned.values():
+            cursor.executemany("INSERT OR IGNORE INTO keep_paths VALUES (?)", ((path,) for path in found))
 
-        logging.getLogger("FLUID").info(f"Caching new file entry: {entry}")
+        removed = 0
+        for root in scanned:
+            prefix = root.rstrip("/") + "/"
+            # substr rather than LIKE, so the match is case sensitive like the file system
+            cursor.execute(
+                """DELETE FROM file_meta WHERE last_updated < ?
+                    AND substr(path, 1, ?) = ? AND path NOT IN (SELECT path FROM keep_paths)""",
+                (older_than, len(prefix), prefix),
+            )
+            removed += cursor.rowcount
+            cursor.execute(
+                """DELETE FROM probe_failures WHERE last_checked < ?
+                    AND substr(path, 1, ?) = ? AND path NOT IN (SELECT path FROM keep_paths)""",
+                (older_than, len(prefix), prefix),
+            )
 
-        cursor.execute("INSERT INTO file_meta VALUES (?, ?, ?, ?, ?, ?, ?, ?);", entry.to_db_row())
+        cursor.execute("DELETE FROM keep_paths")
         cursor.close()
         connection.commit()
+        logging.getLogger("FLUID").info(f"Removed {removed} files that are no longer on disk from the cache")
+        return removed
+
+    @staticmethod
+    def _probe_all(entries: list[FileRepoEntry]) -> tuple[list, list]:
+        """Sets the duration on each entry using the probe engine.
+        Returns the entries that succeeded and (entry, error) for the ones that didn't."""
+        probed = []
+        failed = []
+        for entry, result in zip(entries, ProbeEngine().probe([entry.path for entry in entries])):
+            if result.error:
+                logging.getLogger("FLUID").error(f"Error probing {entry.path}: {result.error}")
+                failed.append((entry, result.error))
+            elif result.duration > 0:
+                entry.duration = result.duration
+                entry.meta = json.dumps(result.meta, separators=(",", ":")) if result.meta else ""
+                probed.append(entry)
+            else:
+                logging.getLogger("FLUID").warning(f"Could not get a duration for {entry.path}")
+                failed.append((entry, "no duration"))
+        return (probed, failed)
+
+    @staticmethod
+    def update_file_entry(connection: sqlite3.Connection, entry: FileRepoEntry):
+        """An old entry has changed, get the new stats and update it."""
+        (probed, failed) = FluidStatements._probe_all([entry])
+        return FluidStatements._write_probed(connection, probed, failed, {entry.path})[1] == 1
+
+    @staticmethod
+    def add_file_entry(connection: sqlite3.Connection, entry: FileRepoEntry):
+        """This file isn't in the cache - add it."""
+        (probed, failed) = FluidStatements._probe_all([entry])
+        return FluidStatements._write_probed(connection, probed, failed, set())[0] == 1
 
     @staticmethod
     def add_break_points(connection: sqlite3.Connection, path: str, points: dict):
@@ -137,6 +220,31 @@ class FluidStatements:
         cursor.close()
         return result
     
+    @staticmethod
+    def get_break_points_for(connection: sqlite3.Connection, paths: list[str], chunk_size: int = 900) -> dict:
+        """Break points for each of these paths that has them, as path to points"""
+        cursor = connection.cursor()
+        result = {}
+        # stay under sqlite's limit on bound parameters
+        for i in range(0, len(paths), chunk_size):
+            chunk = paths[i : i + chunk_size]
+            cursor.execute(
+                f"SELECT path, points FROM break_points WHERE path IN ({','.join('?' * len(chunk))})", chunk
+            )
+            for path, points in cursor.fetchall():
+                result[path] = json.loads(points)
+        cursor.close()
+        return result
+
+    @staticmethod
+    def has_break_points(connection: sqlite3.Connection, path: str) -> bool:
+        """True if break detection has stored points for this file - even if it found none"""
+        cursor = connection.cursor()
+        cursor.execute("SELECT 1 FROM break_points WHERE path=?", (path,))
+        row = cursor.fetchone()
+        cursor.close()
+        return row is not None
+
     def delete_break_points(connection: sqlite3.Connection, path: str):
         """Delete any break points for this file"""
         cursor = connection.cursor()
@@ -144,6 +252,84 @@ class FluidStatements:
         cursor.close()
         connection.commit()
 
+    @staticmethod
+    def queue_break_jobs(connection: sqlite3.Connection, jobs: list[tuple]) -> int:
+        """Queue (path, duration) jobs for break detection - finished jobs are queued again, failed ones are not"""
+        cursor = connection.cursor()
+        now = datetime.datetime.now()
+        cursor.executemany(
+            """INSERT INTO break_jobs VALUES (?, ?, 'pending', NULL, ?, ?)
+                ON CONFLICT(path) DO UPDATE SET status = 'pending', duration = excluded.duration, updated_at = ?
+                WHERE break_jobs.status = 'done'""",
+            [(path, duration, now, now, now) for path, duration in jobs],
+        )
+        queued = cursor.rowcount
+        cursor.close()
+        connection.commit()
+        return queued
+
+    @staticmethod
+    def get_break_jobs(connection: sqlite3.Connection, status="pending") -> list[tuple]:
+        """Get (path, duration) for the break detection jobs with this status, oldest first"""
+        cursor = connection.cursor()
+        cursor.execute("SELECT path, duration FROM break_jobs WHERE status = ? ORDER BY queued_at, path", (status,))
+        jobs = cursor.fetchall()
+        cursor.close()
+        return jobs
+
+    @staticmethod
+    def finish_break_job(connection: sqlite3.Connection, path: str, points, error: str = None):
+        """Store the break points for a job and mark it done, or failed if there was an error, in one commit"""
+        cursor = connection.cursor()
+        now = datetime.datetime.now()
+        if error is None:
+            cursor.execute("REPLACE INTO break_points VALUES(?, ?, ?)", (path, json.dumps(points), now))
+            cursor.execute(
+                "UPDATE break_jobs SET status = 'done', error = NULL, updated_at = ? WHERE path = ?", (now, path)
+            )
+        else:
+            cursor.execute(
+                "UPDATE break_jobs SET status = 'failed', error = ?, updated_at = ? WHERE path = ?", (error, now, path)
+            )
+        cursor.close()
+        connection.commit()
+
+    @staticmethod
+    def _under(path: str) -> str:
+        """LIKE pattern (with a backslash escape) that matches everything inside the folder at path"""
+        escaped = path.rstrip("/").replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+        return f"{escaped}/%"
+
+    @staticmethod
+    def get_dir_fingerprints(connection: sqlite3.Connection, root: str) -> dict:
+        """Get the stored fingerprints for root and every folder under it, keyed by path"""
+        cursor = connection.cursor()
+        cursor.execute(
+            "SELECT path, mtime, entry_count, listing FROM dir_fingerprints WHERE path = ? OR path LIKE ? ESCAPE '\\'",
+            (root, FluidStatements._under(root)),
+        )
+        fingerprints = {}
+        prefix = root.rstrip("/") + "/"
+        for row in cursor.fetchall():
+            # LIKE ignores case, so recheck the prefix here
+            if row[0] == root or row[0].startswith(prefix):
+                fingerprint = DirFingerprint().from_db_row(row)
+                fingerprints[fingerprint.path] = fingerprint
+        cursor.close()
+        return fingerprints
+
+    @staticmethod
+    def put_dir_fingerprints(connection: sqlite3.Connection, fingerprints: dict):
+        """Store changed fingerprints and drop the ones for folders that weren't seen in the walk"""
+        cursor = connection.cursor()
+        now = datetime.datetime.now()
+        changed = [fp.to_db_row() + (now,) for fp in fingerprints.values() if fp.changed]
+        missing = [(fp.path,) for fp in fingerprints.values() if not fp.seen]
+        cursor.executemany("REPLACE INTO dir_fingerprints VALUES (?, ?, ?, ?, ?)", changed)
+        cursor.executemany("DELETE FROM dir_fingerprints WHERE path = ?", missing)
+        cursor.close()
+        connection.commit()
+
     @staticmethod
     def init_db(connection: sqlite3.Connection):
         cursor = connection.cursor()
@@ -166,4 +352,32 @@ class FluidStatements:
                             )
                        """)
 
+        cursor.execute("""CREATE TABLE IF NOT EXISTS break_jobs (
+                            path TEXT PRIMARY KEY,
+                            duration REAL,
+                            status TEXT,
+                            error TEXT,
+                            queued_at TIMESTAMP,
+                            updated_at TIMESTAMP
+                            )
+                       """)
+
+        cursor.execute("""CREATE TABLE IF NOT EXISTS probe_failures (
+                            path TEXT PRIMARY KEY,
+                            size INTEGER,
+                            last_mod TIMESTAMP,
+                            error TEXT,
+                            last_checked TIMESTAMP
+                            )
+                       """)
+
+        cursor.execute("""CREATE TABLE IF NOT EXISTS dir_fingerprints (
+                            path TEXT PRIMARY KEY,
+                            mtime REAL,
+                            entry_count INTEGER,
+                            listing TEXT,
+                            last_updated TIMESTAMP
+                            )
+                       """)
+
         cursor.close()
@@ -2,10 +2,8 @@ import threading
 import uuid
 from fastapi import APIRouter, Request
 from fs42.station_manager import StationManager
-from fs42.catalog_api import CatalogAPI
 from fs42.liquid_manager import LiquidManager
-from fs42.liquid_schedule import LiquidSchedule
-from fs42.catalog import ShowCatalog
+from fs42.parallel_build import ParallelBuild, ParallelCatalogBuild
 
 router = APIRouter(prefix="/build", tags=["build"])
 
@@ -33,18 +31,32 @@ async def rebuild_catalog(network_name: str, request: Request):
             else:
                 to_rebuild = [StationManager().station_by_name(network_name)]
 
+            # schedules point at catalog entries, so they all go before any catalog is rebuilt
             for station in to_rebuild:
                 if station["_has_schedule"]:
                     with rebuild_tasks_lock:
                         rebuild_tasks[task_id]["log"] += f"Deleting schedule for {station['network_name']}\n"
                         LiquidManager().reset_schedule(station, False)
                     with rebuild_tasks_lock:
-                        rebuild_tasks[task_id]["log"] += f"Deleted schedule {station['network_name']} - rebuilding catalog now.\n"
-                if station["_has_catalog"]:
-                    CatalogAPI.delete_catalog(station)
-                    ShowCatalog(station, rebuild_catalog=True)
-                    with rebuild_tasks_lock:
-                        rebuild_tasks[task_id]["log"] += f"Rebuilt catalog for {station['network_name']}\n"
+                        rebuild_tasks[task_id]["log"] += f"Deleted schedule {station['network_name']}\n"
+
+            def on_progress(station_name, line):
+                with rebuild_tasks_lock:
+                    rebuild_tasks[task_id]["log"] += f"[{station_name}] {line}\n"
+
+            def on_result(result):
+                with rebuild_tasks_lock:
+                    if result.ok:
+                        rebuild_tasks[task_id]["log"] += f"Rebuilt catalog for {result.station}\n"
+                    else:
+                        rebuild_tasks[task_id]["log"] += f"Failed to rebuild catalog for {result.station}: {result.error}\n"
+
+            build = ParallelCatalogBuild(to_rebuild)
+            with rebuild_tasks_lock:
+                rebuild_tasks[task_id]["log"] += f"Rebuilding {len(build.stations)} catalogs, {build.workers} at a time\n"
+            failed = [result.station for result in build.run(on_result=on_result, on_progress=on_progress) if not result.ok]
+            if failed:
+                raise Exception(f"Could not rebuild catalogs for {', '.join(failed)}")
 
             with rebuild_tasks_lock:
                 rebuild_tasks[task_id]["status"] = "done"
@@ -85,12 +97,25 @@ async def add_time_to_schedule(amount: str, request: Request):
             with add_time_tasks_lock:
                 add_time_tasks[task_id]["status"] = "running"
             
-            for station in stations:
-                if station["_has_schedule"]:
-                    with add_time_tasks_lock:
-                        add_time_tasks[task_id]["log"] += f"Adding {amount} to schedule for {station['network_name']}\n"
-                    liquid = LiquidSchedule(station)
-                    liquid.add_amount(amount)
+            build = ParallelBuild(stations)
+            with add_time_tasks_lock:
+                for station in build.stations:
+                    add_time_tasks[task_id]["log"] += f"Adding {amount} to schedule for {station['network_name']}\n"
+
+            def on_progress(station_name, line):
+                with add_time_tasks_lock:
+                    add_time_tasks[task_id]["log"] += f"[{station_name}] {line}\n"
+
+            def on_result(result):
+                with add_time_tasks_lock:
+                    if result.ok:
+                        add_time_tasks[task_id]["log"] += f"Added {amount} to schedule for {result.station}\n"
+                    else:
+                        add_time_tasks[task_id]["log"] += f"Failed to add {amount} to {result.station}: {result.error}\n"
+
+            failed = [result.station for result in build.run(amount, on_result=on_result, on_progress=on_progress) if not result.ok]
+            if failed:
+                raise Exception(f"Could not add {amount} to {', '.join(failed)}")
 
             with add_time_tasks_lock:
                 add_time_tasks[task_id]["status"] = "done"
@@ -4,6 +4,12 @@ from fs42.catalog_api import CatalogAPI
 
 router = APIRouter(prefix="/catalogs", tags=["catalogs"])
 
+
+def _entries_json(entries):
+    # catalog entries are slotted, so FastAPI can't encode them on its own
+    return [entry.toJSON() for entry in entries] if entries else entries
+
+
 @router.get("/search_all")
 async def search_all_catalogs(query: str = None):
     station_manager = StationManager()
@@ -20,7 +26,7 @@ async def search_all_catalogs(query: str = None):
                 if catalog_entries:
                     all_results.append({
                         "network_name": station["network_name"],
-                        "catalog_entries": catalog_entries
+                        "catalog_entries": _entries_json(catalog_entries)
                     })
             except Exception as e:
                 all_results.append({
@@ -35,7 +41,7 @@ async def search_all_catalogs(query: str = None):
 async def get_catalog(network_name: str):
     conf = StationManager().station_by_name(network_name)
     catalog_entries = CatalogAPI.get_entries(conf)
-    return {"network_name": network_name, "catalog_entries": catalog_entries}
+    return {"network_name": network_name, "catalog_entries": _entries_json(catalog_entries)}
 
 @router.get("/search/{network_name}")
 async def search_catalog(network_name: str, query: str = None):
@@ -45,4 +51,4 @@ async def search_catalog(network_name: str, query: str = None):
     else:
         catalog_entries = CatalogAPI.get_entries(conf)
 
-    return {"network_name": network_name, "query": query, "catalog_entries": catalog_entries}
+    return {"network_name": network_name, "query": query, "catalog_entries": _entries_json(catalog_entries)}
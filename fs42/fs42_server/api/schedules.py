@@ -5,6 +5,34 @@ from fs42.liquid_api import LiquidAPI
 
 router = APIRouter(prefix="/schedules", tags=["schedules"])
 
+
+def _blocks_json(blocks):
+    # the catalog entries and plan entries in a block are slotted, so FastAPI can't encode them on its own
+    def entry_json(entry):
+        return entry.toJSON() if entry is not None else None
+
+    encoded = []
+    for block in blocks or []:
+        data = dict(vars(block))
+        if isinstance(block.content, list):
+            data["content"] = [entry_json(entry) for entry in block.content]
+        else:
+            data["content"] = entry_json(block.content)
+        if block.plan is not None:
+            data["plan"] = [entry.toJSON() for entry in block.plan]
+        if block.reel_blocks is not None:
+            data["reel_blocks"] = [
+                {
+                    "start_bump": entry_json(reel_block.start_bump),
+                    "comms": [entry_json(comm) for comm in reel_block.comms],
+                    "end_bump": entry_json(reel_block.end_bump),
+                }
+                for reel_block in block.reel_blocks
+            ]
+        encoded.append(data)
+    return encoded if blocks else blocks
+
+
 @router.get("/search_all")
 async def search_all_schedules(query: str = None):
     if not query:
@@ -19,7 +47,7 @@ async def search_all_schedules(query: str = None):
                     if schedule_blocks:
                         all_results.append({
                             "network_name": station["network_name"],
-                            "schedule_blocks": schedule_blocks
+                            "schedule_blocks": _blocks_json(schedule_blocks)
                         })
                 except Exception as e:
                     all_results.append({
@@ -39,7 +67,7 @@ async def search_all_schedules(query: str = None):
                 if blocks:
                     all_results.append({
                         "network_name": station_name,
-                        "schedule_blocks": blocks
+                        "schedule_blocks": _blocks_json(blocks)
                     })
             
             return {"query": query, "results": all_results}
@@ -54,7 +82,7 @@ async def search_schedule(network_name: str, query: str = None):
     else:
         schedule_blocks = LiquidAPI.get_blocks(conf)
 
-    return {"network_name": network_name, "query": query, "schedule_blocks": schedule_blocks}
+    return {"network_name": network_name, "query": query, "schedule_blocks": _blocks_json(schedule_blocks)}
 
 @router.get("/{network_name}")
 async def get_schedule(network_name: str, start: str = None, end: str = None):
@@ -69,4 +97,4 @@ async def get_schedule(network_name: str, start: str = None, end: str = None):
             return {"error": "Invalid date format. Use ISO format (YYYY-MM-DDTHH:MM:SS) for start and end."}
 
     schedule_blocks = LiquidAPI.get_blocks(conf, sdt, edt)
-    return {"network_name": network_name, "schedule_blocks": schedule_blocks}
+    return {"network_name": network_name, "schedule_blocks": _blocks_json(schedule_blocks)}
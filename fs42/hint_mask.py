@@ -0,0 +1,95 @@
+import json
+import logging
+from datetime import datetime, timedelta
+
+from fs42.station_manager import StationManager
+from fs42.catalog_api import CatalogAPI
+from fs42.catalog_io import CatalogIO
+from fs42.schedule_hint import DayPartHint
+
+
+class HintMask:
+    """The hours of the year a set of schedule hints allows, worked out once.
+
+    Hints only look at the month, day and hour of a time slot, so every hour of a leap
+    year is evaluated up front into a bitmask and testing a candidate is a single bit
+    lookup. Masks are shared by every entry with the same hints and stored next to the
+    catalog, so schedule builds don't evaluate hint logic at all.
+    """
+
+    # a leap year, so February 29 has its own hours
+    reference_year = 2000
+    hours = 366 * 24
+    # first day of each month in the reference year, counting from 0
+    _month_starts = (0, 31, 60, 91, 121, 152, 182, 213, 244, 274, 305, 335)
+
+    # id of a hints list or tuple to (hints, mask) - entries that share hints share the mask,
+    # and the hints are kept so their id can't be reused while it is a key
+    _compiled = {}
+
+    @staticmethod
+    def hour_of_year(when) -> int:
+        return (HintMask._month_starts[when.month - 1] + when.day - 1) * 24 + when.hour
+
+    @staticmethod
+    def compile(hints) -> bytes:
+        """Evaluates the hints at the start of every hour of the reference year"""
+        mask = bytearray(HintMask.hours // 8)
+        when = datetime(HintMask.reference_year, 1, 1)
+        for index in range(HintMask.hours):
+            if all(hint.hint(when) for hint in hints):
+                mask[index >> 3] |= 1 << (index & 7)
+            when += timedelta(hours=1)
+        return bytes(mask)
+
+    @staticmethod
+    def _day_parts_key(hints) -> str:
+        # masks with day part hints depend on the configured day parts, so they are stored against them
+        if not any(isinstance(hint, DayPartHint) for hint in hints):
+            return ""
+        day_parts = StationManager().get_day_parts()
+        return json.dumps({name: list(hours) for name, hours in day_parts.items()}, sort_keys=True)
+
+    @staticmethod
+    def test(hints, when) -> bool:
+        """True if the hints allow a time slot starting at when"""
+        if not hints:
+            return True
+        compiled = HintMask._compiled.get(id(hints))
+        if compiled is None:
+            compiled = HintMask._compiled[id(hints)] = (hints, HintMask.compile(hints))
+        index = HintMask.hour_of_year(when)
+        return (compiled[1][index >> 3] >> (index & 7)) & 1 == 1
+
+    @staticmethod
+    def preload(entries):
+        """Load the masks for these entries' hints from the catalog database, compiling and storing any that are missing"""
+        HintMask.preload_sets(entry.hints for entry in entries)
+
+    @staticmethod
+    def preload_sets(hint_sets):
+        """Load the masks for these hint sets, the same as preload does for entries"""
+        _l = logging.getLogger("HINTMASK")
+        wanted = {}
+        for hints in hint_sets:
+            if hints and id(hints) not in HintMask._compiled:
+                wanted[id(hints)] = hints
+        if not wanted:
+            return
+
+        encode = CatalogIO._hint_encoder()
+        keys = {key: (encode(hints), HintMask._day_parts_key(hints)) for key, hints in wanted.items()}
+        stored = CatalogAPI.get_hint_masks(set(keys.values()))
+
+        compiled = {}
+        for key, hints in wanted.items():
+            mask = stored.get(keys[key])
+            if mask is None or len(mask) != HintMask.hours // 8:
+                mask = compiled.get(keys[key])
+                if mask is None:
+                    mask = compiled[keys[key]] = HintMask.compile(hints)
+            HintMask._compiled[key] = (hints, mask)
+
+        if compiled:
+            _l.info(f"Compiled {len(compiled)} new hint masks")
+            CatalogAPI.put_hint_masks(compiled)
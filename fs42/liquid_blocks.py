@@ -67,13 +67,23 @@ class LiquidBlock:
         break_points = sorted(clipped_breaks, key=lambda k: k["black_start"])
         return break_points
 
-    def make_plan(self, catalog):
+    def _clip_breaks(self, break_points, max_breaks, break_map, steps):
+        steps.append(max_breaks)
+        if break_map is not None:
+            return break_map.clipped(self.content.realpath, steps, self.content_duration())
+        return self.clip_break_points(break_points, max_breaks, self.content_duration())
+
+    def make_plan(self, catalog, break_map=None):
         # first, collect any reels (commercials and bumps) we might need to buffer to the requested duration
         diff = self.playback_duration() - self.content_duration()
 
-        _fluid = FluidBuilder()
-        break_points = _fluid.get_breaks(self.content.realpath)
+        # a schedule build hands in every file's break points up front - see BreakPointMap
+        if break_map is not None:
+            break_points = break_map.get(self.content.realpath)
+        else:
+            break_points = FluidBuilder().get_breaks(self.content.realpath)
         strict_count = None
+        clip_steps = []
         if break_points:
             # the maximum number of breaks points should be no more than every 2 minutes
             max_breaks = self.playback_duration() / timings.MIN_2
@@ -81,7 +91,7 @@ class LiquidBlock:
             # max_breaks = diff/timings.MIN_1
 
             if len(break_points) > max_breaks:
-                break_points = self.clip_break_points(break_points, max_breaks, self.content_duration())
+                break_points = self._clip_breaks(break_points, max_breaks, break_map, clip_steps)
 
             strict_count = len(break_points) + 1
 
@@ -118,7 +128,7 @@ class LiquidBlock:
             if strict_count == len(self.reel_blocks):
                 pass
             elif strict_count > len(self.reel_blocks):
-                break_points = self.clip_break_points(break_points, len(self.reel_blocks), self.content_duration())
+                break_points = self._clip_breaks(break_points, len(self.reel_blocks), break_map, clip_steps)
             else:
                 # do nothing for now, they will play at end
                 pass
@@ -151,7 +161,7 @@ class LiquidClipBlock(LiquidBlock):
             dur += clip.duration
         return dur
 
-    def make_plan(self, catalog):
+    def make_plan(self, catalog, break_map=None):
         self.plan = []
         # first, collect any reels (commercials and bumps) we might need to buffer to the requested duration
         diff = self.playback_duration() - self.content_duration()
@@ -184,7 +194,7 @@ class LiquidOffAirBlock(LiquidBlock):
     def __init__(self, content, start_time, end_time, title=None, break_strategy="standard", break_info=None):
         super().__init__(content, start_time, end_time, title, break_strategy, break_info)
 
-    def make_plan(self, catalog):
+    def make_plan(self, catalog, break_map=None):
         self.plan = []
         current_mark = self.start_time
 
@@ -204,7 +214,7 @@ class LiquidLoopBlock(LiquidBlock):
     def __init__(self, content, start_time, end_time, title=None, break_strategy="standard", break_info=None):
         super().__init__(content, start_time, end_time, title, break_strategy, break_info)
 
-    def make_plan(self, catalog):
+    def make_plan(self, catalog, break_map=None):
         if not self.content:
             raise ValueError("LiquidLoopBlock requires content")
         entries = []
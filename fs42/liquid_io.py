@@ -1,7 +1,7 @@
-import sqlite3
 import json
 from datetime import datetime
 from fs42.station_manager import StationManager
+from fs42.db import DB
 from fs42.liquid_blocks import LiquidBlock, LiquidLoopBlock, LiquidClipBlock, LiquidOffAirBlock
 from fs42.block_plan import BlockPlanEntry
 from fs42.catalog_api import CatalogAPI
@@ -15,49 +15,42 @@ class LiquidIO:
 
     def __init__(self):
         self.db_path = StationManager().server_conf["db_path"]
-        self._init_liquid_table()
 
-    def _init_liquid_table(self):
+    @staticmethod
+    def create_tables(connection):
         """
         Creates a database table to hold liquid data.
         """
-        with sqlite3.connect(self.db_path) as connection:
-            cursor = connection.cursor()
-            cursor.execute("""CREATE TABLE IF NOT EXISTS liquid_blocks (
-                                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                                station TEXT NOT NULL,
-                                liquid_type TEXT NOT NULL,
-                                start_time TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                                end_time TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                                break_strategy TEXT NOT NULL,
-                                title TEXT NOT NULL,
-                                sequence_key TEXT,
-                                break_info TEXT,
-                                content_json TEXT NOT NULL,
-                                plan_json TEXT NOT NULL
-                            )""")
-            cursor.close()
-            connection.commit()
+        cursor = connection.cursor()
+        cursor.execute("""CREATE TABLE IF NOT EXISTS liquid_blocks (
+                            id INTEGER PRIMARY KEY AUTOINCREMENT,
+                            station TEXT NOT NULL,
+                            liquid_type TEXT NOT NULL,
+                            start_time TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                            end_time TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                            break_strategy TEXT NOT NULL,
+                            title TEXT NOT NULL,
+                            sequence_key TEXT,
+                            break_info TEXT,
+                            content_json TEXT NOT NULL,
+                            plan_json TEXT NOT NULL
+                        )""")
+        cursor.close()
 
     def get_liquid_blocks(self, station_name: str) -> list[LiquidBlock]:
         """
         Retrieve liquid blocks from the database for a given station.
         """
-        with sqlite3.connect(self.db_path) as connection:
+        with DB.connect(self.db_path) as connection:
             cursor = connection.cursor()
             cursor.execute("SELECT * FROM liquid_blocks WHERE station = ?", (station_name,))
             rows = cursor.fetchall()
             cursor.close()
 
-            liquid_blocks = []
-            for row in rows:
-                block = LiquidIO._build_block_from_row(row)
-                liquid_blocks.append(block)
-
-            return liquid_blocks
+            return LiquidIO._build_blocks(rows)
 
     def query_liquid_blocks(self, station_name: str, start: str, end: str) -> list[LiquidBlock]:
-        with sqlite3.connect(self.db_path) as connection:
+        with DB.connect(self.db_path) as connection:
             cursor = connection.cursor()
             cursor.execute(
                 "SELECT * FROM liquid_blocks WHERE station = ? AND start_time >= ? AND end_time <= ?",
@@ -66,18 +59,13 @@ class LiquidIO:
             rows = cursor.fetchall()
             cursor.close()
 
-            liquid_blocks = []
-            for row in rows:
-                block = LiquidIO._build_block_from_row(row)
-                liquid_blocks.append(block)
-
-            return liquid_blocks
+            return LiquidIO._build_blocks(rows)
 
     def put_liquid_blocks(self, station_name: str, liquid_blocks: list[LiquidBlock]):
         """
         Store liquid blocks in the database.
         """
-        with sqlite3.connect(self.db_path) as connection:
+        with DB.connect(self.db_path) as connection:
             cursor = connection.cursor()
 
             for block in liquid_blocks:
@@ -119,16 +107,33 @@ class LiquidIO:
             connection.commit()
 
     def delete_liquid_blocks(self, station_name: str):
-        with sqlite3.connect(self.db_path) as connection:
+        with DB.connect(self.db_path) as connection:
             cursor = connection.cursor()
             cursor.execute("DELETE FROM liquid_blocks WHERE station = ?", (station_name,))
             cursor.close()
             connection.commit()
 
     @staticmethod
-    def _build_block_from_row(row):
+    def _build_blocks(rows):
+        """
+        Build the LiquidBlocks for these rows, with every catalog entry they use read in one go.
+        """
+        entry_ids = set()
+        for row in rows:
+            if row[9]:
+                content_ids = json.loads(row[9])
+                if isinstance(content_ids, list):
+                    entry_ids.update(int(entry_id) for entry_id in content_ids)
+                else:
+                    entry_ids.add(int(content_ids))
+
+        entries = CatalogAPI.get_entries_by_ids(entry_ids) if entry_ids else {}
+        return [LiquidIO._build_block_from_row(row, entries) for row in rows]
+
+    @staticmethod
+    def _build_block_from_row(row, entries):
         """
-        Helper method to build a LiquidBlock from a database row.
+        Helper method to build a LiquidBlock from a database row, taking its content from entries (id to CatalogEntry).
         """
         _id = row[0]
         _station = row[1]
@@ -147,13 +152,13 @@ class LiquidIO:
         if _content_json:
             if not isinstance(_content_json, list):
                 # If the content is a single LiquidBlock
-                content_obj = CatalogAPI.get_entry_by_id(int(_content_json))
+                content_obj = entries.get(int(_content_json))
             else:
                 # or if its a list of blocks
                 content_obj = []
                 for entry in _content_json:
                     # content_obj.append(CatalogEntry.from_json_dict(entry))
-                    content_obj.append(CatalogAPI.get_entry_by_id(int(entry)))  
+                    content_obj.append(entries.get(int(entry)))
 
         args = (
             content_obj,
@@ -191,7 +196,7 @@ class LiquidIO:
         """
         Search liquid blocks by title for a given station.
         """
-        with sqlite3.connect(self.db_path) as connection:
+        with DB.connect(self.db_path) as connection:
             cursor = connection.cursor()
             cursor.execute(
                 "SELECT * FROM liquid_blocks WHERE station = ? AND title LIKE ? ORDER BY start_time", 
@@ -200,18 +205,14 @@ class LiquidIO:
             rows = cursor.fetchall()
             cursor.close()
 
-        blocks = []
-        for row in rows:
-            blocks.append(LiquidIO._build_block_from_row(row))
-
-        return blocks
+        return LiquidIO._build_blocks(rows)
 
     def search_all_liquid_blocks(self, query: str) -> dict:
         """
         Search liquid blocks by title across all stations.
         Returns a dictionary with station names as keys and lists of blocks as values.
         """
-        with sqlite3.connect(self.db_path) as connection:
+        with DB.connect(self.db_path) as connection:
             cursor = connection.cursor()
             cursor.execute(
                 "SELECT * FROM liquid_blocks WHERE title LIKE ? ORDER BY station, start_time", 
@@ -221,10 +222,10 @@ class LiquidIO:
             cursor.close()
 
         results = {}
-        for row in rows:
+        for row, block in zip(rows, LiquidIO._build_blocks(rows)):
             station = row[1]  # station is at index 1
             if station not in results:
                 results[station] = []
-            results[station].append(LiquidIO._build_block_from_row(row))
+            results[station].append(block)
 
         return results
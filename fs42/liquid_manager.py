@@ -71,8 +71,8 @@ class LiquidManager(object):
 
     def reset_sequences(self, station_config):
         logging.getLogger("liquid").info(f"Resetting sequences for {station_config['network_name']}")
-        # get the catalog
-        catalog = ShowCatalog(station_config)
+        # get the catalog - incremental so writing it back doesn't change ids
+        catalog = ShowCatalog(station_config, incremental=True)
 
         _blocks: list[LiquidBlock] = self.schedules[station_config["network_name"]]
 
@@ -13,17 +13,23 @@ from fs42.liquid_blocks import LiquidBlock, LiquidClipBlock, LiquidOffAirBlock,
 from fs42.sequence_api import SequenceAPI
 from fs42.catalog_api import CatalogAPI
 from fs42.liquid_api import LiquidAPI
+from fs42.pod_io import PodIO
+from fs42.break_point_map import BreakPointMap
 from fs42.marathon_agent import MarathonAgent
 
 # logging.basicConfig(format="%(asctime)s %(levelname)s:%(name)s:%(message)s", level=logging.INFO)
 
 
 class LiquidSchedule:
-    def __init__(self, conf):
+    def __init__(self, conf, writer=None):
         self._l = logging.getLogger("Liquid")
         # self.conf = TagHintReader.smooth_tags(conf)
         self.conf = conf
+        # takes the database writes of a build instead of doing them here - see ParallelBuild
+        self.writer = writer
         self.catalog = ShowCatalog(conf)
+        # every catalog file's break points, read when the first plans are made
+        self._break_map = None
         self._load_blocks()
 
     def _calc_target_duration(self, duration, increment=None):
@@ -65,8 +71,7 @@ class LiquidSchedule:
         for block in new_blocks:
             block.make_plan(self.catalog)
 
-        LiquidAPI.add_blocks(self.conf, new_blocks)
-        self._load_blocks()
+        self._save(new_blocks, [])
 
     def _fill(self, slot_config, tag_str, current_mark, break_strategy, break_info) -> LiquidBlock:
         seq_key = None
@@ -199,19 +204,37 @@ class LiquidSchedule:
         self._l.info(f"Building plans for {len(new_blocks)} new schedule blocks")
         play_counts = []
 
+        if self._break_map is None:
+            self._break_map = BreakPointMap.for_catalog(self.catalog)
         for block in new_blocks:
-            block.make_plan(self.catalog)
+            block.make_plan(self.catalog, self._break_map)
             if block.content:
                 # if the block has content, then we need to increment the play count
                 play_counts.append(block.content)
 
         self._l.debug("Plans completed - updating play counts")
-        CatalogAPI.update_play_counts(self.conf, play_counts)
-        self._l.debug("Counts updated")
-        self._blocks = new_blocks
-        self._l.info("Saving blocks to disk")
-        LiquidAPI.add_blocks(self.conf, new_blocks)
-        self._load_blocks()
+        self._save(new_blocks, play_counts)
+
+    def _save(self, new_blocks, play_counts):
+        write = (self.conf, new_blocks, play_counts, self.catalog.pod_library.changed_rows())
+        if self.writer is not None:
+            # hand it over, and carry on from the new blocks as if they'd been read back
+            self.writer(write)
+            self._blocks = self._blocks + new_blocks
+        else:
+            LiquidSchedule.write(*write)
+            self._load_blocks()
+
+    @staticmethod
+    def write(conf, new_blocks, play_counts, pod_rows):
+        """Store what a build made - the play counts, the station's pods and the new blocks"""
+        _l = logging.getLogger("Liquid")
+        CatalogAPI.update_play_counts(conf, play_counts)
+        if pod_rows is not None:
+            PodIO().put_pods(conf["network_name"], pod_rows)
+        _l.debug("Counts updated")
+        _l.info("Saving blocks to disk")
+        LiquidAPI.add_blocks(conf, new_blocks)
 
     def _increment(self, how_much):
         # add time to the existing schedule
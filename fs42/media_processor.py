@@ -1,86 +1,108 @@
 import logging
 import os
-import glob
 import ffmpeg
 from fs42.fluid_objects import FileRepoEntry
+from fs42.media_walker import MediaWalker
 from fs42 import timings
 
-try:
-    # try to import from version > 2.0
-    from moviepy import VideoFileClip
-except ImportError:
-    # fall back to import from version 1.0
-    from moviepy.editor import VideoFileClip  # type: ignore
-
 from fs42.schedule_hint import MonthHint, QuarterHint, RangeHint, BumpHint, DayPartHint
 from fs42.catalog_entry import CatalogEntry
+from fs42.probe_engine import ProbeEngine, ProbeResult
+from fs42.break_signals import BreakSignals
 
 
 class MediaProcessor:
     supported_formats = ["mp4", "mpg", "mpeg", "avi", "mov", "mkv", "ts", "m4v", "webm", "wmv"]
+    supported_extensions = frozenset(supported_formats)
+
+    # fast break detection decodes this many frames per second, scaled down to this width
+    fast_detect_fps = 10
+    fast_detect_width = 160
 
     def process_one(fname, tag, hints, fluid=None) -> CatalogEntry:
-        _l = logging.getLogger("MEDIA")
-        _l.debug(f"--process_one is working on {fname}")
+        results = MediaProcessor._process_batch([(fname, hints)], tag, fluid)
+        if len(results):
+            return results[0]
+        return None
+
+    @staticmethod
+    def probe_duration(fname) -> float:
+        return MediaProcessor.probe_media(fname)[0]
+
+    @staticmethod
+    def probe_media(fname) -> tuple[float, dict]:
+        """Returns (duration, compact metadata) for the file, with a single ffprobe run"""
+        probed = ffmpeg.probe(fname)
+        meta = ProbeResult.meta_from_probe(probed)
         # get video file length in seconds
-        duration = 0.0
-        result = None
-        try:
+        duration = MediaProcessor._duration_from_probe(probed)
+
+        # the stream might not report a duration, so try the container
+        if duration <= 0.0 and meta.get("duration", 0.0) > 0.0:
+            duration = meta["duration"]
+
+        # still nothing, so check with moviepy as a last resort
+        if duration <= 0.0:
+            try:
+                duration = MediaProcessor._moviepy_duration(fname)
+            except Exception as e:
+                logging.getLogger("MEDIA").error(f"Error in moviepy attempting to get duration for {fname}")
+                logging.getLogger("MEDIA").exception(e)
+        return (duration, meta)
+
+    @staticmethod
+    def _process_batch(file_hints, tag, fluid=None) -> list[CatalogEntry]:
+        """Takes a list of (fname, hints) and returns entries in the same order, skipping failures."""
+        _l = logging.getLogger("MEDIA")
+        durations = {}
+        full_paths = {}
+        to_probe = []
+
+        # check the cache first, only files without a duration go to the probe engine
+        errors = {}
+        for fname, _ in file_hints:
             full_path = False
             if fluid:
                 full_path = os.path.realpath(fname)
-                cached = fluid.check_file_cache(full_path)
-                if cached:
-                    duration = cached.duration
-
-            if not duration:
-                # then do the processing
-                duration = MediaProcessor._get_duration(fname)
-
-            # it might not support streams, so check with moviepy
-            if duration <= 0.0:
                 try:
-                    video_clip = VideoFileClip(fname)
-                    duration = video_clip.duration
+                    cached = fluid.check_file_cache(full_path)
+                    if cached and cached.duration:
+                        durations[fname] = cached.duration
+                    else:
+                        # don't probe files that already failed and haven't changed since
+                        error = fluid.known_failure(full_path)
+                        if error:
+                            errors[fname] = f"failed to probe before - {error}"
                 except Exception as e:
-                    _l.error(f"Error in moviepy attempting to get duration for {fname}")
                     _l.exception(e)
-            # see if both returned 0
-            if duration <= 0.0:
-                _l.warning(f"Could not get a duration for tag: {tag}  file: {fname}")
-                _l.warning("Files with 0 length can't be added to the catalog.")
-            else:
-                show_clip = CatalogEntry(fname, duration, tag, hints)
-                result = show_clip
-                result.realpath = full_path
-                _l.debug(f"--_process_media is done with {fname}: {show_clip}")
+                    _l.error(f"Error checking file cache for {fname}")
+            full_paths[fname] = full_path
+            if fname not in durations and fname not in errors:
+                to_probe.append(fname)
 
-        except Exception as e:
-            _l.exception(e)
-            _l.error(f"Error processing media file {fname}")
-
-        return result
+        for probed in ProbeEngine().probe(to_probe):
+            if probed.error:
+                errors[probed.path] = probed.error
+            durations[probed.path] = probed.duration
 
-    @staticmethod
-    def _process_media(file_list, tag, hints=[], fluid=None) -> list[CatalogEntry]:
-        _l = logging.getLogger("MEDIA")
-        _l.debug(f"_process_media starting processing for tag={tag} on {len(file_list)} files")
-        show_clip_list = []
-
-        # collect list of files that fail
+        results = []
         failed = []
-
-        # get the duration and path for each clip and add to the tag
-        for fname in file_list:
+        for fname, hints in file_hints:
             _l.debug(f"--_process_media is working on {fname}")
-            # get video file length in seconds
-            results = MediaProcessor.process_one(fname, tag, hints, fluid)
-            if results:
-                show_clip_list.append(results)
+            duration = durations.get(fname, 0.0)
+            if fname in errors:
+                _l.error(f"Error processing media file {fname}: {errors[fname]}")
+                failed.append(f"{fname}: {errors[fname]}")
+            elif duration <= 0.0:
+                # see if both returned 0
+                _l.warning(f"Could not get a duration for tag: {tag}  file: {fname}")
+                _l.warning("Files with 0 length can't be added to the catalog.")
+                failed.append(f"{fname}: no duration")
             else:
-                failed.append(failed)
-
-        _l.debug(f"_process_media completed processing for tag={tag} on {len(file_list)} files")
+                show_clip = CatalogEntry(fname, duration, tag, hints)
+                show_clip.realpath = full_paths[fname]
+                results.append(show_clip)
+                _l.debug(f"--_process_media is done with {fname}: {show_clip}")
 
         if len(failed):
             _l.warning(f"Errors were encountered during processing - error count: {len(failed)}")
@@ -90,60 +112,76 @@ class MediaProcessor:
                 count_printed += 1
                 if count_printed >= 10:
                     _l.warning(f"and {len(failed) - count_printed} more...")
+                    break
+
+        return results
 
+    @staticmethod
+    def _process_media(file_list, tag, hints=[], fluid=None) -> list[CatalogEntry]:
+        _l = logging.getLogger("MEDIA")
+        _l.debug(f"_process_media starting processing for tag={tag} on {len(file_list)} files")
+        show_clip_list = MediaProcessor._process_batch([(fname, hints) for fname in file_list], tag, fluid)
+        _l.debug(f"_process_media completed processing for tag={tag} on {len(file_list)} files")
         return show_clip_list
 
+    @staticmethod
+    def _moviepy_duration(fname) -> float:
+        # moviepy is slow to import, so only load it when ffprobe has come up empty
+        try:
+            # try to import from version > 2.0
+            from moviepy import VideoFileClip
+        except ImportError:
+            # fall back to import from version 1.0
+            from moviepy.editor import VideoFileClip  # type: ignore
+
+        video_clip = VideoFileClip(fname)
+        try:
+            return video_clip.duration
+        finally:
+            video_clip.close()
+
     @staticmethod
     def _get_duration(file_name) -> float:
-        probed = ffmpeg.probe(file_name)
+        return MediaProcessor._duration_from_probe(ffmpeg.probe(file_name))
 
+    @staticmethod
+    def _duration_from_probe(probed) -> float:
         if "streams" in probed and len(probed["streams"]) and "duration" in probed["streams"][0]:
             return float(probed["streams"][0]["duration"])
         else:
             return -1
 
+    @staticmethod
+    def _is_media(name) -> bool:
+        return MediaWalker._is_media(name, MediaProcessor.supported_extensions)
+
     @staticmethod
     def _find_media(path) -> list[str]:
         logging.getLogger("MEDIA").debug(f"_find_media scanning for media in {path}")
-        file_list = []
-        for ext in MediaProcessor.supported_formats:
-            this_format = glob.glob(f"{path}/*.{ext}")
-            file_list += this_format
-            logging.getLogger("MEDIA").debug(
-                f"--Found {len(this_format)} files with {ext} extension - {len(file_list)} total found in {path} so far"
-            )
-
-        logging.getLogger("MEDIA").debug(f"_find_media done scanning {path} {len(file_list)}")
-        return file_list
+        found = MediaWalker().find(path, MediaProcessor.supported_extensions, recursive=False)
+        logging.getLogger("MEDIA").debug(f"_find_media done scanning {path} {len(found)}")
+        return [entry.path for entry in found]
 
     @staticmethod
-    def rich_find_media(path: str) -> list[FileRepoEntry]:
-        file_list = MediaProcessor._rfind_media(path)
+    def rich_find_media(path: str, fingerprints: dict = None) -> list[FileRepoEntry]:
+        # this walk is remembered, so later lookups under path don't touch the disk again
+        walked = MediaWalker().walk(path, MediaProcessor.supported_extensions, fingerprints)
         found_list = []
 
-        for fp in file_list:
+        for found in walked:
             entry = FileRepoEntry()
-            entry.path = os.path.realpath(fp)
-            # get the full path:
-            stat = os.stat(fp)
-            entry.last_mod = stat.st_mtime
-            entry.size = stat.st_size
+            entry.path = found.realpath
+            entry.last_mod = found.last_mod
+            entry.size = found.size
             found_list.append(entry)
         return found_list
 
     @staticmethod
     def _rfind_media(path) -> list[str]:
         logging.getLogger("MEDIA").debug(f"_rfind_media scanning for media in {path}")
-        file_list = []
-
-        # get all the files
-        for ext in MediaProcessor.supported_formats:
-            # this_format = directory.rglob(f"*.{ext}")
-            this_format = glob.glob(f"{path}/**/*.{ext}", recursive=True)
-            file_list += this_format
-
-        logging.getLogger("MEDIA").debug(f"_rfind_media done scanning {path} {len(file_list)}")
-        return file_list
+        found = MediaWalker().find(path, MediaProcessor.supported_extensions)
+        logging.getLogger("MEDIA").debug(f"_rfind_media done scanning {path} {len(found)}")
+        return [entry.path for entry in found]
 
     @staticmethod
     def _process_hints(path, tag, bumpdir=False):
@@ -166,12 +204,12 @@ class MediaProcessor:
     @staticmethod
     def _process_subs(dir_path, tag, bumpdir=False, fluid=None):
         subs = [f.path for f in os.scandir(dir_path) if f.is_dir()]
-        clips = []
+        # submit every sub folder as one batch so the probe pool stays busy
+        file_hints = []
         for sub in subs:
-            file_list = MediaProcessor._rfind_media(sub)
             hints = MediaProcessor._process_hints(sub, tag, bumpdir)
-            clips += MediaProcessor._process_media(file_list, tag, hints=hints, fluid=fluid)
-        return clips
+            file_hints += [(fname, hints) for fname in MediaProcessor._rfind_media(sub)]
+        return MediaProcessor._process_batch(file_hints, tag, fluid)
 
     @staticmethod
     def _test_candidate_hints(hint_list, when):
@@ -218,71 +256,99 @@ class MediaProcessor:
         return break_points
 
     @staticmethod
-    def black_detect(fname, base_duration, black_min_duration=0.1, black_pixel_tresh=0.1, black_ratio_thresh=0.95):
-        def min_segment(break_points):
-            spx = sorted(break_points, key=lambda x: x["segment_duration"])
-            return spx[0]["segment_duration"]
+    def _prune_segments(segmented, base_duration, min_segment):
+        """Drop points until no segment is shorter than min_segment, or only one point is left.
+        Of the two points around the shortest segment, the lower scored one goes."""
+        while len(segmented) > 1:
+            shortest = min(range(len(segmented)), key=lambda i: segmented[i]["segment_duration"])
+            if segmented[shortest]["segment_duration"] >= min_segment:
+                break
+            drop = shortest
+            after = shortest + 1
+            if after < len(segmented) and segmented[after].get("score", 0) < segmented[shortest].get("score", 0):
+                drop = after
+            del segmented[drop]
+            segmented = MediaProcessor.calc_black_segments(segmented, base_duration)
+        return segmented
 
-        def remove_min(break_points):
-            spx = sorted(break_points, key=lambda x: x["segment_duration"])
-            del spx[0]
-            return spx
+    @staticmethod
+    def _parse_blackdetect_line(line) -> dict:
+        """Returns black_start, black_end and black_duration from a blackdetect log line, or None"""
+        return BreakSignals.parse_black_line(line)
 
+    @staticmethod
+    def _has_audio(fname) -> bool:
+        return len(ffmpeg.probe(fname, select_streams="a").get("streams", [])) > 0
+
+    @staticmethod
+    def _detect_signals(
+        fname, black_min_duration, black_pixel_tresh, black_ratio_thresh, fast=False, has_audio=None
+    ) -> BreakSignals:
+        """Find black frames, scene changes and (unless fast) silences in a single decode of the file.
+        has_audio comes from the stored probe metadata - the file is only probed for it when that is None"""
+        source = ffmpeg.input(fname)
+        video = source.video
+        if fast:
+            # decode a small, decimated picture - plenty to spot black frames and cuts
+            video = video.filter("fps", fps=MediaProcessor.fast_detect_fps).filter(
+                "scale", MediaProcessor.fast_detect_width, -2
+            )
+        video = (
+            video.filter("blackdetect", d=black_min_duration, pix_th=black_pixel_tresh, pic_th=black_ratio_thresh)
+            .filter("select", f"gt(scene,{BreakSignals.scene_threshold})")
+            .filter("metadata", "print")
+        )
+        streams = [video]
+        # fast mode leaves the audio alone, so it goes without the silence signal
+        if not fast and (MediaProcessor._has_audio(fname) if has_audio is None else has_audio):
+            streams.append(
+                source.audio.filter(
+                    "silencedetect", n=BreakSignals.silence_noise, d=BreakSignals.silence_min_duration
+                )
+            )
+        stream = ffmpeg.output(*streams, "pipe:", format="null").global_args("-nostats", "-hide_banner")
+
+        # parse lines as ffmpeg writes them instead of holding the whole log in memory
+        signals = BreakSignals()
+        process = stream.run_async(pipe_stderr=True)
+        for raw in process.stderr:
+            signals.feed(raw.decode("utf-8", errors="replace"))
+        if process.wait() != 0:
+            raise ffmpeg.Error("ffmpeg", None, b"")
+        return signals
+
+    @staticmethod
+    def black_detect(
+        fname,
+        base_duration,
+        black_min_duration=0.1,
+        black_pixel_tresh=0.1,
+        black_ratio_thresh=0.95,
+        fast=False,
+        has_audio=None,
+    ):
+        """Find scored break points - black frames, backed up by silence and scene changes where there are any"""
         _l = logging.getLogger("MEDIA")
-        _l.info(f"Detecting black frames in {fname}")
+        _l.info(f"Detecting break points in {fname}{' (fast)' if fast else ''}")
 
         try:
-            # Build the ffmpeg command with blackdetect filter
-            filter_complex = (
-                ffmpeg.input(fname)
-                .filter("blackdetect", d=black_min_duration, pix_th=black_pixel_tresh, pic_th=black_ratio_thresh)
-                .output("pipe:", format="null")
+            signals = MediaProcessor._detect_signals(
+                fname, black_min_duration, black_pixel_tresh, black_ratio_thresh, fast, has_audio
+            )
+            candidates = signals.candidates()
+            _l.info(
+                f"Found {len(signals.black)} black segments, {len(signals.silences)} silences and "
+                f"{len(signals.scenes)} scene changes in {fname} - {len(candidates)} candidate break points"
             )
-
-            # Actually run the command and capture its output
-            stdout, stderr = filter_complex.run(capture_stdout=True, capture_stderr=True)
-
-            # Decode and parse
-            black_frames = []
-            for line in stderr.decode("utf-8").split("\n"):
-                if "blackdetect" in line:
-                    try:
-                        parts = line.split("]")[1].strip().split(" ")
-                        info = {}
-                        for part in parts:
-                            if ":" in part:
-                                key, value = part.split(":")
-                                info[key] = float(value)
-                        if info:
-                            if "black_start" not in info or "black_end" not in info or "black_duration" not in info:
-                                # then not a good line
-                                continue
-
-                            black_frames.append(info)
-
-                    except IndexError:
-                        _l.debug(f"Skipping malformed line: {line}")
-                        pass
-                    except ValueError:
-                        _l.info(f"Skipping invalid data in line: {line}")
-                        pass
-                    except Exception as e:
-                        _l.info(f"An unexpected error occurred while parsing line: {line}. Error: {e}")
-            _l.info(f"Found {len(black_frames)} black segments in {fname}")
 
             trimmed = []
             # trim any near start and end times
-            for point in black_frames:
+            for point in candidates:
                 if point["black_start"] > timings.MIN_1 and point["black_start"] < base_duration - timings.MIN_1:
                     trimmed.append(point)
 
             segmented = MediaProcessor.calc_black_segments(trimmed, base_duration)
-
-            while min_segment(segmented) < timings.MIN_1 and len(segmented) > 1:
-                segmented = remove_min(segmented)
-                segmented = MediaProcessor.calc_black_segments(segmented, base_duration)
-
-            return segmented
+            return MediaProcessor._prune_segments(segmented, base_duration, timings.MIN_1)
 
         except Exception as e:
             _l.error(f"FFmpeg hit an error detecting black frames in {fname}")
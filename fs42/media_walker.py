@@ -0,0 +1,209 @@
+import logging
+import os
+
+from fs42.fluid_objects import DirFingerprint
+
+
+class WalkEntry:
+    def __init__(self, path, realpath, size, last_mod):
+        # path is built the same way glob would build it from the requested root
+        self.path = path
+        self.realpath = realpath
+        self.size = size
+        self.last_mod = last_mod
+
+    def __str__(self):
+        return f"WalkEntry: {self.path} size={self.size} mod={self.last_mod}"
+
+
+class MediaWalker(object):
+    """Single pass os.scandir walker for media files.
+
+    Walks are remembered until forget() is called, so later lookups of the same tree
+    (or any folder under it) are answered from memory instead of touching the disk again.
+    """
+
+    # the borg singleton pattern - so walks are shared during a build
+    __we_are_all_one = {}
+    _initialized = False
+
+    def __init__(self):
+        self.__dict__ = self.__we_are_all_one
+        if not self._initialized:
+            self._initialized = True
+            self._l = logging.getLogger("WALKER")
+            self._walks = {}
+
+    @staticmethod
+    def _root(path):
+        # glob drops trailing slashes from the folder it is searching
+        stripped = path.rstrip("/")
+        return stripped if stripped else path
+
+    @staticmethod
+    def _is_media(name, extensions):
+        return not name.startswith(".") and name.rpartition(".")[2] in extensions
+
+    def forget(self):
+        self._walks = {}
+
+    def _cached(self, root):
+        """Find a remembered walk covering root, returns (walked root, entries) or (None, None)"""
+        for walked in self._walks:
+            if root == walked or root.startswith(walked + "/"):
+                return (walked, self._walks[walked])
+        return (None, None)
+
+    def find(self, path, extensions, recursive=True) -> list[WalkEntry]:
+        """List media under path, using a remembered walk when one covers it."""
+        root = MediaWalker._root(path)
+        (walked_root, walked) = self._cached(root)
+        if walked is None:
+            if recursive:
+                return self.walk(root, extensions, remember=False)
+            return self._walk_one(root, extensions)
+
+        # match on the folders below the walked root, ignoring doubled slashes
+        rel = "/".join(part for part in root[len(walked_root) :].split("/") if part)
+        skip = len(walked_root) + 1
+        prefix = f"{rel}/" if rel else ""
+        found = []
+        for entry in walked:
+            remainder = entry.path[skip:]
+            if not remainder.startswith(prefix):
+                continue
+            remainder = remainder[len(prefix) :]
+            if not recursive and "/" in remainder:
+                continue
+            # rebuild the path from the requested root - the same string glob would have returned
+            found_path = f"{root}/{remainder}"
+            if found_path != entry.path:
+                entry = WalkEntry(found_path, entry.realpath, entry.size, entry.last_mod)
+            found.append(entry)
+        return found
+
+    def _walk_one(self, root, extensions) -> list[WalkEntry]:
+        found = []
+        if not os.path.isdir(root):
+            return found
+        real_dir = os.path.realpath(root)
+        with os.scandir(root) as it:
+            for entry in sorted(it, key=lambda e: e.name):
+                if MediaWalker._is_media(entry.name, extensions):
+                    walk_entry = self._file_entry(root, real_dir, entry)
+                    if walk_entry:
+                        found.append(walk_entry)
+        return found
+
+    def _file_entry(self, dir_path, real_dir, entry) -> WalkEntry:
+        try:
+            if not entry.is_file():
+                return None
+            stat = entry.stat()
+        except OSError as e:
+            self._l.warning(f"Skipping unreadable file {entry.path}: {e}")
+            return None
+        realpath = os.path.realpath(entry.path) if entry.is_symlink() else os.path.join(real_dir, entry.name)
+        return WalkEntry(os.path.join(dir_path, entry.name), realpath, stat.st_size, stat.st_mtime)
+
+    def _list_dir(self, dir_path, real_dir, mtime, extensions) -> DirFingerprint:
+        fingerprint = DirFingerprint(real_dir, mtime)
+        with os.scandir(dir_path) as it:
+            for entry in it:
+                fingerprint.entry_count += 1
+                if entry.name.startswith("."):
+                    continue
+                try:
+                    is_dir = entry.is_dir()
+                except OSError:
+                    continue
+
+                link = os.path.realpath(entry.path) if entry.is_symlink() else None
+                if is_dir:
+                    fingerprint.dirs.append((entry.name, link))
+                elif MediaWalker._is_media(entry.name, extensions):
+                    walk_entry = self._file_entry(dir_path, real_dir, entry)
+                    if walk_entry:
+                        fingerprint.files.append((entry.name, walk_entry.size, walk_entry.last_mod, link))
+        fingerprint.files.sort()
+        fingerprint.dirs.sort()
+        return fingerprint
+
+    def _restat(self, dir_path, fingerprint) -> bool:
+        """Bring the size and mtime of a fingerprint's files up to date - False if one has gone"""
+        files = []
+        for name, size, last_mod, link in fingerprint.files:
+            try:
+                stat = os.stat(os.path.join(dir_path, name))
+            except OSError:
+                return False
+            if (stat.st_size, stat.st_mtime) != (size, last_mod):
+                fingerprint.changed = True
+            files.append((name, stat.st_size, stat.st_mtime, link))
+        fingerprint.files = files
+        return True
+
+    def walk(self, path, extensions, fingerprints: dict = None, remember=True) -> list[WalkEntry]:
+        """Recursively find media under path in a single pass.
+
+        When a fingerprints dict (keyed by real directory path) is supplied, folders whose
+        modification time is unchanged are listed from their fingerprint instead of being
+        scanned, and the dict is updated in place for every folder that was rescanned.
+        Every fingerprint that was visited is marked as seen.
+        A folder's mtime only changes when entries are added, removed or renamed, so the files
+        of an unchanged folder are still stat'ed to catch ones rewritten in place.
+        """
+        root = MediaWalker._root(path)
+        found = []
+        if not os.path.isdir(root):
+            self._l.debug(f"Not walking {root} - it is not a directory")
+            return found
+
+        changed = 0
+        skipped = 0
+        # each folder with the (device, inode) of the folders above it, to spot link loops
+        stack = [(root, os.path.realpath(root), frozenset())]
+        while stack:
+            dir_path, real_dir, ancestors = stack.pop()
+            try:
+                stat = os.stat(dir_path)
+            except OSError as e:
+                self._l.warning(f"Skipping unreadable folder {dir_path}: {e}")
+                continue
+
+            # a link back to a folder above this one is a loop - but two links to the same
+            # folder from different places are both walked, the same as glob does
+            inode = (stat.st_dev, stat.st_ino)
+            if inode in ancestors:
+                continue
+            ancestors = ancestors | {inode}
+
+            fingerprint = fingerprints.get(real_dir) if fingerprints is not None else None
+            if fingerprint is not None and fingerprint.mtime == stat.st_mtime and self._restat(dir_path, fingerprint):
+                skipped += 1
+            else:
+                try:
+                    fingerprint = self._list_dir(dir_path, real_dir, stat.st_mtime, extensions)
+                except OSError as e:
+                    self._l.warning(f"Skipping unreadable folder {dir_path}: {e}")
+                    continue
+                changed += 1
+                if fingerprints is not None:
+                    fingerprint.changed = True
+                    fingerprints[real_dir] = fingerprint
+            fingerprint.seen = True
+
+            for name, size, last_mod, link in fingerprint.files:
+                realpath = link if link else os.path.join(real_dir, name)
+                found.append(WalkEntry(os.path.join(dir_path, name), realpath, size, last_mod))
+
+            # push in reverse so folders come off the stack in name order
+            for name, link in reversed(fingerprint.dirs):
+                stack.append(
+                    (os.path.join(dir_path, name), link if link else os.path.join(real_dir, name), ancestors)
+                )
+
+        self._l.debug(f"Walked {root} - scanned {changed} folders, {skipped} unchanged - found {len(found)} files")
+        if remember:
+            self._walks[root] = found
+        return found
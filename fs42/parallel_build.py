@@ -0,0 +1,301 @@
+import logging
+import multiprocessing
+import os
+import queue
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+from fs42.station_manager import StationManager
+
+
+class BuildResult:
+    def __init__(self, station, error=None, log=None):
+        self.station = station
+        self.error = error
+        self.log = log or []
+
+    @property
+    def ok(self):
+        return self.error is None
+
+    def __str__(self):
+        return f"{self.station} {'ok' if self.ok else self.error}"
+
+
+# set in each pool process - where log lines go as they happen
+_progress = None
+
+
+def _init_worker(progress, probe_workers):
+    global _progress
+    _progress = progress
+    from fs42.probe_engine import ProbeEngine
+
+    # never use a probe pool handed down from the parent, and share the cores with the other workers
+    engine = ProbeEngine()
+    engine._executor = None
+    engine.workers = probe_workers
+
+
+class _LogCollector(logging.Handler):
+    # keeps the build's log lines, and streams them to the parent when it is listening
+    def __init__(self, station_name):
+        super().__init__(logging.INFO)
+        self.setFormatter(logging.Formatter("[%(name)s] %(message)s"))
+        self.station_name = station_name
+        self.lines = []
+
+    def emit(self, record):
+        line = self.format(record)
+        self.lines.append(line)
+        if _progress is not None:
+            _progress.put((self.station_name, line))
+
+
+def _collected(station_name, build):
+    # run build() with the logs going to a collector in place of this process' own handlers
+    collector = _LogCollector(station_name)
+    root = logging.getLogger()
+    (handlers, level) = (root.handlers, root.level)
+    root.handlers = [collector]
+    root.setLevel(min(level, logging.INFO))
+    try:
+        build()
+        error = None
+    except (Exception, SystemExit) as e:
+        logging.getLogger("BUILD").exception(e)
+        error = f"{type(e).__name__}: {e}"
+    finally:
+        root.handlers = handlers
+        root.setLevel(level)
+    return (error, collector.lines)
+
+
+def _schedule_worker(job):
+    # runs inside a pool process - builds the schedule and hands back the writes instead of doing them
+    from fs42.liquid_schedule import LiquidSchedule
+
+    (station_name, amount) = job
+    writes = []
+
+    def build():
+        station = StationManager().station_by_name(station_name)
+        LiquidSchedule(station, writer=writes.append).add_amount(amount)
+
+    (error, lines) = _collected(station_name, build)
+    return (station_name, writes, error, lines)
+
+
+def _catalog_worker(job):
+    # runs inside a pool process - builds the catalog and hands back its entries instead of storing them,
+    # along with the folders it scanned so the parent can trim the fluid cache
+    from fs42.catalog import ShowCatalog
+    from fs42.fluid_builder import FluidBuilder
+
+    (station_name, force, incremental, shared_scan) = job
+    writes = []
+    # a pool process builds several stations in turn - only report this one's folders
+    FluidBuilder._scanned = {}
+
+    def build():
+        station = StationManager().station_by_name(station_name)
+        ShowCatalog(
+            station,
+            rebuild_catalog=True,
+            force=force,
+            incremental=incremental,
+            shared_scan=shared_scan,
+            writer=lambda write: writes.append(("catalog", write)),
+        )
+
+    (error, lines) = _collected(station_name, build)
+    if FluidBuilder._scanned:
+        writes.append(("scanned", FluidBuilder._scanned))
+    return (station_name, writes, error, lines)
+
+
+class _StationPool:
+    # runs one job per station in a process pool and writes what comes back from this process only
+
+    setting = None
+    default_workers = None
+
+    def __init__(self, stations, workers=None):
+        self._l = logging.getLogger("BUILD")
+        self.stations = stations
+        if workers is None:
+            workers = StationManager().server_conf.get(self.setting) or self.default_workers or os.cpu_count() or 1
+        self.workers = max(1, min(workers, len(self.stations)))
+
+    def _run(self, jobs, worker, apply, on_result, on_progress) -> list[BuildResult]:
+        results = []
+        probe_workers = StationManager().server_conf.get("probe_workers") or os.cpu_count() or 1
+        # the API starts builds from a thread of the server, and a plain fork there can copy a lock
+        # (a logging handler's, say) that another thread holds - forkserver starts from a clean process
+        context = multiprocessing.get_context("forkserver")
+        progress = context.Queue() if on_progress is not None else None
+
+        def drain():
+            while progress is not None:
+                try:
+                    on_progress(*progress.get_nowait())
+                except queue.Empty:
+                    return
+
+        with ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=context,
+            initializer=_init_worker,
+            initargs=(progress, max(1, probe_workers // self.workers)),
+        ) as executor:
+            pending = {executor.submit(worker, job) for job in jobs}
+            while pending:
+                (done, pending) = wait(pending, timeout=0.25, return_when=FIRST_COMPLETED)
+                drain()
+                for future in done:
+                    try:
+                        (station_name, writes, error, log) = future.result()
+                    except Exception as e:
+                        # the worker itself died, so there's no telling which station it was
+                        self._l.exception(e)
+                        results.append(self._report(BuildResult("unknown", f"{type(e).__name__}: {e}"), on_result))
+                        continue
+                    result = BuildResult(station_name, error, log)
+                    if error is None:
+                        result.error = self._write(writes, apply)
+                    results.append(self._report(result, on_result))
+        drain()
+        return results
+
+    def _in_process(self, build, on_result) -> list[BuildResult]:
+        # not worth a pool - build and write in this process like a single station build
+        results = []
+        for station in self.stations:
+            try:
+                build(station)
+                result = BuildResult(station["network_name"])
+            except Exception as e:
+                self._l.exception(e)
+                result = BuildResult(station["network_name"], f"{type(e).__name__}: {e}")
+            results.append(self._report(result, on_result))
+        return results
+
+    def _write(self, writes, apply):
+        try:
+            for write in writes:
+                apply(write)
+        except Exception as e:
+            self._l.exception(e)
+            return f"{type(e).__name__}: {e}"
+        return None
+
+    def _report(self, result, on_result):
+        if on_result is not None:
+            on_result(result)
+        return result
+
+
+class ParallelBuild(_StationPool):
+    """Adds time to several station schedules at once, one station per worker process.
+
+    Workers build the blocks but don't store them - each hands back its play counts, pods
+    and blocks, and this process writes them one station at a time as they come in. That
+    keeps the database to a single writer while every core is busy building.
+    """
+
+    setting = "schedule_workers"
+
+    def __init__(self, stations, workers=None):
+        super().__init__([station for station in stations if station["_has_schedule"]], workers)
+
+    def run(self, amount, on_result=None, on_progress=None) -> list[BuildResult]:
+        """Add amount ("day", "week" or "month") to every station, calling on_result with each
+        station's BuildResult as it finishes and on_progress with (station, log line) as the
+        builds run. Returns the results in the order they finished."""
+        from fs42.liquid_schedule import LiquidSchedule
+
+        if self.workers <= 1:
+            return self._in_process(lambda station: LiquidSchedule(station).add_amount(amount), on_result)
+
+        self._l.info(f"Building {amount} for {len(self.stations)} stations with {self.workers} workers")
+        jobs = [(station["network_name"], amount) for station in self.stations]
+        return self._run(jobs, _schedule_worker, self._apply, on_result, on_progress)
+
+    def _apply(self, write):
+        from fs42.liquid_schedule import LiquidSchedule
+
+        self._l.info(f"Saving {len(write[1])} new blocks for {write[0]['network_name']}")
+        LiquidSchedule.write(*write)
+
+
+class ParallelCatalogBuild(_StationPool):
+    """Rebuilds several station catalogs at once, a few stations at a time.
+
+    Catalog builds are mostly walking and probing files, so the number running together is
+    capped by catalog_workers rather than the core count, and the probe workers are shared
+    out between them. Folders the stations have in common are scanned once up front, and
+    the built catalogs are stored from this process as each station finishes.
+    """
+
+    setting = "catalog_workers"
+    # more than a few at once and the disks are the bottleneck
+    default_workers = 4
+
+    def __init__(self, stations, workers=None, force=False, incremental=False):
+        super().__init__([station for station in stations if station["_has_catalog"]], workers)
+        self.force = force
+        self.incremental = incremental
+
+    def _shared_scan(self):
+        from fs42.shared_scan import SharedScan
+
+        standard = [station for station in self.stations if station["network_type"] == "standard"]
+        if len(standard) <= 1:
+            return None
+        # scan folders the stations have in common once, instead of once per station
+        try:
+            return SharedScan(standard, use_fingerprints=not self.force).scan()
+        except Exception as e:
+            self._l.error(f"Error scanning shared folders - stations will scan their own: {e}")
+            self._l.exception(e)
+            return None
+
+    def run(self, on_result=None, on_progress=None) -> list[BuildResult]:
+        """Rebuild every station's catalog, calling on_result with each station's BuildResult as it
+        finishes and on_progress with (station, log line) as the builds run. Returns the results
+        in the order they finished."""
+        from fs42.catalog import ShowCatalog
+
+        shared_scan = self._shared_scan()
+        if self.workers <= 1:
+            return self._in_process(
+                lambda station: ShowCatalog(
+                    station, rebuild_catalog=True, force=self.force, incremental=self.incremental, shared_scan=shared_scan
+                ),
+                on_result,
+            )
+
+        self._l.info(f"Rebuilding {len(self.stations)} catalogs with {self.workers} workers")
+        # each build is only sent the scanned folders it uses, not every station's
+        jobs = [
+            (
+                station["network_name"],
+                self.force,
+                self.incremental,
+                shared_scan.for_station(station["network_name"]) if shared_scan is not None else None,
+            )
+            for station in self.stations
+        ]
+        return self._run(jobs, _catalog_worker, self._apply, on_result, on_progress)
+
+    def _apply(self, write):
+        from fs42.catalog import ShowCatalog
+        from fs42.fluid_builder import FluidBuilder
+        from fs42.hint_mask import HintMask
+
+        (kind, write) = write
+        if kind == "scanned":
+            FluidBuilder.add_scanned(write)
+            return
+        self._l.info(f"Saving {len(write[1])} catalog entries for {write[0]['network_name']}")
+        ShowCatalog.write(*write)
+        HintMask.preload(write[1])
@@ -0,0 +1,54 @@
+import json
+
+from fs42.station_manager import StationManager
+from fs42.db import DB
+
+
+class PodIO:
+    def __init__(self):
+        self.db_path = StationManager().server_conf["db_path"]
+
+    @staticmethod
+    def create_tables(connection):
+        """
+        Creates a database table to hold ready-made reel blocks.
+        Each record is associated with a station (text string).
+        """
+        cursor = connection.cursor()
+        cursor.execute("""CREATE TABLE IF NOT EXISTS reel_pods (
+                            id INTEGER PRIMARY KEY AUTOINCREMENT,
+                            station TEXT NOT NULL,
+                            pod_key TEXT NOT NULL,
+                            reels TEXT NOT NULL,
+                            plays INTEGER DEFAULT 0,
+                            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                        )""")
+        cursor.execute("""CREATE INDEX IF NOT EXISTS idx_reel_pods_station
+                        ON reel_pods(station)""")
+        cursor.close()
+
+    def get_pods(self, station_name: str) -> list[tuple]:
+        """(pod_key, reels, plays) for every pod the station has - reels is [start, [commercials], end]
+        with each reel as [tag, path] or None"""
+        with DB.connect(self.db_path) as connection:
+            cursor = connection.cursor()
+            cursor.execute(
+                "SELECT pod_key, reels, plays FROM reel_pods WHERE station = ? ORDER BY id",
+                (station_name,),
+            )
+            rows = cursor.fetchall()
+            cursor.close()
+        return [(pod_key, json.loads(reels), plays) for pod_key, reels, plays in rows]
+
+    def put_pods(self, station_name: str, pods: list[tuple]):
+        """Replace the station's pods with these (pod_key, reels, plays)"""
+        with DB.connect(self.db_path) as connection:
+            cursor = connection.cursor()
+            cursor.execute("BEGIN TRANSACTION;")
+            cursor.execute("DELETE FROM reel_pods WHERE station = ?", (station_name,))
+            cursor.executemany(
+                "INSERT INTO reel_pods (station, pod_key, reels, plays) VALUES (?, ?, ?, ?)",
+                [(station_name, pod_key, json.dumps(reels), plays) for pod_key, reels, plays in pods],
+            )
+            connection.commit()
+            cursor.close()
@@ -0,0 +1,184 @@
+import hashlib
+import json
+import logging
+import math
+
+from fs42.catalog_io import CatalogIO
+from fs42.columnar_catalog import ColumnarTag
+from fs42.hint_mask import HintMask
+from fs42.pod_io import PodIO
+
+
+class PodLibrary:
+    """Ready-made reel blocks (pods) for the break lengths a station keeps asking for.
+
+    Pods are kept per fill folder, bump folder, length and hint context - the hint sets
+    in those folders that are allowed at the time. Once a length has its full set of pods,
+    a break of that length is one lookup: the pod whose reels have the fewest plays is
+    used again and its reels' counts go up. A pod that has been used max_pod_plays times
+    is retired and a freshly built one from the least played reels takes its place, so the
+    whole folder keeps rotating through. Pods are stored with the station, so the next
+    schedule build starts with a full library.
+
+    Breaks are spread evenly over what a slot has left, so their lengths are rarely whole
+    seconds twice in a row. Lengths are bucketed down in pod_step steps from the station's
+    break_duration and pods are built to the bucket - any break in a bucket can reuse them,
+    and the few seconds they fall short go to the next break. After the first few days of
+    a schedule about 3 in 5 breaks come from a pod (with a pod used up to max_pod_plays
+    times, 3 in 4 is the most there can be).
+    """
+
+    pods_per_target = 16
+    max_pod_plays = 4
+    # a length is common - and gets pods - once it is asked for this many times
+    common_after = 3
+    # bucket size in seconds - the shortest usual commercial
+    pod_step = 15
+
+    def __init__(self, catalog):
+        self.catalog = catalog
+        self.station = catalog.config["network_name"]
+        self._l = logging.getLogger(f"{self.station} - PODS")
+        # pod key to its pods - each pod is [start bump, [commercials], end bump, plays]
+        self._pods = None
+        # lengths with pods, and how often the others have been asked for
+        self._common = set()
+        self._base = catalog.config.get("break_duration", 0)
+        if self._base:
+            self._common.add(self.length(self._base))
+        self._asked = {}
+        self._changed = False
+
+    def _load(self):
+        self._pods = {}
+        # find the catalog entries again by their tag and path
+        by_path = {}
+        for entries in self.catalog.clip_index.values():
+            if isinstance(entries, list):
+                by_path.update({(entry.tag, entry.path): entry for entry in entries})
+
+        def resolve(reel):
+            if not reel:
+                return None
+            entries = self.catalog.clip_index.get(reel[0])
+            if isinstance(entries, ColumnarTag):
+                # only make entries for the reels that are in pods
+                return entries.entry_for(reel[1])
+            return by_path.get(tuple(reel))
+
+        dropped = 0
+        for pod_key, reels, plays in PodIO().get_pods(self.station):
+            length = json.loads(pod_key)[3]
+            if self.length(length) != length:
+                # kept for a length that isn't a bucket any more
+                dropped += 1
+                continue
+            (start, comms, end) = reels
+            pod = [resolve(start), [resolve(comm) for comm in comms], resolve(end), plays]
+            if (start and pod[0] is None) or (end and pod[2] is None) or None in pod[1]:
+                # something in it has left the catalog
+                dropped += 1
+                continue
+            self._pods.setdefault(pod_key, []).append(pod)
+            self._common.add(length)
+        if dropped:
+            self._changed = True
+            self._l.info(f"Dropped {dropped} pods with reels no longer in the catalog or old lengths")
+
+    def _context(self, tags, when) -> str:
+        allowed = []
+        for tag in tags:
+            if tag in self.catalog.clip_index and len(self.catalog.clip_index[tag]):
+                for hints in self.catalog._candidate_index(tag).hint_sets():
+                    if HintMask.test(hints, when):
+                        allowed.append(f"{tag}:{CatalogIO._hints_to_json(hints)}")
+        if not allowed:
+            return ""
+        return hashlib.sha1("\n".join(sorted(allowed)).encode()).hexdigest()[:16]
+
+    def length(self, target) -> int:
+        """The bucket a break of target seconds falls in - the length its pods are built to"""
+        length = self._base + math.floor((target - self._base) / PodLibrary.pod_step) * PodLibrary.pod_step
+        # breaks shorter than a step keep their own length
+        return int(length) if length > 0 else int(target)
+
+    def key(self, target, when, bumpers, fill_tag, bump_tag) -> str:
+        """The pod key for a break, or None if breaks this long aren't common (yet)"""
+        if self._pods is None:
+            self._load()
+        target = self.length(target)
+        if target < 1:
+            # nothing to fill
+            return None
+        if target not in self._common:
+            self._asked[target] = self._asked.get(target, 0) + 1
+            if self._asked[target] < PodLibrary.common_after:
+                return None
+            self._common.add(target)
+
+        tags = [fill_tag]
+        if bumpers:
+            tags += [bump_tag, f"{bump_tag}-prebump", f"{bump_tag}-postbump"]
+        return json.dumps([fill_tag, bump_tag, bumpers, target, self._context(tags, when)])
+
+    def take(self, pod_key, when, max_duration=None):
+        """Reuse a pod for this key no longer than max_duration as (start bump, commercials, end bump),
+        or None when a new one should be built"""
+        pods = self._pods.get(pod_key)
+        if not pods or len(pods) < PodLibrary.pods_per_target:
+            return None
+
+        # pods are no longer than their bucket, but a caller can ask for less
+        fitting = pods
+        if max_duration is not None:
+            fitting = [pod for pod in pods if PodLibrary._duration(pod) <= max_duration]
+            if not fitting:
+                return None
+
+        # the pod with the least played reels on average
+        pod = min(fitting, key=lambda p: sum(reel.count for reel in PodLibrary._reels(p)) / len(PodLibrary._reels(p)))
+        reels = PodLibrary._reels(pod)
+        if pod[3] >= PodLibrary.max_pod_plays or not all(HintMask.test(reel.hints, when) for reel in reels):
+            pods.remove(pod)
+            self._changed = True
+            return None
+
+        for reel in reels:
+            self.catalog._played(reel)
+        pod[3] += 1
+        self._changed = True
+        return (pod[0], list(pod[1]), pod[2])
+
+    def add(self, pod_key, start_bump, comms, end_bump):
+        """Keep a block that was just built and played as a pod"""
+        self._pods.setdefault(pod_key, []).append([start_bump, list(comms), end_bump, 1])
+        self._changed = True
+
+    @staticmethod
+    def _reels(pod):
+        reels = list(pod[1])
+        if pod[0] is not None:
+            reels.append(pod[0])
+        if pod[2] is not None:
+            reels.append(pod[2])
+        return reels
+
+    @staticmethod
+    def _duration(pod):
+        return sum(reel.duration for reel in PodLibrary._reels(pod))
+
+    def changed_rows(self) -> list:
+        """The (pod_key, reels, plays) to store for the station if anything changed since the last call, else None"""
+        if not self._changed or self._pods is None:
+            return None
+
+        def ref(reel):
+            return [reel.tag, reel.path] if reel is not None else None
+
+        rows = []
+        for pod_key, pods in self._pods.items():
+            for start, comms, end, plays in pods:
+                rows.append((pod_key, [ref(start), [ref(comm) for comm in comms], ref(end)], plays))
+        self._changed = False
+        self._l.info(f"{len(rows)} pods for {len(self._pods)} break lengths to save")
+        return rows
@@ -0,0 +1,151 @@
+import logging
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from fs42.station_manager import StationManager
+
+
+def _to_number(value, kind=float):
+    try:
+        return kind(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _to_rate(value):
+    # ffprobe gives frame rates as fractions like 30000/1001
+    if not value:
+        return None
+    num, _, den = str(value).partition("/")
+    num = _to_number(num)
+    den = _to_number(den) if den else 1.0
+    if not num or not den:
+        return None
+    return round(num / den, 3)
+
+
+class ProbeResult:
+    def __init__(self, path, duration=0.0, error=None, meta=None):
+        self.path = path
+        self.duration = duration
+        self.error = error
+        # compact summary of the probe - see meta_from_probe
+        self.meta = meta
+
+    def __str__(self):
+        return f"ProbeResult: {self.path} duration={self.duration} error={self.error}"
+
+    @staticmethod
+    def meta_from_probe(probed: dict) -> dict:
+        """Boil ffprobe output down to the fields later stages need, leaving out anything it didn't report"""
+        meta = {}
+        fmt = probed.get("format", {})
+        streams = probed.get("streams", [])
+        video = None
+        audio = None
+        for stream in streams:
+            kind = stream.get("codec_type")
+            # cover art shows up as a video stream
+            if kind == "video" and video is None and not stream.get("disposition", {}).get("attached_pic"):
+                video = stream
+            elif kind == "audio" and audio is None:
+                audio = stream
+
+        candidates = {
+            "container": fmt.get("format_name"),
+            "duration": _to_number(fmt.get("duration")),
+            "bit_rate": _to_number(fmt.get("bit_rate"), int),
+        }
+        if video:
+            candidates.update(
+                {
+                    "video_codec": video.get("codec_name"),
+                    "width": _to_number(video.get("width"), int),
+                    "height": _to_number(video.get("height"), int),
+                    "fps": _to_rate(video.get("avg_frame_rate")) or _to_rate(video.get("r_frame_rate")),
+                    "video_bit_rate": _to_number(video.get("bit_rate"), int),
+                }
+            )
+        if audio:
+            candidates.update(
+                {
+                    "audio_codec": audio.get("codec_name"),
+                    "audio_channels": _to_number(audio.get("channels"), int),
+                    "sample_rate": _to_number(audio.get("sample_rate"), int),
+                }
+            )
+        for key, value in candidates.items():
+            if value is not None:
+                meta[key] = value
+        return meta
+
+
+    @staticmethod
+    def meta_has_audio(meta: dict):
+        """Whether stored probe metadata shows an audio stream - None if there is no metadata to go on"""
+        if not meta:
+            return None
+        return "audio_codec" in meta or "audio_channels" in meta
+
+
+def _probe_worker(fname) -> ProbeResult:
+    # runs inside a pool process, so import here to keep the pickled call small
+    from fs42.media_processor import MediaProcessor
+
+    try:
+        (duration, meta) = MediaProcessor.probe_media(fname)
+        return ProbeResult(fname, duration, meta=meta)
+    except Exception as e:
+        return ProbeResult(fname, 0.0, f"{type(e).__name__}: {e}")
+
+
+class ProbeEngine(object):
+    """Probes batches of media files for durations using a shared pool of worker processes."""
+
+    # the borg singleton pattern - so the pool is shared between catalog builds
+    __we_are_all_one = {}
+    _initialized = False
+
+    # batches smaller than this are cheaper to probe in-process
+    min_batch = 2
+
+    def __init__(self):
+        self.__dict__ = self.__we_are_all_one
+        if not self._initialized:
+            self._initialized = True
+            self._l = logging.getLogger("PROBE")
+            self._executor = None
+            self.workers = StationManager().server_conf.get("probe_workers") or os.cpu_count() or 1
+
+    def _get_executor(self):
+        if self._executor is None:
+            self._l.debug(f"Starting probe pool with {self.workers} workers")
+            # builds can start from a thread of the web server, where forking can copy a lock another
+            # thread is holding - forkserver workers start from a clean process instead
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers, mp_context=multiprocessing.get_context("forkserver")
+            )
+        return self._executor
+
+    def shutdown(self):
+        """Stop the pool's workers - the next batch starts a new pool"""
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+    def probe(self, file_list: list[str]) -> list[ProbeResult]:
+        """Probe every file and return results in the same order as file_list."""
+        if self.workers <= 1 or len(file_list) < self.min_batch:
+            return [_probe_worker(fname) for fname in file_list]
+
+        # keep the workers busy without paying for one round trip per file
+        chunksize = max(1, min(32, len(file_list) // (self.workers * 4)))
+        try:
+            return list(self._get_executor().map(_probe_worker, file_list, chunksize=chunksize))
+        except BrokenProcessPool as e:
+            self._l.error("Probe pool failed - falling back to probing files one at a time")
+            self._l.exception(e)
+            self._executor = None
+            return [_probe_worker(fname) for fname in file_list]
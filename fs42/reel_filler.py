@@ -0,0 +1,59 @@
+import math
+
+
+class ReelFiller:
+    """Picks the reels that fill a gap as closely as possible without running over.
+
+    Each gap is a bounded subset sum over the candidates' durations, solved with a bitset
+    of the reachable totals - one shift and or per candidate. Candidates come least played
+    first, and the solution is rebuilt from the back, so later (more played) candidates are
+    only used when the earlier ones can't make the same total.
+    """
+
+    # durations are counted in steps this many to the second, rounded up so a fill never runs over
+    resolution = 10
+    # candidates to consider for a gap - plenty to find an exact fit in any real pool
+    max_candidates = 64
+
+    @staticmethod
+    def _weight(duration) -> int:
+        return math.ceil(duration * ReelFiller.resolution)
+
+    @staticmethod
+    def solve(candidates, seconds) -> list:
+        """The subset of candidates that comes closest to seconds without going over, in candidate order"""
+        capacity = int(seconds * ReelFiller.resolution)
+        if capacity <= 0:
+            return []
+
+        # more than capacity // weight of any one length can never be used together
+        items = []
+        per_weight = {}
+        for candidate in candidates:
+            weight = ReelFiller._weight(candidate.duration)
+            if weight <= 0 or weight > capacity:
+                continue
+            if per_weight.get(weight, 0) < capacity // weight:
+                per_weight[weight] = per_weight.get(weight, 0) + 1
+                items.append((candidate, weight))
+
+        # bit n of reachable is set when some of the items so far add up to n
+        full = (1 << (capacity + 1)) - 1
+        reachable = 1
+        before = []
+        for _, weight in items:
+            before.append(reachable)
+            reachable = (reachable | (reachable << weight)) & full
+
+        best = reachable.bit_length() - 1
+        chosen = []
+        for i in range(len(items) - 1, -1, -1):
+            if best == 0:
+                break
+            if not (before[i] >> best) & 1:
+                # can't make this total without item i
+                (candidate, weight) = items[i]
+                chosen.append(candidate)
+                best -= weight
+        chosen.reverse()
+        return chosen
@@ -1,48 +1,46 @@
-import sqlite3
 
 from fs42.station_manager import StationManager
+from fs42.db import DB
 from fs42.sequence import NamedSequence
 
 
 class SequenceIO:
     def __init__(self):
         self.db_path = StationManager().server_conf["db_path"]
-        self._init_sequence_table()
 
-    def _init_sequence_table(self):
+    @staticmethod
+    def create_tables(connection):
         """
         Creates a database table to hold SeriesIndex records.
         Each record is associated with a series (text string).
         """
-        with sqlite3.connect(self.db_path) as connection:
-            cursor = connection.cursor()
-            cursor.execute("""CREATE TABLE IF NOT EXISTS named_sequence (
-                                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                                station TEXT NOT NULL,
-                                sequence_name TEXT NOT NULL,
-                                tag_path TEXT NOT NULL,
-                                start_perc REAL NOT NULL,
-                                end_perc REAL NOT NULL,
-                                current_index INTEGER NOT NULL,
-                                UNIQUE(station, sequence_name, tag_path)
-                            )""")
-
-            # now make a table to hold sequence entries
-            cursor.execute("""CREATE TABLE IF NOT EXISTS sequence_entries (
-                                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                                fpath TEXT NOT NULL,
-                                sequence_index INTEGER NOT NULL,
-                                named_sequence_id INTEGER NOT NULL,
-                                FOREIGN KEY(named_sequence_id) REFERENCES named_sequence(id)
-                            )""")
-            cursor.close()
-            connection.commit()
+        cursor = connection.cursor()
+        cursor.execute("""CREATE TABLE IF NOT EXISTS named_sequence (
+                            id INTEGER PRIMARY KEY AUTOINCREMENT,
+                            station TEXT NOT NULL,
+                            sequence_name TEXT NOT NULL,
+                            tag_path TEXT NOT NULL,
+                            start_perc REAL NOT NULL,
+                            end_perc REAL NOT NULL,
+                            current_index INTEGER NOT NULL,
+                            UNIQUE(station, sequence_name, tag_path)
+                        )""")
+
+        # now make a table to hold sequence entries
+        cursor.execute("""CREATE TABLE IF NOT EXISTS sequence_entries (
+                            id INTEGER PRIMARY KEY AUTOINCREMENT,
+                            fpath TEXT NOT NULL,
+                            sequence_index INTEGER NOT NULL,
+                            named_sequence_id INTEGER NOT NULL,
+                            FOREIGN KEY(named_sequence_id) REFERENCES named_sequence(id)
+                        )""")
+        cursor.close()
 
     def put_sequence(self, station_name: str, named_sequence):
         """
         Store a SeriesIndex in the database.
         """
-        with sqlite3.connect(self.db_path) as connection:
+        with DB.connect(self.db_path) as connection:
             cursor = connection.cursor()
             # Insert or update the named sequence
             cursor.execute(
@@ -71,7 +69,7 @@ class SequenceIO:
             connection.commit()
 
     def get_sequence(self, station_name: str, sequence_name: str, tag_path: str) -> NamedSequence:
-        with sqlite3.connect(self.db_path) as connection:
+        with DB.connect(self.db_path) as connection:
             cursor = connection.cursor()
             cursor.execute(
                 """SELECT id, start_perc, end_perc, current_index 
@@ -99,7 +97,7 @@ class SequenceIO:
             return ns
 
     def get_all_sequences_for_station(self, station_name: str) -> list[NamedSequence]:
-        with sqlite3.connect(self.db_path) as connection:
+        with DB.connect(self.db_path) as connection:
             cursor = connection.cursor()
             cursor.execute(
                 """SELECT id, sequence_name, tag_path, start_perc, end_perc, current_index 
@@ -131,7 +129,7 @@ class SequenceIO:
 
 
     def delete_sequences_for_station(self, station_name: str):
-        with sqlite3.connect(self.db_path) as connection:
+        with DB.connect(self.db_path) as connection:
             cursor = connection.cursor()
             # Delete all sequence entries for the station
             cursor.execute(
@@ -146,7 +144,7 @@ class SequenceIO:
 
     
     def update_current_index(self, station_name: str, sequence_name: str, tag_path: str, new_index: int):
-        with sqlite3.connect(self.db_path) as connection:
+        with DB.connect(self.db_path) as connection:
             cursor = connection.cursor()
             cursor.execute(
                 """UPDATE named_sequence 
@@ -158,7 +156,7 @@ class SequenceIO:
             connection.commit()
 
     def update_sequence_index_by_path(self, station_name: str, sequence_name: str, tag_path: str, episode_path: str):
-        with sqlite3.connect(self.db_path) as connection:
+        with DB.connect(self.db_path) as connection:
             cursor = connection.cursor()
             # Get the sequence_index for the episode_path
             cursor.execute("""
@@ -185,7 +183,7 @@ class SequenceIO:
         Clean up sequences by removing entries that are no longer valid.
         This can be used to remove entries that have been deleted from the filesystem.
         """
-        with sqlite3.connect(self.db_path) as connection:
+        with DB.connect(self.db_path) as connection:
             cursor = connection.cursor()
             cursor.execute(
                 """DELETE FROM sequence_entries
@@ -0,0 +1,93 @@
+import copy
+import logging
+import os
+
+from fs42.catalog import ShowCatalog, FF_USE_FLUID_FILE_CACHE
+from fs42.media_walker import MediaWalker
+
+
+class SharedScan:
+    """Walks and probes the tag folders of several standard stations once.
+
+    Stations that share a content library (or just a commercial or bump folder) would
+    otherwise each walk and check the same files. The plan is the union of every station's
+    (tag folder, tag, is_bumps) keyed by the real folder path - each one is scanned once
+    and every station gets its own copies of the entries, with paths spelled its own way.
+    """
+
+    def __init__(self, stations, use_fingerprints=True):
+        self._l = logging.getLogger("SHARED")
+        self.use_fingerprints = use_fingerprints
+        # real content folder to the folder as the first station spelled it
+        self._content_dirs = {}
+        # (real tag folder, tag, is_bumps) to the folder as the first station spelled it
+        self._plan = {}
+        # same keys as the plan, to (scanned folder, scanned clip index lists)
+        self._results = {}
+        # station name to the plan keys it uses
+        self._station_keys = {}
+
+        for station in stations:
+            if station["network_type"] != "standard":
+                continue
+            content_dir = station["content_dir"]
+            self._content_dirs.setdefault(os.path.realpath(content_dir), content_dir)
+            keys = self._station_keys.setdefault(station["network_name"], [])
+            for tag, is_bumps in ShowCatalog(station, load=False).scan_dirs():
+                tag_dir = f"{content_dir}/{tag}"
+                key = (os.path.realpath(tag_dir), tag, is_bumps)
+                self._plan.setdefault(key, tag_dir)
+                keys.append(key)
+
+    def scan(self):
+        """Bring the file cache up to date for each content folder, then scan each planned folder once."""
+        self._l.info(f"Scanning {len(self._plan)} tag folders in {len(self._content_dirs)} content folders")
+        fluid = None
+        MediaWalker().forget()
+        try:
+            if FF_USE_FLUID_FILE_CACHE:
+                from fs42.fluid_builder import FluidBuilder
+
+                fluid = FluidBuilder()
+                for content_dir in self._content_dirs.values():
+                    fluid.scan_file_cache(
+                        content_dir, use_fingerprints=self.use_fingerprints, retry_failures=not self.use_fingerprints
+                    )
+
+            for key, tag_dir in self._plan.items():
+                (_, tag, is_bumps) = key
+                try:
+                    self._results[key] = (tag_dir, ShowCatalog.scan_tag_dir(tag_dir, tag, is_bumps, fluid=fluid))
+                except Exception as e:
+                    # leave it out - the station scans it on its own and reports the problem there
+                    self._l.warning(f"Shared scan of {tag_dir} failed: {e}")
+        finally:
+            MediaWalker().forget()
+        return self
+
+    def for_station(self, station_name):
+        """The part of the scan one station uses - what a build in another process is sent"""
+        part = copy.copy(self)
+        keys = self._station_keys.get(station_name, [])
+        part._station_keys = {station_name: keys}
+        part._plan = {key: self._plan[key] for key in keys}
+        part._results = {key: self._results[key] for key in keys if key in self._results}
+        return part
+
+    @staticmethod
+    def _copy(entry, scanned_dir, tag_dir):
+        entry = copy.copy(entry)
+        if scanned_dir != tag_dir and entry.path.startswith(scanned_dir):
+            entry.path = tag_dir + entry.path[len(scanned_dir) :]
+        return entry
+
+    def results_for(self, tag_dir, tag, is_bumps=False) -> dict:
+        """Copies of the scanned clip index lists for this folder, or None if it wasn't scanned"""
+        key = (os.path.realpath(tag_dir), tag, is_bumps)
+        if key not in self._results:
+            return None
+        (scanned_dir, scanned) = self._results[key]
+        return {
+            index_tag: [SharedScan._copy(entry, scanned_dir, tag_dir) for entry in clips]
+            for index_tag, clips in scanned.items()
+        }
@@ -58,6 +58,11 @@ class StationManager(object):
                     "start_mpv": True,
                     "server_host": "0.0.0.0",
                     "server_port": 4242,
+                    "probe_workers": None,
+                    "break_workers": None,
+                    "schedule_workers": None,
+                    "catalog_workers": None,
+                    "columnar_catalog_entries": None,
                 }
                 self._number_index = {}
                 self._name_index = {}
@@ -111,7 +116,20 @@ class StationManager(object):
         if os.path.exists(StationManager.__main_config_path):
             with open(StationManager.__main_config_path) as f:
                 try:
-                    to_check = ["channel_socket", "status_socket", "time_format", "start_mpv", "db_path", "server_host", "server_port"]
+                    to_check = [
+                        "channel_socket",
+                        "status_socket",
+                        "time_format",
+                        "start_mpv",
+                        "db_path",
+                        "server_host",
+                        "server_port",
+                        "probe_workers",
+                        "break_workers",
+                        "schedule_workers",
+                        "catalog_workers",
+                        "columnar_catalog_entries",
+                    ]
                     d = json.load(f)
 
                     for key in to_check:
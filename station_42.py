@@ -6,14 +6,14 @@ from rich.console import Console
 from rich.logging import RichHandler
 from rich.panel import Panel
 from rich import style
+from rich.markup import escape
 
 from fs42.catalog import ShowCatalog
 from fs42.station_manager import StationManager
 from fs42.liquid_manager import LiquidManager
-from fs42.liquid_schedule import LiquidSchedule
+from fs42.parallel_build import ParallelBuild, ParallelCatalogBuild
 from fs42.fluid_builder import FluidBuilder
 from fs42.sequence_api import SequenceAPI
-from fs42.fs42_server.fs42_server import mount_fs42_api
 
 FF_USE_FLUID_FILE_CACHE = True
 
@@ -21,12 +21,12 @@ logging.basicConfig(format="[%(name)s] %(message)s", level=logging.INFO, handler
 
 
 class Station42:
-    def __init__(self, config, rebuild_catalog=False, force=False):
+    def __init__(self, config, rebuild_catalog=False, force=False, incremental=False, shared_scan=None):
         # station configuration
         self.config = config
         self._l = logging.getLogger(self.config["network_name"])
         self.catalog: ShowCatalog = ShowCatalog(
-            self.config, rebuild_catalog=rebuild_catalog, force=force
+            self.config, rebuild_catalog=rebuild_catalog, force=force, incremental=incremental, shared_scan=shared_scan
         )
         self.get_text_listing = self.catalog.get_text_listing
         self.check_catalog = self.catalog.check_catalog
@@ -97,6 +97,11 @@ def build_parser():
         "--break_detect_dir",
         help="Scan for points break insertion point in media files in the provided directory. (VERY experimental)",
     )
+    parser.add_argument(
+        "--fast_break_detect",
+        action="store_true",
+        help="With -b will detect breaks on a low resolution, reduced frame rate picture - much faster, slightly less precise",
+    )
     parser.add_argument(
         "-w",
         "--add_week",
@@ -138,6 +143,18 @@ def build_parser():
         action="store_true",
         help="With -r or -x will force deletion of schedules and catalogs if they are failing. Wont reset sequences, file cache or breakpoints",
     )
+    parser.add_argument(
+        "-i",
+        "--incremental",
+        action="store_true",
+        help="With -r will only write added, removed and changed files to the catalog - keeps catalog ids, play counts and schedules",
+    )
+    parser.add_argument(
+        "-t",
+        "--watch_catalogs",
+        nargs="*",
+        help="Watch content folders and keep catalogs for the specified networks (or all networks) up to date until stopped.",
+    )
     parser.add_argument(
         "-v",
         "--verbose",
@@ -192,25 +209,26 @@ def main():
                         f"Failed to reset schedule for {station['network_name']} - check logs."
                     )
 
+    def _progress(station_name, line):
+        # log lines from stations building in other processes
+        console.print(f"[dim]{escape(station_name)}[/dim] {escape(line)}", highlight=False)
+
     def rebuild_catalogs(_rebuild_list):
         nonlocal success_messages, failure_messages, _l
         _l.info("Starting catalog rebuild.")
-        for station in _rebuild_list:
-            if station["_has_catalog"]:
-                _l.info(f"Rebuilding catalog for {station['network_name']}")
-                try:
-                    Station42(station, True, args.force)
-                    success_messages.append(
-                        f"Successfully rebuilt catalog for {station['network_name']}"
-                    )
-                except Exception as e:
-                    console.print(
-                        f"[red]Error rebuilding catalog for {station['network_name']}: {e}[/red]"
-                    )
-                    _l.exception(e)
-                    failure_messages.append(
-                        f"Failed to rebuild catalog for {station['network_name']} - check logs."
-                    )
+
+        def _outcome(result):
+            if result.ok:
+                success_messages.append(f"Successfully rebuilt catalog for {result.station}")
+            else:
+                console.print(f"[red]Error rebuilding catalog for {result.station}: {result.error}[/red]")
+                failure_messages.append(
+                    f"Failed to rebuild catalog for {result.station} - check logs."
+                )
+
+        ParallelCatalogBuild(_rebuild_list, force=args.force, incremental=args.incremental).run(
+            on_result=_outcome, on_progress=_progress
+        )
 
 
     execution_start_time = datetime.datetime.now()
@@ -310,6 +328,25 @@ def main():
                     )
         print_outcome(success_messages, failure_messages, console)
         return
+    elif args.watch_catalogs is not None:
+        try:
+            from fs42.catalog_watcher import CatalogWatcher
+        except ModuleNotFoundError:
+            _l.error("Could not load the catalog watcher - please install inotify_simple")
+            _l.error("Use this command to install: pip install inotify_simple")
+            sys.exit(-1)
+
+        try:
+            _watch_list = [station for station in _get_arg_stations(args.watch_catalogs) if station["_has_catalog"]]
+            CatalogWatcher(_watch_list).run()
+        except KeyboardInterrupt:
+            success_messages.append("I stopped watching catalogs")
+        except Exception as e:
+            console.print(f"[red]Error watching catalogs: {e}[/red]")
+            _l.exception(e)
+            failure_messages.append("Failed to watch catalogs - check logs.")
+        print_outcome(success_messages, failure_messages, console)
+        return
 
 
     if args.delete_schedules is not None:
@@ -337,13 +374,15 @@ def main():
             failure_messages.append(
                 "Failed to get list of stations to rebuild - check your arguments."
             )
-        delete_schedules(_rebuild_list)
+        # incremental builds keep the catalog ids schedules point at, so the schedules stay
+        if not args.incremental:
+            delete_schedules(_rebuild_list)
         rebuild_catalogs(_rebuild_list)
 
         if FF_USE_FLUID_FILE_CACHE:
             try:
-                FluidBuilder().trim_file_cache(execution_start_time)
-                success_messages.append("I trimmed the fluid cache")
+                if FluidBuilder().trim_file_cache(execution_start_time):
+                    success_messages.append("I trimmed the fluid cache")
             except Exception as e:
                 console.print(f"[red]Error trimming fluid cache: {e}[/red]")
                 _l.exception(e)
@@ -408,95 +447,32 @@ def main():
 
     if args.break_detect_dir is not None:
         _l.info("Scanning for break detection points in media files...")
-        FluidBuilder().scan_breaks(args.break_detect_dir)
+        FluidBuilder().scan_breaks(args.break_detect_dir, fast=args.fast_break_detect)
         success_messages.append("I scanned for break detection points")
 
-    if args.add_day is not None:
-        _to_add_to = []
-        try:
-            _to_add_to = _get_arg_stations(args.add_day)
-        except Exception as e:
-            console.print(f"[red]Error getting list of stations to add days: {e}[/red]")
-            _l.exception(e)
-            failure_messages.append(
-                "Failed to get list of stations to add days - check your arguments."
-            )
-
-        for station in _to_add_to:
-            if station["_has_schedule"]:
-                try:
-                    liquid = LiquidSchedule(station)
-                    liquid.add_days(1)
-                    success_messages.append(
-                        f"I added a day to {station['network_name']}"
-                    )
-                except Exception as e:
-                    console.print(
-                        f"[red]Error adding a day to {station['network_name']}: {e}[/red]"
-                    )
-                    _l.exception(e)
-
-                    failure_messages.append(
-                        f"Failed to add a day to {station['network_name']} - check logs."
-                    )
-
-    if args.add_week is not None:
-        _to_add_to = []
-        try:
-            _to_add_to = _get_arg_stations(args.add_week)
-        except Exception as e:
-            _l.error(f"Error getting list of stations to add weeks: {e}")
-            _l.exception(e)
-            failure_messages.append(
-                "Failed to get list of stations to add weeks - check your arguments."
-            )
+    for (arg, amount) in [(args.add_day, "day"), (args.add_week, "week"), (args.add_month, "month")]:
+        if arg is not None:
+            _to_add_to = []
+            try:
+                _to_add_to = _get_arg_stations(arg)
+            except Exception as e:
+                console.print(f"[red]Error getting list of stations to add {amount}s: {e}[/red]")
+                _l.exception(e)
+                failure_messages.append(
+                    f"Failed to get list of stations to add {amount}s - check your arguments."
+                )
 
-        for station in _to_add_to:
-            if station["_has_schedule"]:
-                try:
-                    liquid = LiquidSchedule(station)
-                    liquid.add_week()
-                    success_messages.append(
-                        f"I added a week to {station['network_name']}"
-                    )
-                except Exception as e:
-                    console.print(
-                        f"[red]Error adding a week to {station['network_name']}: {e}[/red]"
-                    )
-                    _l.exception(e)
+            # stations build side by side, with this process writing their schedules as they finish
+            def _outcome(result, amount=amount):
+                if result.ok:
+                    success_messages.append(f"I added a {amount} to {result.station}")
+                else:
+                    console.print(f"[red]Error adding a {amount} to {result.station}: {result.error}[/red]")
                     failure_messages.append(
-                        f"Failed to add a week to {station['network_name']} - check logs."
+                        f"Failed to add a {amount} to {result.station} - check logs."
                     )
 
-    if args.add_month is not None:
-        _to_add_to = []
-        try:
-            _to_add_to = _get_arg_stations(args.add_month)
-        except Exception as e:
-            console.print(
-                f"[red]Error getting list of stations to add months: {e}[/red]"
-            )
-            _l.exception(e)
-            failure_messages.append(
-                "Failed to get list of stations to add months - check your arguments."
-            )
-
-        for station in _to_add_to:
-            if station["_has_schedule"]:
-                try:
-                    liquid = LiquidSchedule(station)
-                    liquid.add_month()
-                    success_messages.append(
-                        f"I added a month to {station['network_name']}"
-                    )
-                except Exception as e:
-                    console.print(
-                        f"[red]Error adding a month to {station['network_name']}: {e}[/red]"
-                    )
-                    _l.exception(e)
-                    failure_messages.append(
-                        f"Failed to add a month to {station['network_name']} - check logs."
-                    )
+            ParallelBuild(_to_add_to).run(amount, on_result=_outcome, on_progress=_progress)
 
     print_outcome(success_messages, failure_messages, console)
 
@@ -505,6 +481,9 @@ def main():
         print()
         console.print(Panel.fit(info, title="FieldStation42", subtitle="Its Up To You.", border_style=style.Style(color="blue")))
         print()
+        # the web server pulls in fastapi and uvicorn, so only load it when it's going to run
+        from fs42.fs42_server.fs42_server import mount_fs42_api
+
         mount_fs42_api()
         
         return
@@ -0,0 +1,56 @@
+import pytest
+
+from fs42.candidate_index import CandidateIndex
+from fs42.catalog_entry import CatalogEntry
+from fs42.pod_library import PodLibrary
+from fs42.station_manager import StationManager
+
+
+class StubCatalog:
+    # just what the pod library uses of ShowCatalog
+    def __init__(self, entries):
+        self.config = {"network_name": "test", "break_duration": 120}
+        self.clip_index = {"commercial": entries}
+        self.tag_dur_cache = {"commercial": CandidateIndex(entries)}
+
+    def _candidate_index(self, tag):
+        return self.tag_dur_cache[tag]
+
+    def _played(self, entry):
+        self.tag_dur_cache["commercial"].played(entry)
+
+
+def _make_entries(durations, counts=None, hints=None):
+    entries = []
+    for i, duration in enumerate(durations):
+        entry = CatalogEntry(f"/content/commercial_{i}.mp4", duration, "commercial", hints or [])
+        entry.count = counts[i] if counts else 0
+        entries.append(entry)
+    return entries
+
+
+def _make_library():
+    entries = _make_entries([30] * 64)
+    library = PodLibrary(StubCatalog(entries))
+    library._pods = {}
+    return (library, entries)
+
+
+@pytest.fixture
+def make_entries():
+    """Makes commercials with these durations, and optionally play counts and hints"""
+    return _make_entries
+
+
+@pytest.fixture
+def make_library():
+    """Makes an empty pod library over 64 thirty second commercials, as (library, entries)"""
+    return _make_library
+
+
+@pytest.fixture
+def db_path(tmp_path, monkeypatch):
+    """Points the configured database at a fresh file for the test"""
+    db_path = str(tmp_path / "fs42_fluid.db")
+    monkeypatch.setitem(StationManager().server_conf, "db_path", db_path)
+    return db_path
@@ -0,0 +1,39 @@
+import pytest
+
+pytest.importorskip("ffmpeg")
+
+from fs42.media_processor import MediaProcessor
+
+
+class TestBlackDetectParsing:
+
+    def test_good_line(self):
+        line = "[blackdetect @ 0x5581c1e0] black_start:1320.32 black_end:1322.4 black_duration:2.08"
+        info = MediaProcessor._parse_blackdetect_line(line)
+        assert info == {"black_start": 1320.32, "black_end": 1322.4, "black_duration": 2.08}
+
+    def test_other_lines(self):
+        assert MediaProcessor._parse_blackdetect_line("frame= 1000 fps=250 q=-0.0 size=N/A") is None
+        assert MediaProcessor._parse_blackdetect_line("[blackdetect @ 0x1] black_start:12.0") is None
+        assert MediaProcessor._parse_blackdetect_line("blackdetect without a bracket") is None
+        assert MediaProcessor._parse_blackdetect_line("[blackdetect @ 0x1] black_start:abc black_end:1") is None
+
+
+class TestPruneSegments:
+
+    def points(self, starts_and_scores):
+        return [{"black_start": start, "black_duration": 0.5, "score": score} for start, score in starts_and_scores]
+
+    def test_lower_score_goes(self):
+        points = MediaProcessor.calc_black_segments(self.points([(100, 1.0), (120, 2.0), (400, 1.0)]), 600)
+        pruned = MediaProcessor._prune_segments(points, 600, 60)
+        assert [p["black_start"] for p in pruned] == [120, 400]
+
+        points = MediaProcessor.calc_black_segments(self.points([(100, 2.5), (120, 2.0), (400, 1.0)]), 600)
+        pruned = MediaProcessor._prune_segments(points, 600, 60)
+        assert [p["black_start"] for p in pruned] == [100, 400]
+
+    def test_leaves_one(self):
+        points = MediaProcessor.calc_black_segments(self.points([(580, 1.0), (590, 1.0)]), 600)
+        assert len(MediaProcessor._prune_segments(points, 600, 60)) == 1
+        assert MediaProcessor._prune_segments([], 600, 60) == []
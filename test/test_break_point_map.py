@@ -0,0 +1,35 @@
+import pytest
+
+pytest.importorskip("ffmpeg")
+
+from fs42.break_point_map import BreakPointMap
+from fs42.liquid_blocks import LiquidBlock
+
+
+def make_points(starts):
+    return [{"black_start": start, "black_duration": 1.0} for start in starts]
+
+
+class TestBreakPointMap:
+    def test_missing_file(self):
+        breaks = BreakPointMap({})
+        assert breaks.get("/content/show.mp4") == []
+        assert breaks.clipped("/content/show.mp4", [2], 1800) == []
+
+    def test_clipped_matches_clip_break_points(self):
+        starts = [300, 420, 900, 1000, 1500]
+        breaks = BreakPointMap({"/content/show.mp4": make_points(starts)})
+        once = LiquidBlock.clip_break_points(make_points(starts), 3, 1800)
+        assert breaks.clipped("/content/show.mp4", [3], 1800) == once
+        twice = LiquidBlock.clip_break_points(once, 2, 1800)
+        assert breaks.clipped("/content/show.mp4", [3, 2], 1800) == twice
+
+    def test_reruns_share_the_clip(self):
+        breaks = BreakPointMap({"/content/show.mp4": make_points([300, 420, 900, 1000])})
+        first = breaks.clipped("/content/show.mp4", [2], 1800)
+        # the caller gets its own copy, but the work is only done once
+        first.pop()
+        assert len(breaks.clipped("/content/show.mp4", [2], 1800)) == 2
+        assert len(breaks._clipped) == 1
+        # and the stored points are left as they were
+        assert "segment_duration" not in breaks.get("/content/show.mp4")[0]
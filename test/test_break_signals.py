@@ -0,0 +1,53 @@
+import pytest
+from fs42.break_signals import BreakSignals
+
+
+class TestBreakSignals:
+
+    log = [
+        "[blackdetect @ 0x55] black_start:300.1 black_end:301.6 black_duration:1.5",
+        "[silencedetect @ 0x56] silence_start: 300.0",
+        "[silencedetect @ 0x56] silence_end: 301.9 | silence_duration: 1.9",
+        "[Parsed_metadata_2 @ 0x57] frame:9003 pts:9003 pts_time:301.7",
+        "[Parsed_metadata_2 @ 0x57] lavfi.scene_score=0.820000",
+        "[blackdetect @ 0x55] black_start:900.0 black_end:900.2 black_duration:0.2",
+        "[silencedetect @ 0x56] silence_start: 1500.2",
+        "[silencedetect @ 0x56] silence_end: 1501.0 | silence_duration: 0.8",
+        "[Parsed_metadata_2 @ 0x57] frame:45010 pts:45010 pts_time:1500.5",
+        "[Parsed_metadata_2 @ 0x57] lavfi.scene_score=0.500000",
+        "[Parsed_metadata_2 @ 0x57] frame:60000 pts:60000 pts_time:2000.0",
+        "[Parsed_metadata_2 @ 0x57] lavfi.scene_score=0.900000",
+        "frame= 1000 fps=250 q=-0.0 size=N/A",
+    ]
+
+    def signals(self):
+        signals = BreakSignals()
+        for line in TestBreakSignals.log:
+            signals.feed(line)
+        return signals
+
+    def test_parsing(self):
+        signals = self.signals()
+        assert len(signals.black) == 2
+        assert signals.silences == [(300.0, 301.9), (1500.2, 1501.0)]
+        assert signals.scenes == [(301.7, 0.82), (1500.5, 0.5), (2000.0, 0.9)]
+
+    def test_candidates(self):
+        candidates = self.signals().candidates()
+        assert [c["black_start"] for c in candidates] == [300.1, 900.0, 1500.5]
+
+        (agreed, black_only, silent_cut) = candidates
+        assert agreed["signals"] == ["black", "silence", "scene"]
+        assert black_only["signals"] == ["black"]
+        assert agreed["score"] > black_only["score"]
+
+        # a cut during silence, with no black, breaks right at the cut
+        assert silent_cut["signals"] == ["silence", "scene"]
+        assert silent_cut["black_duration"] == 0.0
+        assert silent_cut["score"] == pytest.approx(1.5)
+
+    def test_unfinished_silence(self):
+        signals = BreakSignals()
+        signals.feed("[silencedetect @ 0x56] silence_start: 10.0")
+        signals.feed("[silencedetect @ 0x56] silence_end: garbage")
+        assert signals.silences == []
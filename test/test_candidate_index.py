@@ -0,0 +1,59 @@
+from datetime import datetime
+from fs42.candidate_index import CandidateIndex
+from fs42.schedule_hint import MonthHint
+
+WHEN = datetime(2023, 6, 1, 12)
+
+
+class TestCandidateIndex:
+    def test_shorter_than(self, make_entries):
+        entries = make_entries([0.5, 15, 30, 60])
+        index = CandidateIndex(entries)
+        for _ in range(10):
+            found = index.take(31, WHEN)
+            assert found.duration in (15, 30)
+        # too short to be valid, or too long to fit
+        assert index.take(1, WHEN) is None
+
+    def test_least_played(self, make_entries):
+        entries = make_entries([10, 20, 30], counts=[3, 1, 2])
+        index = CandidateIndex(entries)
+        assert index.take(60, WHEN).duration == 20
+        # now tied with the 30 second clip at 2
+        assert index.take(60, WHEN).duration in (20, 30)
+        assert sorted(e.count for e in entries) == [2, 3, 3]
+
+    def test_spreads_plays(self, make_entries):
+        entries = make_entries([30] * 10)
+        index = CandidateIndex(entries)
+        for _ in range(50):
+            index.take(31, WHEN)
+        assert all(e.count == 5 for e in entries)
+
+    def test_hints(self, make_entries):
+        entries = make_entries([30] * 40, hints=[MonthHint("December")])
+        entries += make_entries([30])
+        index = CandidateIndex(entries)
+        assert index.take(31, WHEN) is entries[-1]
+        # it is june, so the december clips never play even though they have lower counts
+        assert index.take(31, WHEN) is entries[-1]
+        assert entries[-1].count == 2
+
+    def test_current(self, make_entries):
+        entries = make_entries([30])
+        index = CandidateIndex(entries)
+        assert index.current(entries)
+        entries.append(make_entries([10])[0])
+        assert not index.current(entries)
+
+    def test_unplayed(self, make_entries):
+        entries = make_entries([30, 30])
+        index = CandidateIndex(entries)
+        taken = index.take(31, WHEN)
+        assert index.unplayed(taken)
+        assert taken.count == 0
+        # back in the lowest bucket, so the two are tied again
+        index.take(31, WHEN)
+        index.take(31, WHEN)
+        assert all(e.count == 1 for e in entries)
+        assert not index.unplayed(make_entries([30])[0])
@@ -0,0 +1,46 @@
+from fs42.catalog_entry import CatalogEntry
+from fs42.catalog_io import CatalogIO
+from fs42.schedule_hint import MonthHint
+
+
+def make_entry(name, duration=30, tag="commercial", hints=[]):
+    entry = CatalogEntry(f"/content/{name}.mp4", duration, tag, hints)
+    entry.realpath = entry.path
+    return entry
+
+
+class TestSyncCatalogEntries:
+    def test_adds_updates_and_deletes(self, db_path):
+        catalog_io = CatalogIO()
+        first = [make_entry("kept"), make_entry("changed"), make_entry("removed")]
+        assert catalog_io.sync_catalog_entries("test", first) == (3, 0, 0)
+        stored = {entry.path: entry for entry in catalog_io.get_catalog_entries("test")}
+        catalog_io.update_entry_count("test", "/content/kept.mp4", 4)
+
+        second = [make_entry("kept"), make_entry("changed", 60, hints=[MonthHint("December")]), make_entry("added")]
+        assert catalog_io.sync_catalog_entries("test", second) == (1, 1, 1)
+
+        synced = {entry.path: entry for entry in catalog_io.get_catalog_entries("test")}
+        assert sorted(synced) == ["/content/added.mp4", "/content/changed.mp4", "/content/kept.mp4"]
+        # matched rows keep their ids and play counts, and take the new duration and hints
+        assert synced["/content/kept.mp4"].dbid == stored["/content/kept.mp4"].dbid
+        assert synced["/content/kept.mp4"].count == 4
+        assert synced["/content/changed.mp4"].dbid == stored["/content/changed.mp4"].dbid
+        assert synced["/content/changed.mp4"].duration == 60
+        assert [str(hint) for hint in synced["/content/changed.mp4"].hints] == [str(MonthHint("December"))]
+        # the entries passed in learn their ids
+        assert second[0].dbid == stored["/content/kept.mp4"].dbid
+
+        # nothing to do when nothing changed
+        assert catalog_io.sync_catalog_entries("test", second) == (0, 0, 0)
+
+
+class TestHintMasks:
+    def test_get_in_chunks(self, db_path):
+        catalog_io = CatalogIO()
+        stored = {(f"hints {i}", "day parts" if i % 2 else ""): bytes([i]) * 4 for i in range(7)}
+        catalog_io.put_hint_masks(stored)
+        wanted = set(stored) | {("hints 0", "day parts"), ("not stored", "")}
+        # the same masks back whether the keys fit in one query or take several
+        assert catalog_io.get_hint_masks(wanted) == stored
+        assert catalog_io.get_hint_masks(wanted, chunk_size=2) == stored
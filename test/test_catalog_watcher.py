@@ -0,0 +1,71 @@
+import os
+import pytest
+
+pytest.importorskip("inotify_simple")
+
+from fs42.catalog_api import CatalogAPI
+from fs42.catalog_watcher import CatalogWatcher
+from fs42.timings import DAYS
+
+
+class Probed:
+    def __init__(self, duration):
+        self.duration = duration
+
+
+class QueuedINotify:
+    """Hands out batches of events like INotify.read, recording the timeouts asked for"""
+
+    def __init__(self, batches):
+        self.batches = batches
+        self.timeouts = []
+
+    def read(self, timeout=None):
+        self.timeouts.append(timeout)
+        return self.batches.pop(0) if self.batches else []
+
+
+def make_stations(content):
+    # a loop channel that plays the shows folder, and a standard station with it as a tag
+    shows = content / "shows"
+    (shows / "specials").mkdir(parents=True)
+    loop = {"network_name": "loop", "network_type": "loop", "content_dir": str(shows)}
+    standard = {"network_name": "standard", "network_type": "standard", "content_dir": str(content)}
+    for day in DAYS:
+        standard[day] = {"12": {"tags": "shows"}}
+    return (shows, [loop, standard])
+
+
+class TestCatalogWatcher:
+    def test_events_to_stations(self, db_path, tmp_path, monkeypatch):
+        (shows, stations) = make_stations(tmp_path)
+        watcher = CatalogWatcher(stations, debounce=0.1)
+        # the loop channel doesn't use sub folders, but the standard station sharing the folder does
+        assert str(shows / "specials") in watcher._watches.values()
+
+        (shows / "pilot.mp4").write_bytes(b"")
+        (shows / "specials" / "holiday.mp4").write_bytes(b"")
+        (touched, removed_dirs) = watcher._collect(watcher._read_batch())
+        assert touched == {str(shows / "pilot.mp4"), str(shows / "specials" / "holiday.mp4")}
+        assert not removed_dirs
+
+        upserts = {}
+        monkeypatch.setattr(watcher._fluid, "update_files", lambda paths: {path: Probed(30) for path in paths})
+        monkeypatch.setattr(
+            CatalogAPI,
+            "upsert_entries",
+            lambda conf, entries: upserts.setdefault(conf["network_name"], sorted(e.path for e in entries)),
+        )
+        watcher.apply(touched)
+        # each station gets the files it would catalog, spelled the way its build spells them
+        assert upserts == {
+            "loop": [f"{shows}/pilot.mp4"],
+            "standard": [f"{shows}/pilot.mp4", f"{shows}/specials/holiday.mp4"],
+        }
+
+    def test_debounce(self, db_path, tmp_path):
+        watcher = CatalogWatcher([], debounce=0.5)
+        watcher._inotify = QueuedINotify([["created"], ["written"], ["closed"]])
+        # everything up to the first quiet half second is one batch
+        assert watcher._read_batch() == ["created", "written", "closed"]
+        assert watcher._inotify.timeouts == [None, 500, 500, 500]
@@ -0,0 +1,80 @@
+from datetime import datetime
+from fs42.catalog_io import CatalogIO
+from fs42.columnar_catalog import ColumnarCatalog
+from fs42.schedule_hint import MonthHint
+
+WHEN = datetime(2023, 6, 1, 12)
+
+
+class MemoryRows:
+    """Serves paths from a dict like CatalogRows does from the database, counting the reads"""
+
+    def __init__(self, paths, tags):
+        self._paths = paths
+        self._tags = tags
+        self.reads = 0
+
+    def paths(self, ids):
+        self.reads += 1
+        return {entry_id: self._paths[entry_id] for entry_id in ids if entry_id in self._paths}
+
+    def realpaths(self, tag):
+        return {self._paths[entry_id][1] for entry_id, entry_tag in self._tags.items() if entry_tag == tag}
+
+    def ids_for(self, tag, paths):
+        return {
+            path: entry_id
+            for entry_id, (path, _) in self._paths.items()
+            if path in paths and self._tags[entry_id] == tag
+        }
+
+
+def make_columns(durations, counts=None, tag="commercial", hints=None):
+    hints_str = CatalogIO._hints_to_json(hints) if hints else None
+    rows = []
+    paths = {}
+    for i, duration in enumerate(sorted(durations)):
+        path = f"/content/clip_{i}.mp4"
+        rows.append((i + 1, duration, tag, counts[i] if counts else 0, hints_str))
+        paths[i + 1] = (path, path)
+    return ColumnarCatalog("test", rows, MemoryRows(paths, {entry_id: tag for entry_id in paths}))
+
+
+class TestColumnarCatalog:
+    def test_lazy_entries(self):
+        columns = make_columns([15, 30, 60])
+        commercials = columns.tags["commercial"]
+        assert len(commercials) == 3
+        assert not columns._entries
+        found = commercials.take(31, WHEN)
+        # only the picked row became an entry, and it is the same one each time
+        assert len(columns._entries) == 1
+        assert found.duration in (15, 30) and found.count == 1
+        assert commercials.entry_for(found.path) is found
+        # paths are read back only for the rows that became entries
+        assert columns.source.reads == 1
+        assert commercials.realpaths() == {f"/content/clip_{i}.mp4" for i in range(3)}
+
+    def test_least_played(self):
+        columns = make_columns([10, 20, 30], counts=[3, 1, 2])
+        commercials = columns.tags["commercial"]
+        assert commercials.take(60, WHEN).duration == 20
+        assert commercials.take(60, WHEN).duration in (20, 30)
+        assert sorted(columns.counts.tolist()) == [2, 3, 3]
+        # too short to be valid, or too long to fit
+        assert commercials.take(1, WHEN) is None
+
+    def test_hints(self):
+        columns = make_columns([30] * 4, hints=[MonthHint("December")])
+        assert columns.tags["commercial"].take(31, WHEN) is None
+        assert columns.tags["commercial"].hint_sets() == [columns.hint_sets[1]]
+
+    def test_fitting_and_counts(self):
+        columns = make_columns([10, 20, 30, 40], counts=[0, 5, 0, 0])
+        commercials = columns.tags["commercial"]
+        fitting = commercials.fitting(45, WHEN, 8)
+        # least played first with a share of the limit each, and no counts change until they are played
+        assert [entry.count for entry in fitting] == [0, 0, 5]
+        assert commercials.played(fitting[0]) and fitting[0].count == 1
+        assert commercials.unplayed(fitting[0]) and fitting[0].count == 0
+        assert columns.counts.tolist() == [0, 5, 0, 0]
@@ -0,0 +1,44 @@
+import threading
+
+from fs42.db import DB
+
+
+class TestDB:
+    def migrations(self, monkeypatch, calls):
+        def first(connection):
+            calls.append(1)
+            connection.execute("CREATE TABLE things (name TEXT)")
+
+        def second(connection):
+            calls.append(2)
+            connection.execute("ALTER TABLE things ADD COLUMN size INTEGER")
+
+        monkeypatch.setattr(DB, "migrations", [(1, "things", first), (2, "thing sizes", second)])
+        monkeypatch.setattr(DB, "_migrated", set())
+
+    def test_migrates_once(self, tmp_path, monkeypatch):
+        calls = []
+        self.migrations(monkeypatch, calls)
+        db_path = str(tmp_path / "test.db")
+        connection = DB.connect(db_path)
+        assert calls == [1, 2]
+        assert connection.execute("PRAGMA user_version").fetchone()[0] == 2
+        with connection:
+            connection.execute("INSERT INTO things VALUES ('a', 1)")
+
+        # a later process starts from the stored version
+        DB._migrated.clear()
+        DB.migrate(connection, db_path)
+        assert calls == [1, 2]
+
+    def test_connection_per_thread(self, tmp_path, monkeypatch):
+        self.migrations(monkeypatch, [])
+        db_path = str(tmp_path / "test.db")
+        assert DB.connect(db_path) is DB.connect(db_path)
+        assert DB.connect(db_path).execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+
+        other = []
+        thread = threading.Thread(target=lambda: other.append(DB.connect(db_path)))
+        thread.start()
+        thread.join()
+        assert other[0] is not DB.connect(db_path)
@@ -0,0 +1,89 @@
+import json
+from datetime import datetime, timedelta
+
+from fs42.db import DB
+from fs42.fluid_builder import FluidBuilder
+from fs42.fluid_objects import FileRepoEntry
+from fs42.fluid_statements import FluidStatements
+from fs42.media_processor import MediaProcessor
+from fs42.parallel_build import ParallelCatalogBuild
+
+
+def cache_file(connection, path, duration=1800.0, meta=None):
+    entry = FileRepoEntry()
+    entry.path = path
+    entry.duration = duration
+    entry.meta = json.dumps(meta) if meta else ""
+    FluidStatements._write_probed(connection, [entry], [], {})
+
+
+class TestBreakJobs:
+    def test_audio_from_meta(self, db_path, monkeypatch):
+        connection = DB.connect(db_path)
+        cache_file(connection, "/content/talkie.mp4", meta={"container": "mp4", "audio_codec": "aac"})
+        cache_file(connection, "/content/silent.mp4", meta={"container": "mp4", "video_codec": "h264"})
+        cache_file(connection, "/content/old.mp4")
+        FluidStatements.queue_break_jobs(
+            connection, [("/content/talkie.mp4", 1800.0), ("/content/silent.mp4", 1800.0), ("/content/old.mp4", 1800.0)]
+        )
+
+        seen = {}
+
+        def black_detect(path, duration, fast=False, has_audio=None):
+            seen[path] = has_audio
+            return []
+
+        monkeypatch.setattr(MediaProcessor, "black_detect", black_detect)
+        builder = FluidBuilder()
+        builder.break_workers = 1
+        builder.process_break_jobs()
+        # only a file cached before probe metadata was kept is left for black_detect to probe
+        assert seen == {"/content/talkie.mp4": True, "/content/silent.mp4": False, "/content/old.mp4": None}
+
+    def test_resume(self, db_path, monkeypatch):
+        connection = DB.connect(db_path)
+        jobs = [(f"/content/show_{i}.mp4", 1800.0) for i in range(3)]
+        assert FluidStatements.queue_break_jobs(connection, jobs) == 3
+        # a run that was stopped after two files
+        FluidStatements.finish_break_job(connection, jobs[0][0], [{"start": 600.0, "end": 1200.0}])
+        FluidStatements.finish_break_job(connection, jobs[1][0], None, "ffmpeg could not detect black frames")
+        assert FluidStatements.get_break_jobs(connection) == [jobs[2]]
+
+        seen = []
+        monkeypatch.setattr(MediaProcessor, "black_detect", lambda path, duration, **kwargs: seen.append(path) or [])
+        builder = FluidBuilder()
+        builder.break_workers = 1
+        builder.process_break_jobs()
+        # the next run only does what was left
+        assert seen == [jobs[2][0]]
+        assert FluidStatements.get_break_jobs(connection, "done") == [jobs[0], jobs[2]]
+        assert FluidStatements.get_break_points(connection, jobs[0][0]) == [{"start": 600.0, "end": 1200.0}]
+
+        # finished files can be queued again, but failed ones aren't retried
+        assert FluidStatements.queue_break_jobs(connection, jobs) == 2
+        assert FluidStatements.get_break_jobs(connection, "failed") == [jobs[1]]
+
+
+class TestTrimFileCache:
+    def test_nothing_scanned(self, db_path, monkeypatch):
+        monkeypatch.setattr(FluidBuilder, "_scanned", {})
+        assert FluidBuilder().trim_file_cache(datetime.now()) is False
+
+    def test_after_pooled_builds(self, db_path, monkeypatch):
+        monkeypatch.setattr(FluidBuilder, "_scanned", {})
+        connection = DB.connect(db_path)
+        cached = ["/content/shows/one.mp4", "/content/shows/two.mp4", "/content/shows/gone.mp4"]
+        for path in cached + ["/content/bumps/bump.mp4"]:
+            cache_file(connection, path)
+
+        # two catalog workers hand back what they scanned of the same folder, as the pool applies it
+        build = ParallelCatalogBuild([])
+        build._apply(("scanned", {"/content/shows": {"/content/shows/one.mp4"}}))
+        build._apply(("scanned", {"/content/shows": {"/content/shows/two.mp4"}}))
+
+        assert FluidBuilder().trim_file_cache(datetime.now() + timedelta(seconds=1))
+        # what either of them found stays, and the folder neither scanned is left alone
+        assert FluidStatements.check_file_cache(connection, "/content/shows/gone.mp4") is None
+        for path in ("/content/shows/one.mp4", "/content/shows/two.mp4", "/content/bumps/bump.mp4"):
+            assert FluidStatements.check_file_cache(connection, path) is not None
+        assert FluidBuilder._scanned == {}
@@ -0,0 +1,99 @@
+import datetime
+
+import pytest
+
+from fs42.db import DB
+from fs42.fluid_objects import FileRepoEntry
+from fs42.fluid_statements import FluidStatements
+from fs42.probe_engine import ProbeEngine, ProbeResult
+
+# st_mtime, as the walker reports it
+MODIFIED = 1704067200.0
+
+
+def make_file(path, size=1000, last_mod=MODIFIED):
+    entry = FileRepoEntry()
+    entry.path = path
+    entry.size = size
+    entry.last_mod = last_mod
+    return entry
+
+
+class FakeProbe:
+    """Stands in for ProbeEngine.probe, recording what it is asked to probe - paths in broken fail"""
+
+    def __init__(self):
+        self.calls = []
+        self.broken = set()
+
+    def probe(self, paths):
+        if paths:
+            self.calls.append(list(paths))
+        return [
+            ProbeResult(path, error="moov atom not found") if path in self.broken else ProbeResult(path, 30.0)
+            for path in paths
+        ]
+
+
+@pytest.fixture
+def probed(monkeypatch):
+    fake = FakeProbe()
+    monkeypatch.setattr(ProbeEngine, "probe", lambda self, paths: fake.probe(paths))
+    return fake
+
+
+class TestIterateFileEntries:
+    def test_only_new_and_changed(self, db_path, probed):
+        connection = DB.connect(db_path)
+        files = [make_file("/content/a.mp4"), make_file("/content/b.mp4")]
+        assert FluidStatements.iterate_file_entries(connection, files) == (2, 0, 0)
+
+        # b has grown, c is new, and a link brings c up twice
+        files = [make_file("/content/a.mp4"), make_file("/content/b.mp4", 2000)]
+        files += [make_file("/content/c.mp4"), make_file("/content/c.mp4")]
+        assert FluidStatements.iterate_file_entries(connection, files) == (1, 1, 0)
+        assert probed.calls[-1] == ["/content/c.mp4", "/content/b.mp4"]
+        assert FluidStatements.check_file_cache(connection, "/content/b.mp4").size == 2000
+
+        assert FluidStatements.iterate_file_entries(connection, files) == (0, 0, 0)
+        assert len(probed.calls) == 2
+
+    def test_failed_probes(self, db_path, probed):
+        connection = DB.connect(db_path)
+        broken = make_file("/content/broken.mp4")
+        probed.broken.add(broken.path)
+        assert FluidStatements.iterate_file_entries(connection, [broken]) == (0, 0, 1)
+        assert FluidStatements.get_probe_failure(connection, broken.path) == (1000, MODIFIED, "moov atom not found")
+
+        # not probed again while the file is the same, unless asked to
+        assert FluidStatements.iterate_file_entries(connection, [make_file(broken.path)]) == (0, 0, 0)
+        assert len(probed.calls) == 1
+        retried = FluidStatements.iterate_file_entries(connection, [make_file(broken.path)], retry_failures=True)
+        assert retried == (0, 0, 1) and len(probed.calls) == 2
+
+        # a new copy of the file is probed again, and the failure is forgotten once it works
+        probed.broken.clear()
+        fixed = make_file(broken.path, 2000, MODIFIED + 60)
+        assert FluidStatements.iterate_file_entries(connection, [fixed]) == (1, 0, 0)
+        assert len(probed.calls) == 3
+        assert FluidStatements.get_probe_failure(connection, broken.path) is None
+        assert FluidStatements.check_file_cache(connection, broken.path).duration == 30.0
+
+
+class TestTrimFileEntries:
+    def test_only_scanned_folders(self, db_path):
+        connection = DB.connect(db_path)
+        cached = ["/content/shows/kept.mp4", "/content/shows/gone.mp4", "/content/showsextra/other.mp4"]
+        cached.append("/elsewhere/unscanned.mp4")
+        FluidStatements._write_probed(
+            connection, [make_file(path) for path in cached], [(make_file("/content/shows/broken.mp4"), "bad")], set()
+        )
+
+        after = datetime.datetime.now() + datetime.timedelta(seconds=1)
+        removed = FluidStatements.trim_file_entries(connection, after, {"/content/shows": {"/content/shows/kept.mp4"}})
+        # only what the scan of /content/shows didn't find goes - not a folder that starts the same
+        assert removed == 1
+        assert FluidStatements.check_file_cache(connection, "/content/shows/gone.mp4") is None
+        for path in ("/content/shows/kept.mp4", "/content/showsextra/other.mp4", "/elsewhere/unscanned.mp4"):
+            assert FluidStatements.check_file_cache(connection, path) is not None
+        assert FluidStatements.get_probe_failure(connection, "/content/shows/broken.mp4") is None
@@ -0,0 +1,33 @@
+from datetime import datetime, timedelta
+from fs42.hint_mask import HintMask
+from fs42.schedule_hint import MonthHint, QuarterHint, RangeHint
+
+
+def evaluate(hints, when):
+    return all(hint.hint(when) for hint in hints)
+
+
+class TestHintMask:
+    def test_hour_of_year(self):
+        assert HintMask.hour_of_year(datetime(2023, 1, 1, 0)) == 0
+        assert HintMask.hour_of_year(datetime(2024, 2, 29, 5)) == (59 * 24) + 5
+        # march 1st lands on the same hour in leap and common years
+        assert HintMask.hour_of_year(datetime(2023, 3, 1, 1)) == HintMask.hour_of_year(datetime(2024, 3, 1, 1))
+        assert HintMask.hour_of_year(datetime(2023, 12, 31, 23)) == HintMask.hours - 1
+
+    def test_matches_hints(self):
+        hint_sets = [
+            [MonthHint("March")],
+            [QuarterHint("Q4")],
+            [RangeHint("November 15 - January 15")],
+            [RangeHint("December 1 - December 25"), MonthHint("December")],
+        ]
+        for hints in hint_sets:
+            when = datetime(2023, 1, 1)
+            while when.year == 2023:
+                assert HintMask.test(hints, when) == evaluate(hints, when), f"{hints} at {when}"
+                when += timedelta(hours=5)
+
+    def test_no_hints(self):
+        assert HintMask.test([], datetime(2023, 6, 1, 12))
+        assert HintMask.test((), datetime(2023, 6, 1, 12))
@@ -0,0 +1,45 @@
+from datetime import datetime, timedelta
+
+from fs42.catalog_api import CatalogAPI
+from fs42.catalog_entry import CatalogEntry
+from fs42.catalog_io import CatalogIO
+from fs42.liquid_blocks import LiquidBlock, LiquidClipBlock
+from fs42.liquid_io import LiquidIO
+
+START = datetime(2024, 1, 1, 12)
+
+
+def make_block(block_type, content, hours):
+    block = block_type(content, START + timedelta(hours=hours), START + timedelta(hours=hours + 1), "block")
+    block.plan = []
+    return block
+
+
+class TestBuildBlocks:
+    def test_entries_read_in_one_go(self, db_path, monkeypatch):
+        entries = [CatalogEntry(f"/content/show_{i}.mp4", 1800, "show") for i in range(3)]
+        CatalogIO().put_catalog_entries("test", entries)
+        stored = sorted(CatalogIO().get_catalog_entries("test"), key=lambda entry: entry.path)
+        removed = CatalogEntry("/content/removed.mp4", 1800, "show")
+        removed.dbid = max(entry.dbid for entry in stored) + 1
+
+        blocks = [make_block(LiquidBlock, stored[0], 0), make_block(LiquidBlock, removed, 1)]
+        blocks.append(make_block(LiquidClipBlock, [stored[1], removed, stored[2]], 2))
+        LiquidIO().put_liquid_blocks("test", blocks)
+
+        reads = []
+        get_entries_by_ids = CatalogAPI.get_entries_by_ids
+        monkeypatch.setattr(
+            CatalogAPI, "get_entries_by_ids", lambda ids: reads.append(set(ids)) or get_entries_by_ids(ids)
+        )
+        loaded = sorted(LiquidIO().get_liquid_blocks("test"), key=lambda block: block.start_time)
+        assert reads == [{entry.dbid for entry in stored} | {removed.dbid}]
+
+        assert loaded[0].content.path == stored[0].path
+        # entries that have left the catalog come back as None, the same as reading them one at a time did
+        assert loaded[1].content is None
+        assert [entry.path if entry else None for entry in loaded[2].content] == [
+            stored[1].path,
+            None,
+            stored[2].path,
+        ]
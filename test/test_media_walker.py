@@ -0,0 +1,71 @@
+import glob
+import os
+from fs42.media_walker import MediaWalker
+from fs42.media_processor import MediaProcessor
+
+EXTENSIONS = MediaProcessor.supported_extensions
+
+
+def globbed(path, recursive=True):
+    # what the media finders returned before the walker
+    pattern = "/**/*." if recursive else "/*."
+    found = []
+    for ext in MediaProcessor.supported_formats:
+        found += glob.glob(f"{path}{pattern}{ext}", recursive=recursive)
+    return sorted(found)
+
+
+def walked(path, recursive=True):
+    return sorted(entry.path for entry in MediaWalker().find(path, EXTENSIONS, recursive))
+
+
+def touch(path, content=b"x"):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(content)
+
+
+class TestMediaWalker:
+    def setup_method(self):
+        MediaWalker().forget()
+
+    def teardown_method(self):
+        MediaWalker().forget()
+
+    def test_links_match_glob(self, tmp_path):
+        root = str(tmp_path)
+        touch(f"{root}/shared/a.mp4")
+        touch(f"{root}/shared/b.mkv")
+        touch(f"{root}/show/sub/c.mp4")
+        touch(f"{root}/show/notes.txt")
+        # two tags linking the same folder, and a tag linking another tag
+        os.symlink(f"{root}/shared", f"{root}/commercial")
+        os.symlink(f"{root}/shared", f"{root}/bump")
+        os.symlink(f"{root}/commercial", f"{root}/show/promos")
+
+        MediaWalker().walk(root, EXTENSIONS)
+        for folder in ["", "/shared", "/commercial", "/bump", "/show", "/show/promos"]:
+            assert walked(f"{root}{folder}") == globbed(f"{root}{folder}")
+            assert walked(f"{root}{folder}", recursive=False) == globbed(f"{root}{folder}", recursive=False)
+        assert len(walked(f"{root}/commercial")) == 2
+
+    def test_link_loop(self, tmp_path):
+        root = str(tmp_path)
+        touch(f"{root}/a/clip.mp4")
+        os.symlink(f"{root}/a", f"{root}/a/again")
+        assert [entry.path for entry in MediaWalker().walk(root, EXTENSIONS)] == [f"{root}/a/clip.mp4"]
+
+    def test_rewritten_in_place(self, tmp_path):
+        root = str(tmp_path)
+        touch(f"{root}/clip.mp4")
+        fingerprints = {}
+        MediaWalker().walk(root, EXTENSIONS, fingerprints, remember=False)
+        folder_mtime = os.stat(root).st_mtime
+        fingerprints[os.path.realpath(root)].changed = False
+
+        # a new file under the same name leaves the folder's mtime alone
+        touch(f"{root}/clip.mp4", b"longer content")
+        os.utime(root, (folder_mtime, folder_mtime))
+        (entry,) = MediaWalker().walk(root, EXTENSIONS, fingerprints, remember=False)
+        assert entry.size == len(b"longer content")
+        assert fingerprints[os.path.realpath(root)].changed
@@ -0,0 +1,104 @@
+import os
+import pickle
+
+from fs42 import parallel_build
+from fs42.parallel_build import ParallelCatalogBuild, _StationPool
+from fs42.shared_scan import SharedScan
+from fs42.timings import DAYS
+
+
+def make_stations(content):
+    # two stations with a show folder each, and a commercial folder in common
+    stations = []
+    for name in ("one", "two"):
+        (content / name).mkdir(parents=True)
+        station = {
+            "network_name": name,
+            "network_type": "standard",
+            "content_dir": str(content),
+            "commercial_dir": "commercial",
+            "_has_catalog": True,
+        }
+        for day in DAYS:
+            station[day] = {"12": {"tags": name}}
+        stations.append(station)
+    (content / "commercial").mkdir()
+    return stations
+
+
+def scanned(self):
+    # a scan that finds nothing, without going to the disk
+    self._results = {key: (tag_dir, {key[1]: []}) for key, tag_dir in self._plan.items()}
+    return self
+
+
+def write_twice(station_name):
+    # runs in a pool process - logs a line as it goes and hands back two writes
+    parallel_build._progress.put((station_name, "building"))
+    return (station_name, [f"{station_name} first", f"{station_name} second"], None, ["building"])
+
+
+def die(station_name):
+    os._exit(1)
+
+
+class TestStationPool:
+    def run(self, worker, apply):
+        pool = _StationPool([{"network_name": "one"}, {"network_name": "two"}], workers=2)
+        (reported, progress) = ([], [])
+        results = pool._run(["one", "two"], worker, apply, reported.append, lambda *line: progress.append(line))
+        return (results, reported, progress)
+
+    def test_writes_in_this_process(self):
+        written = []
+        (results, reported, progress) = self.run(write_twice, written.append)
+        assert sorted(result.station for result in results if result.ok) == ["one", "two"]
+        assert reported == results
+        # each station's writes are applied here, in order
+        assert sorted(written) == ["one first", "one second", "two first", "two second"]
+        assert written.index("one first") < written.index("one second")
+        assert sorted(progress) == [("one", "building"), ("two", "building")]
+        assert results[0].log == ["building"]
+
+    def test_write_error(self):
+        def apply(write):
+            if write == "two second":
+                raise ValueError("database is locked")
+
+        (results, _, _) = self.run(write_twice, apply)
+        errors = {result.station: result.error for result in results}
+        assert errors == {"one": None, "two": "ValueError: database is locked"}
+
+    def test_worker_dies(self):
+        written = []
+        (results, _, _) = self.run(die, written.append)
+        # a dead worker takes its station's name with it
+        assert [result.station for result in results] == ["unknown", "unknown"]
+        assert all("BrokenProcessPool" in result.error for result in results)
+        assert not written
+
+
+class TestParallelCatalogBuild:
+    def capture_jobs(self, build, monkeypatch):
+        jobs = []
+        monkeypatch.setattr(build, "_run", lambda pool_jobs, *args: jobs.extend(pool_jobs) or [])
+        build.run()
+        return {job[0]: job[3] for job in jobs}
+
+    def test_shared_scan_per_station(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(SharedScan, "scan", scanned)
+        scans = self.capture_jobs(ParallelCatalogBuild(make_stations(tmp_path), workers=2), monkeypatch)
+        for name in ("one", "two"):
+            # each build is sent the folders it uses and no others
+            part = pickle.loads(pickle.dumps(scans[name]))
+            assert sorted(tag for (_, tag, _) in part._results) == sorted(["commercial", name])
+            assert part.results_for(f"{tmp_path}/commercial", "commercial") == {"commercial": []}
+
+    def test_shared_scan_fails(self, tmp_path, monkeypatch):
+        def scan(self):
+            raise OSError("disk went away")
+
+        monkeypatch.setattr(SharedScan, "scan", scan)
+        scans = self.capture_jobs(ParallelCatalogBuild(make_stations(tmp_path), workers=2), monkeypatch)
+        # every station scans its own folders instead
+        assert scans == {"one": None, "two": None}
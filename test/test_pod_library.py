@@ -0,0 +1,58 @@
+from datetime import datetime
+from fs42.pod_library import PodLibrary
+
+WHEN = datetime(2023, 6, 1, 12)
+
+
+class TestPodLibrary:
+    def test_common_lengths(self, make_library):
+        (library, _) = make_library()
+        assert library.key(120.5, WHEN, False, "commercial", "bump") is not None
+        assert library.key(90, WHEN, False, "commercial", "bump") is None
+        assert library.key(90, WHEN, False, "commercial", "bump") is None
+        assert library.key(90, WHEN, False, "commercial", "bump") is not None
+
+    def test_rotation(self, make_library):
+        (library, entries) = make_library()
+        key = library.key(120, WHEN, False, "commercial", "bump")
+        for pod in range(PodLibrary.pods_per_target):
+            library.add(key, None, entries[pod * 4 : pod * 4 + 4], None)
+
+        (_, comms, _) = library.take(key, WHEN)
+        assert all(entry.count == 1 for entry in comms)
+        # the next one is a pod that hasn't been used again yet
+        (_, others, _) = library.take(key, WHEN)
+        assert not set(map(id, others)) & set(map(id, comms))
+
+    def test_retired(self, make_library):
+        (library, entries) = make_library()
+        key = library.key(120, WHEN, False, "commercial", "bump")
+        for pod in range(PodLibrary.pods_per_target):
+            library.add(key, None, entries[pod * 4 : pod * 4 + 4], None)
+        for pod in library._pods[key]:
+            pod[3] = PodLibrary.max_pod_plays
+        # worn out - so a new one should be built in its place
+        assert library.take(key, WHEN) is None
+        assert len(library._pods[key]) == PodLibrary.pods_per_target - 1
+
+    def test_max_duration(self, make_library):
+        (library, entries) = make_library()
+        key = library.key(120, WHEN, False, "commercial", "bump")
+        for pod in range(PodLibrary.pods_per_target):
+            library.add(key, None, entries[pod * 4 : pod * 4 + 4], None)
+        # every pod is 120 seconds, too long for a break the key rounded down to 120
+        assert library.take(key, WHEN, 119.5) is None
+        assert library.take(key, WHEN, 120) is not None
+
+    def test_buckets(self, make_library):
+        (library, entries) = make_library()
+        # breaks spread over what a slot has left come in odd lengths, which share a bucket
+        keys = {library.key(target, WHEN, False, "commercial", "bump") for target in (120, 121.4, 127.9, 134.9)}
+        assert len(keys) == 1 and library.length(134.9) == 120
+        assert library.length(119.9) == 105 and library.length(10.5) == 10
+        (key,) = keys
+        for pod in range(PodLibrary.pods_per_target):
+            library.add(key, None, entries[pod * 4 : pod * 4 + 4], None)
+        # pods are built to the bucket, so every break in it can reuse them
+        assert library.take(key, WHEN, 127.9) is not None
+        assert library.take(key, WHEN, 134.9) is not None
@@ -0,0 +1,40 @@
+import pytest
+from concurrent.futures.process import BrokenProcessPool
+from fs42.probe_engine import ProbeEngine
+
+
+class BrokenPool:
+    def map(self, *args, **kwargs):
+        raise BrokenProcessPool("a worker died")
+
+    def shutdown(self):
+        pass
+
+
+@pytest.fixture
+def engine():
+    engine = ProbeEngine()
+    workers = engine.workers
+    engine.workers = 2
+    yield engine
+    engine.shutdown()
+    engine.workers = workers
+
+
+class TestProbeEngine:
+    def test_order_and_errors(self, engine, tmp_path):
+        files = [str(tmp_path / f"missing_{i}.mp4") for i in range(6)]
+        results = engine.probe(files)
+        # results line up with the files even though the pool finishes them in any order
+        assert [result.path for result in results] == files
+        assert all(result.error and result.duration == 0.0 for result in results)
+        engine.shutdown()
+        assert engine._executor is None
+
+    def test_broken_pool(self, engine, tmp_path):
+        files = [str(tmp_path / f"missing_{i}.mp4") for i in range(3)]
+        engine._executor = BrokenPool()
+        results = engine.probe(files)
+        # probed one at a time in this process instead, and a new pool next time
+        assert [result.path for result in results] == files
+        assert engine._executor is None
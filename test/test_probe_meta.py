@@ -0,0 +1,48 @@
+import pytest
+from fs42.probe_engine import ProbeResult
+
+
+class TestProbeMeta:
+
+    probed = {
+        "format": {"format_name": "mov,mp4,m4a,3gp,3g2,mj2", "duration": "1320.52", "bit_rate": "1843200"},
+        "streams": [
+            {"codec_type": "video", "codec_name": "mjpeg", "disposition": {"attached_pic": 1}},
+            {
+                "codec_type": "video",
+                "codec_name": "h264",
+                "width": 640,
+                "height": 480,
+                "avg_frame_rate": "30000/1001",
+                "bit_rate": "1600000",
+            },
+            {"codec_type": "audio", "codec_name": "aac", "channels": 2, "sample_rate": "48000"},
+        ],
+    }
+
+    def test_summary(self):
+        meta = ProbeResult.meta_from_probe(TestProbeMeta.probed)
+        assert meta["container"] == "mov,mp4,m4a,3gp,3g2,mj2"
+        assert meta["duration"] == pytest.approx(1320.52)
+        assert meta["bit_rate"] == 1843200
+        # the cover art stream is skipped
+        assert meta["video_codec"] == "h264"
+        assert (meta["width"], meta["height"]) == (640, 480)
+        assert meta["fps"] == pytest.approx(29.97)
+        assert meta["audio_codec"] == "aac"
+        assert meta["audio_channels"] == 2
+        assert meta["sample_rate"] == 48000
+
+    def test_missing_fields(self):
+        meta = ProbeResult.meta_from_probe({"streams": [{"codec_type": "audio", "codec_name": "mp3"}]})
+        assert meta == {"audio_codec": "mp3"}
+
+    def test_bad_rates(self):
+        probed = {"streams": [{"codec_type": "video", "avg_frame_rate": "0/0", "r_frame_rate": "25/1"}]}
+        assert ProbeResult.meta_from_probe(probed)["fps"] == 25.0
+
+    def test_has_audio(self):
+        assert ProbeResult.meta_has_audio(ProbeResult.meta_from_probe(TestProbeMeta.probed))
+        assert ProbeResult.meta_has_audio({"container": "mp4", "video_codec": "h264"}) is False
+        # nothing stored, so it has to be probed
+        assert ProbeResult.meta_has_audio({}) is None
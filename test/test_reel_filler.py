@@ -0,0 +1,41 @@
+from datetime import datetime
+from fs42.reel_filler import ReelFiller
+from fs42.candidate_index import CandidateIndex
+
+
+class TestReelFiller:
+    def test_exact_fit(self, make_entries):
+        # greedy would take the 60 and be stuck with 25 seconds to spare
+        entries = make_entries([60, 45, 40, 15])
+        chosen = ReelFiller.solve(entries, 85)
+        assert sum(e.duration for e in chosen) == 85
+
+    def test_never_over(self, make_entries):
+        entries = make_entries([29.6, 30.2, 14.9])
+        chosen = ReelFiller.solve(entries, 45)
+        assert sum(e.duration for e in chosen) <= 45
+        assert sum(e.duration for e in chosen) == 29.6 + 14.9
+
+    def test_prefers_earlier(self, make_entries):
+        # both 30s clips fit on their own - the first (least played) one is used
+        entries = make_entries([30, 30])
+        assert ReelFiller.solve(entries, 30) == [entries[0]]
+
+    def test_nothing_fits(self, make_entries):
+        assert ReelFiller.solve(make_entries([60]), 30) == []
+        assert ReelFiller.solve(make_entries([15]), 0) == []
+
+    def test_with_index(self, make_entries):
+        entries = make_entries([15, 30, 30, 60], counts=[0, 5, 0, 0])
+        index = CandidateIndex(entries)
+        when = datetime(2023, 6, 1, 12)
+        fitting = index.fitting(100, when, ReelFiller.max_candidates)
+        # the played one comes last
+        assert fitting[-1] is entries[1]
+        chosen = ReelFiller.solve(fitting, 75)
+        assert sum(e.duration for e in chosen) == 75
+        assert entries[1] not in chosen
+        for entry in chosen:
+            index.played(entry)
+        assert entries[0].count == 1 and entries[3].count == 1
+        assert index.take(20, when) is entries[0]
@@ -1,6 +1,8 @@
 from datetime import datetime
 from fs42.timings import MONTHS
 from fs42.schedule_hint import MonthHint, QuarterHint, RangeHint
+from fs42.catalog_io import CatalogIO
+from fs42.catalog_entry import CatalogEntry
 import pytest
 
 class TestMonthHint:
@@ -75,3 +77,18 @@ class TestRangeHint:
         assert not RangeHint.test_pattern("December 32 - December 13")
         assert not RangeHint.test_pattern("ExtraStuff December 1 - December 25")
         assert not RangeHint.test_pattern("December 1 - December 25 and this stuff")
+
+
+class TestStoredHints:
+    def test_round_trip(self):
+        stored = CatalogIO._hints_to_json([QuarterHint("Q2"), RangeHint("December 1 - December 25"), MonthHint("May")])
+        hints = CatalogEntry._decode_hints(stored)
+        assert [type(h) for h in hints] == [QuarterHint, RangeHint, MonthHint]
+        assert hints[0].quarter == 2
+        assert hints[1].range_string == "December 1 - December 25"
+
+    def test_shared(self):
+        stored = CatalogIO._hints_to_json([MonthHint("June")])
+        row = (1, "station", "/a.mp4", "a", 10.0, "show", 0, stored, None, None)
+        assert CatalogEntry.from_db_row(row).hints is CatalogEntry.from_db_row(row).hints
+        assert CatalogEntry._decode_hints(None) == ()